@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: Apache-2.0
+
+# Measure walking and scanning with asyncio on a file system with high
+# per-call latency, simulated locally by delaying each call.
+#
+# Usage, from the top-level directory:
+#   python3 -m bench.asyncscan [--targets N] [--sources M] [--seed S]
+#       [--delay SECONDS] [--concurrency N,N...]
+#
+# Generates a source tree with bench.synthreply in a temporary directory,
+# then walks and scans it as one package through a DelayedFS, which
+# sleeps for --delay before each directory listing, stat and open, as a
+# network file system would wait on the server. This is done once for
+# each --concurrency; a concurrency of 1 makes one call at a time, as the
+# serial scan does. Reports the time taken by each, and checks that they
+# all produce the same files, hashes and licenses.
+
+import argparse
+import os
+import tempfile
+import time
+
+from bench.synthreply import SynthConfig, generateSynthReply
+from spdx.asyncscan import LocalFS
+from spdx.builder import BuilderPackageConfig, getAllPathsWithStats, makeAllFileData
+
+# Wraps another file system shim, sleeping before each call.
+class DelayedFS:
+    def __init__(self, delay, fs=None):
+        super(DelayedFS, self).__init__()
+
+        # seconds to sleep before each call
+        self.delay = delay
+
+        # file system shim to pass calls on to
+        self.fs = fs if fs is not None else LocalFS()
+
+    def listDir(self, path):
+        time.sleep(self.delay)
+        return self.fs.listDir(path)
+
+    def stat(self, path):
+        time.sleep(self.delay)
+        return self.fs.stat(path)
+
+    def open(self, path):
+        time.sleep(self.delay)
+        return self.fs.open(path)
+
+def scanTree(srcDir, concurrency, fs):
+    """
+    Walk and scan a directory as one package, with asyncio.
+
+    Arguments:
+        - srcDir: directory to scan
+        - concurrency: maximum number of file system calls in flight
+        - fs: file system shim
+    Returns: tuple of (seconds taken, list of (name, SHA1, license) for
+             each file, in order)
+    """
+    pkgCfg = BuilderPackageConfig()
+    pkgCfg.scandir = srcDir
+    pkgCfg.asyncConcurrency = concurrency
+    pkgCfg.fs = fs
+
+    start = time.perf_counter()
+    (filePaths, stats) = getAllPathsWithStats(srcDir, pkgCfg.excludeDirs, pkgCfg)
+    bfs = makeAllFileData(filePaths, pkgCfg, {}, stats)
+    elapsed = time.perf_counter() - start
+    return (elapsed, [(bf.name, bf.sha1, bf.licenseConcluded) for bf in bfs])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure scanning with asyncio on a simulated high-latency file system")
+    parser.add_argument("--targets", type=int, default=20, help="number of targets (default 20)")
+    parser.add_argument("--sources", type=int, default=50, help="number of sources per target (default 50)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default 1)")
+    parser.add_argument("--delay", type=float, default=0.002,
+                        help="seconds of latency added to each file system call (default 0.002)")
+    parser.add_argument("--concurrency", default="1,4,16,64",
+                        help="comma-separated concurrency levels to compare (default 1,4,16,64)")
+    args = parser.parse_args()
+
+    synthCfg = SynthConfig()
+    synthCfg.numTargets = args.targets
+    synthCfg.sourcesPerTarget = args.sources
+    synthCfg.seed = args.seed
+    synthCfg.artifactSize = 1024
+
+    fs = DelayedFS(args.delay)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        generateSynthReply(os.path.join(tmpDir, "synth"), synthCfg)
+        srcDir = os.path.join(tmpDir, "synth", "src")
+
+        expected = None
+        baseline = None
+        print(f"{'concurrency':>12}{'seconds':>10}{'speedup':>9}")
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            (elapsed, files) = scanTree(srcDir, concurrency, fs)
+            if expected is None:
+                expected = files
+                baseline = elapsed
+            elif files != expected:
+                print(f"Error: results with concurrency {concurrency} differ from the first run")
+                raise SystemExit(1)
+            print(f"{concurrency:>12}{elapsed:>10.2f}{baseline / elapsed:>8.1f}x")
+        print(f"{len(expected)} files, {args.delay * 1000:.1f} ms per call")
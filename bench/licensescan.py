@@ -0,0 +1,174 @@
+# SPDX-License-Identifier: Apache-2.0
+
+# Compare the speed of searching files for SPDX-License-Identifier tags
+# with spdx.builder's ExpressionScanner against the line-by-line scanner
+# it replaced.
+#
+# Usage, from the top-level directory:
+#   python3 -m bench.licensescan [--files N] [--size BYTES] [--lines L]
+#       [--bytes B] [--repeat R]
+#
+# Generates N files of each kind below, about BYTES long, in a temporary
+# directory, then scans each set with both scanners, from memory so that
+# only the scanning itself is timed. Reports the best of R runs for each,
+# and how many files each found an expression in:
+#   - text: source with the tag after a header comment
+#   - late: source with the tag beyond the line limit
+#   - minified: one long line with no newlines, tag at the end
+#   - latin1: source with a non-UTF-8 comment before the tag
+#   - binary: random bytes including NULs, with a tag string embedded
+
+import argparse
+import random
+import time
+
+from spdx.builder import DEFAULT_SCAN_BYTES, READ_CHUNK_SIZE, ExpressionScanner, parseLineForExpression
+
+# kinds of file generated, in the order they are reported
+KINDS = ["text", "late", "minified", "latin1", "binary"]
+
+TAG_LINE = b"/* SPDX-License-Identifier: Apache-2.0 */\n"
+
+# The scanner as it was before searching bytes: splits each block into
+# lines, decodes each one and gives up on the first that isn't UTF-8.
+class LineScanner:
+    def __init__(self, numLines):
+        super(LineScanner, self).__init__()
+
+        # number of lines to scan for an expression (0 = all)
+        self.numLines = numLines
+
+        # number of lines scanned so far
+        self.lineno = 0
+
+        # start of a line that continues into the next block fed in
+        self.partial = b""
+
+        # parsed expression, if found
+        self.expression = None
+
+        # True once no more data needs to be fed in
+        self.done = False
+
+    def feed(self, buf):
+        start = 0
+        while not self.done:
+            end = buf.find(b"\n", start)
+            if end == -1:
+                self.partial += buf[start:]
+                if len(self.partial) > 64 * 1024:
+                    self.done = True
+                return
+            line = self.partial + buf[start:end+1]
+            self.partial = b""
+            start = end + 1
+            self.scanLine(line)
+
+    def finish(self):
+        if not self.done and self.partial != b"":
+            self.scanLine(self.partial)
+        self.done = True
+
+    def scanLine(self, line):
+        self.lineno += 1
+        if self.numLines > 0 and self.lineno > self.numLines:
+            self.done = True
+            return
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError:
+            self.done = True
+            return
+        expression = parseLineForExpression(text)
+        if expression is not None:
+            self.expression = expression
+            self.done = True
+
+def makeFiller(rnd, size):
+    """Return about size bytes of source-like lines."""
+    lines = []
+    total = 0
+    while total < size:
+        line = f"int f{len(lines)}(int x) {{ return x * {rnd.randrange(1000)}; }}\n".encode("ascii")
+        lines.append(line)
+        total += len(line)
+    return b"".join(lines)
+
+def makeFile(rnd, kind, size, numLines):
+    """
+    Make the contents of a file of one kind.
+
+    Arguments:
+        - rnd: random.Random
+        - kind: one of KINDS
+        - size: approximate size in bytes
+        - numLines: line limit the scanners are run with
+    Returns: bytes
+    """
+    header = b"/*\n * Copyright (c) example\n */\n"
+    if kind == "text":
+        return header + TAG_LINE + makeFiller(rnd, size)
+    if kind == "late":
+        return header + makeFiller(rnd, numLines * 60) + TAG_LINE + makeFiller(rnd, size)
+    if kind == "minified":
+        return makeFiller(rnd, size).replace(b"\n", b" ") + TAG_LINE
+    if kind == "latin1":
+        return b"/* Copyright (c) J\xf6rg Example */\n" + TAG_LINE + makeFiller(rnd, size)
+    data = bytearray(rnd.randbytes(size))
+    data[16] = 0
+    data[size // 2:size // 2 + len(TAG_LINE)] = TAG_LINE
+    return bytes(data)
+
+def scanAll(makeScanner, contents):
+    """
+    Scan each file's contents, fed in READ_CHUNK_SIZE blocks.
+
+    Arguments:
+        - makeScanner: function returning a new scanner
+        - contents: list of bytes
+    Returns: number of files an expression was found in
+    """
+    found = 0
+    for data in contents:
+        scanner = makeScanner()
+        view = memoryview(data)
+        pos = 0
+        while not scanner.done and pos < len(data):
+            scanner.feed(bytes(view[pos:pos + READ_CHUNK_SIZE]))
+            pos += READ_CHUNK_SIZE
+        scanner.finish()
+        if scanner.expression:
+            found += 1
+    return found
+
+def timeScan(makeScanner, contents, repeat):
+    """Return (best seconds, files found) for scanning contents repeat times."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = scanAll(makeScanner, contents)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return (best, found)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare SPDX-License-Identifier scanners")
+    parser.add_argument("--files", type=int, default=200, help="number of files of each kind (default 200)")
+    parser.add_argument("--size", type=int, default=256 * 1024,
+                        help="approximate size in bytes of each file (default 262144)")
+    parser.add_argument("--lines", type=int, default=20, help="line limit for both scanners (default 20)")
+    parser.add_argument("--bytes", type=int, default=DEFAULT_SCAN_BYTES,
+                        help=f"byte limit for the new scanner (default {DEFAULT_SCAN_BYTES})")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs to take the best of (default 3)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default 1)")
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    print(f"{'kind':<10}{'lines (s)':>12}{'found':>7}{'bytes (s)':>12}{'found':>7}{'speedup':>9}")
+    for kind in KINDS:
+        contents = [makeFile(rnd, kind, args.size, args.lines) for _ in range(args.files)]
+        (oldSeconds, oldFound) = timeScan(lambda: LineScanner(args.lines), contents, args.repeat)
+        (newSeconds, newFound) = timeScan(lambda: ExpressionScanner(args.lines, args.bytes), contents, args.repeat)
+        speedup = oldSeconds / newSeconds if newSeconds > 0 else 0.0
+        print(f"{kind:<10}{oldSeconds:>12.4f}{oldFound:>7}{newSeconds:>12.4f}{newFound:>7}{speedup:>8.1f}x")
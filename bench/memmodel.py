@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: Apache-2.0
+
+# Measure memory used by the parsed CMake codemodel.
+#
+# Usage, from the top-level directory:
+#   python3 -m bench.memmodel [path-to-cmake-api-index.json] [--copies N]
+#
+# Defaults to the example reply in this repo. Parses the reply --copies
+# times, keeping every copy alive, and reports the memory allocated for
+# them, as measured by tracemalloc.
+
+import argparse
+import os
+import time
+import tracemalloc
+
+from cmakefileapijson import ParseConfig, parseReply
+
+EXAMPLE_REPLY_INDEX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "example", "api-example-reply", "api", "v1", "reply", "index-2020-08-29T18-34-19-0138.json")
+
+def measureModelMemory(replyIndexPath, copies):
+    """
+    Parse a reply repeatedly and measure the memory used by the results.
+
+    Arguments:
+        - replyIndexPath: path to index file from Cmake API reply
+        - copies: number of times to parse the reply
+    Returns: tuple of (bytes allocated for all copies, number of targets
+             per copy, seconds taken)
+    """
+    # parse every section of every target, one file at a time, so that
+    # the measurement is of the model rather than of the thread pools
+    parseCfg = ParseConfig()
+    parseCfg.readJobs = 1
+
+    models = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for _ in range(copies):
+        models.append(parseReply(replyIndexPath, parseCfg))
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    numTargets = len(models[0].configurations[0].configTargets)
+    return (after - before, numTargets, elapsed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure memory used by the parsed CMake codemodel")
+    parser.add_argument("replyIndexPath", nargs="?", default=EXAMPLE_REPLY_INDEX, metavar="path-to-cmake-api-index.json")
+    parser.add_argument("--copies", type=int, default=40,
+                        help="number of copies of the model to keep in memory (default 40)")
+    args = parser.parse_args()
+
+    (allocated, numTargets, elapsed) = measureModelMemory(args.replyIndexPath, args.copies)
+    totalTargets = numTargets * args.copies
+    print(f"{args.copies} copies x {numTargets} targets = {totalTargets} targets")
+    print(f"memory: {allocated / (1024 * 1024):.1f} MiB total, {allocated / totalTargets / 1024:.1f} KiB per target")
+    print(f"parse time: {elapsed:.2f} s")
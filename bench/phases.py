@@ -0,0 +1,192 @@
+# SPDX-License-Identifier: Apache-2.0
+
+# Time each phase of an SBOM run on a synthetic CMake reply, and compare
+# the results against a stored baseline.
+#
+# Usage, from the top-level directory:
+#   python3 -m bench.phases [--targets N] [--sources M] [--fan-out K]
+#       [--artifact-size BYTES] [--source-size BYTES] [--seed S] [-j JOBS]
+#       [--output results.json] [--baseline baseline.json]
+#       [--save-baseline baseline.json] [--tolerance FRACTION]
+#
+# Generates the reply and trees with bench.synthreply in a temporary
+# directory, then runs parseReply, makeDocument for the sources and build
+# documents, getCmakeRelationships, outputSPDX and outputSPDXRelationships
+# in turn, recording each one's wall time and the process's peak RSS
+# after it. Unless --baseline is "none", the results are compared to
+# bench/baseline.json: a phase that is more than --tolerance slower than
+# there is reported as a regression, and the exit status is 1. Phases
+# that took less than MIN_COMPARE_SECONDS in the baseline aren't compared,
+# since their timings are mostly noise.
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from bench.synthreply import addSynthArguments, generateSynthReply, makeSynthConfig
+from cmakefileapijson import parseReply
+from sbom import SbomConfig, getCmakeRelationships, getSourcesRootDirs, makeBuildDocumentConfig, makeSourcesDocumentConfig
+from spdx.builder import makeDocument, outputSPDX
+from spdx.relationships import outputSPDXRelationships
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# phases shorter than this in the baseline aren't checked for regressions
+MIN_COMPARE_SECONDS = 0.05
+
+# names of the phases, in the order they are run
+PHASES = ["parseReply", "makeDocument", "getCmakeRelationships", "outputSPDX", "outputSPDXRelationships"]
+
+def getPeakRSS():
+    """Return the peak resident set size of this process so far, in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes rather than KiB
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+def runPhases(replyIndexPath, spdxOutputDir, jobs):
+    """
+    Run each phase of an SBOM run, timing it.
+
+    Arguments:
+        - replyIndexPath: path to index file from Cmake API reply
+        - spdxOutputDir: directory to write the SPDX documents to
+        - jobs: number of worker processes to scan files with
+    Returns: dict of phase name => {"seconds": wall time,
+             "peakRssKiB": peak RSS after the phase}, plus "files" with
+             the number of files in each document; or None on error
+    """
+    sbomCfg = SbomConfig()
+    sbomCfg.jobs = jobs
+    results = {}
+
+    def record(name, start):
+        results[name] = {"seconds": round(time.perf_counter() - start, 4), "peakRssKiB": getPeakRSS()}
+
+    start = time.perf_counter()
+    cm = parseReply(replyIndexPath, sbomCfg.parseCfg)
+    if cm is None:
+        return None
+    record("parseReply", start)
+
+    prefix = "https://example.com/bench/"
+    srcDocCfg = makeSourcesDocumentConfig(cm, getSourcesRootDirs(cm), prefix, sbomCfg)
+    buildDocCfg = makeBuildDocumentConfig(cm, prefix, sbomCfg)
+    start = time.perf_counter()
+    srcDoc = makeDocument(srcDocCfg)
+    buildDoc = makeDocument(buildDocCfg)
+    record("makeDocument", start)
+
+    start = time.perf_counter()
+    rlns = getCmakeRelationships(cm)
+    record("getCmakeRelationships", start)
+
+    srcSpdxPath = os.path.join(spdxOutputDir, "sources.spdx")
+    buildSpdxPath = os.path.join(spdxOutputDir, "build.spdx")
+    start = time.perf_counter()
+    if not outputSPDX(srcDoc, srcSpdxPath):
+        return None
+    buildDocCfg.extRefs = [("DocumentRef-sources", srcDocCfg.documentNamespace, "SHA256", srcDoc.sha256)]
+    if not outputSPDX(buildDoc, buildSpdxPath):
+        return None
+    record("outputSPDX", start)
+
+    start = time.perf_counter()
+    if not outputSPDXRelationships(cm.paths_source, cm.paths_build, srcDoc, buildDoc, rlns, buildSpdxPath):
+        return None
+    record("outputSPDXRelationships", start)
+
+    results["files"] = {
+        "sources": sum(len(pkg.files) for pkg in srcDoc.packages.values()),
+        "build": sum(len(pkg.files) for pkg in buildDoc.packages.values()),
+    }
+    return results
+
+def compareResults(results, baseline, tolerance):
+    """
+    Compare phase timings against a baseline.
+
+    Arguments:
+        - results: dict as written by this script
+        - baseline: dict as written by this script, earlier
+        - tolerance: fraction by which a phase may be slower than in the
+                     baseline before it counts as a regression
+    Returns: list of names of phases that regressed
+    """
+    if results["params"] != baseline.get("params"):
+        print("Warning: baseline was made with different parameters; comparison may not be meaningful")
+
+    regressions = []
+    print(f"{'phase':<26}{'baseline':>10}{'now':>10}{'ratio':>8}")
+    for name in PHASES:
+        prev = baseline.get("phases", {}).get(name)
+        cur = results["phases"][name]
+        if prev is None:
+            print(f"{name:<26}{'-':>10}{cur['seconds']:>10.3f}")
+            continue
+        ratio = cur["seconds"] / prev["seconds"] if prev["seconds"] > 0 else 1.0
+        flag = ""
+        if prev["seconds"] >= MIN_COMPARE_SECONDS and ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<26}{prev['seconds']:>10.3f}{cur['seconds']:>10.3f}{ratio:>8.2f}{flag}")
+    prevRss = baseline.get("peakRssKiB", 0)
+    print(f"peak RSS: {prevRss / 1024:.1f} MiB in baseline, {results['peakRssKiB'] / 1024:.1f} MiB now")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each phase of an SBOM run on a synthetic CMake reply")
+    addSynthArguments(parser)
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes for scanning files (default 1)")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help="baseline results to compare against (default bench/baseline.json), or \"none\"")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fraction by which a phase may be slower than the baseline (default 0.25)")
+    args = parser.parse_args()
+
+    synthCfg = makeSynthConfig(args)
+    with tempfile.TemporaryDirectory() as tmpDir:
+        replyIndexPath = generateSynthReply(os.path.join(tmpDir, "synth"), synthCfg)
+        spdxOutputDir = os.path.join(tmpDir, "spdx")
+        os.makedirs(spdxOutputDir)
+        phases = runPhases(replyIndexPath, spdxOutputDir, args.jobs)
+    if phases is None:
+        print("Error: benchmark run failed")
+        sys.exit(1)
+
+    params = synthCfg.toDict()
+    params["jobs"] = args.jobs
+    results = {
+        "params": params,
+        "files": phases.pop("files"),
+        "phases": phases,
+        "totalSeconds": round(sum(p["seconds"] for p in phases.values()), 4),
+        "peakRssKiB": getPeakRSS(),
+    }
+    print(f"{results['files']['sources']} source files, {results['files']['build']} build files")
+    print(f"total: {results['totalSeconds']:.3f} s, peak RSS {results['peakRssKiB'] / 1024:.1f} MiB")
+
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+
+    if args.save_baseline or args.baseline == "none":
+        sys.exit(0)
+    try:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error: Unable to read baseline {args.baseline}: {str(e)}")
+        sys.exit(1)
+    if len(compareResults(results, baseline, args.tolerance)) > 0:
+        sys.exit(1)
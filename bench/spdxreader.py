@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: Apache-2.0
+
+# Measure the speed and memory use of reading SPDX tag-value documents.
+#
+# Usage, from the top-level directory:
+#   python3 -m bench.spdxreader [path-to-spdx-document] [--files N] [--stream]
+#
+# Defaults to the example build document in this repo. With --files, a
+# larger document is first generated from it by repeating its files,
+# renamed, until it has N files. With --stream, files are passed to a
+# callback and dropped instead of being kept. Reports the time taken and
+# the peak memory allocated while reading, as measured by tracemalloc in
+# a second, untimed read.
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from spdx.builder import outputSPDX
+from spdx.reader import readSPDX
+
+EXAMPLE_SPDX_DOCUMENT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "example", "build.spdx")
+
+def makeLargerDocument(spdxPath, numFiles, outPath):
+    """
+    Write a copy of an SPDX document with its files repeated until it
+    has numFiles files, each with a unique name and SPDX ID.
+
+    Arguments:
+        - spdxPath: path to SPDX document to start from
+        - numFiles: number of files wanted
+        - outPath: path to write the new document to
+    Returns: True on success, False on error.
+    """
+    res = readSPDX(spdxPath)
+    if res is None:
+        return False
+    for pkg in res.doc.packages.values():
+        orig = list(pkg.files)
+        if len(orig) == 0:
+            continue
+        copyNum = 0
+        while len(pkg.files) < numFiles:
+            copyNum += 1
+            for bf in orig[:numFiles - len(pkg.files)]:
+                copied = type(bf)()
+                copied.__dict__.update(bf.__dict__)
+                copied.name = os.path.join(".", f"copy{copyNum}", bf.name)
+                copied.spdxID = f"{bf.spdxID}-copy{copyNum}"
+                pkg.files.append(copied)
+        break
+    return outputSPDX(res.doc, outPath, lambda doc: res.relationships)
+
+def measureRead(spdxPath, stream):
+    """
+    Read an SPDX document and measure the time and memory taken.
+
+    Arguments:
+        - spdxPath: path to SPDX document
+        - stream: pass files to a callback instead of keeping them?
+    Returns: tuple of (number of files, peak bytes allocated, seconds taken)
+    """
+    counts = [0]
+    def onFile(pkg, bf):
+        counts[0] += 1
+
+    # time and memory are measured in separate reads, since tracemalloc
+    # slows down allocation considerably
+    start = time.perf_counter()
+    res = readSPDX(spdxPath, onFile if stream else None)
+    elapsed = time.perf_counter() - start
+    res = None
+
+    counts[0] = 0
+    tracemalloc.start()
+    res = readSPDX(spdxPath, onFile if stream else None)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    numFiles = counts[0] if stream else len(res.filesByID)
+    return (numFiles, peak, elapsed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure reading SPDX tag-value documents")
+    parser.add_argument("spdxPath", nargs="?", default=EXAMPLE_SPDX_DOCUMENT, metavar="path-to-spdx-document")
+    parser.add_argument("--files", type=int, default=0,
+                        help="first generate a document with this many files from the given one")
+    parser.add_argument("--stream", action="store_true",
+                        help="pass files to a callback instead of keeping them")
+    args = parser.parse_args()
+
+    spdxPath = args.spdxPath
+    with tempfile.TemporaryDirectory() as tmpDir:
+        if args.files > 0:
+            spdxPath = os.path.join(tmpDir, "large.spdx")
+            if not makeLargerDocument(args.spdxPath, args.files, spdxPath):
+                raise SystemExit(1)
+
+        size = os.path.getsize(spdxPath)
+        (numFiles, peak, elapsed) = measureRead(spdxPath, args.stream)
+        print(f"{numFiles} files, {size / (1024 * 1024):.1f} MiB document")
+        print(f"read time: {elapsed:.2f} s ({numFiles / elapsed:.0f} files/s, {size / elapsed / (1024 * 1024):.1f} MiB/s)")
+        print(f"peak memory: {peak / (1024 * 1024):.1f} MiB, {peak / max(numFiles, 1):.0f} bytes per file")
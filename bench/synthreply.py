@@ -0,0 +1,245 @@
+# SPDX-License-Identifier: Apache-2.0
+
+# Generate a synthetic CMake file-based API reply, with matching source
+# and build trees on disk, for benchmarking.
+#
+# Usage, from the top-level directory:
+#   python3 -m bench.synthreply output-dir [--targets N] [--sources M]
+#       [--fan-out K] [--artifact-size BYTES] [--source-size BYTES] [--seed S]
+#       [--configs NAME,NAME...]
+#
+# Writes output-dir/src (one directory of sources per target, plus some
+# shared headers) and output-dir/build (an object file per source and an
+# artifact per target, with the reply under .cmake/api/v1/reply). The last
+# target is an executable; the others are static libraries, each
+# depending on up to --fan-out earlier targets, so the dependency graph
+# is always acyclic. With --configs, as for a multi-configuration
+# generator such as Ninja Multi-Config, the reply has a configuration for
+# each name, and each configuration's object files and artifacts are in
+# a subdirectory named after it. Prints the path to the reply's index
+# file.
+
+import argparse
+import json
+import os
+import random
+
+# licenses used for the SPDX-License-Identifier lines in generated sources
+SYNTH_LICENSES = ["Apache-2.0", "MIT", "BSD-3-Clause", "GPL-2.0-or-later", "Apache-2.0 OR MIT"]
+
+# name of the reply's index file
+SYNTH_INDEX_FILE = "index-synth.json"
+
+class SynthConfig:
+    def __init__(self):
+        super(SynthConfig, self).__init__()
+
+        # number of targets
+        self.numTargets = 200
+
+        # number of sources per target
+        self.sourcesPerTarget = 50
+
+        # maximum number of earlier targets each target depends on
+        self.fanOut = 3
+
+        # size in bytes of each target's artifact
+        self.artifactSize = 64 * 1024
+
+        # approximate size in bytes of each source file
+        self.sourceSize = 2 * 1024
+
+        # number of shared headers, in a directory not belonging to any
+        # target
+        self.numHeaders = 10
+
+        # seed for the random choices of dependencies and file contents
+        self.seed = 1
+
+        # names of the configurations; [""] for a single-configuration
+        # build, with no per-configuration subdirectories
+        self.configNames = [""]
+
+    def toDict(self):
+        """Return the settings as a dict, e.g. for recording with results."""
+        return dict(self.__dict__)
+
+def getTargetName(synthCfg, i):
+    """Return the name of the i'th target."""
+    if i == synthCfg.numTargets - 1:
+        return "app"
+    return f"lib{i:04d}"
+
+def getArtifactPath(synthCfg, i, configName):
+    """Return the path of the i'th target's artifact in a configuration, relative to the build dir."""
+    name = getTargetName(synthCfg, i)
+    if i == synthCfg.numTargets - 1:
+        return os.path.join(name, configName, name + ".elf")
+    return os.path.join(name, configName, "lib" + name + ".a")
+
+def writeFile(path, data):
+    """Write bytes to path, creating its parent directories."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def makeSourceData(rnd, size, name):
+    """
+    Make the contents of a source file: a license identifier, then
+    filler lines until it is about size bytes long.
+
+    Arguments:
+        - rnd: random.Random
+        - size: approximate size in bytes
+        - name: name to use in the filler
+    Returns: bytes
+    """
+    lines = [f"/* SPDX-License-Identifier: {rnd.choice(SYNTH_LICENSES)} */", "#include \"common.h\""]
+    total = sum(len(line) + 1 for line in lines)
+    n = 0
+    while total < size:
+        line = f"int {name}_{n}(int x) {{ return x * {rnd.randrange(1000)} + {n}; }}"
+        lines.append(line)
+        total += len(line) + 1
+        n += 1
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def makeTargetJSON(synthCfg, i, targetIDs, deps, configName):
+    """
+    Make the reply JSON object for the i'th target in a configuration.
+
+    Arguments:
+        - synthCfg: SynthConfig
+        - i: target index
+        - targetIDs: list of all target IDs
+        - deps: indexes of the targets it depends on
+        - configName: name of the configuration
+    Returns: dict
+    """
+    name = getTargetName(synthCfg, i)
+    isApp = i == synthCfg.numTargets - 1
+    sources = [{"path": os.path.join(name, f"src{j:04d}.c"), "compileGroupIndex": 0, "sourceGroupIndex": 0}
+               for j in range(synthCfg.sourcesPerTarget)]
+    return {
+        "name": name,
+        "id": targetIDs[i],
+        "type": "EXECUTABLE" if isApp else "STATIC_LIBRARY",
+        "paths": {"source": name, "build": name},
+        "nameOnDisk": os.path.basename(getArtifactPath(synthCfg, i, configName)),
+        "artifacts": [{"path": getArtifactPath(synthCfg, i, configName)}],
+        "dependencies": [{"id": targetIDs[d]} for d in deps],
+        "sources": sources,
+        "sourceGroups": [{"name": "Source Files", "sourceIndexes": list(range(len(sources)))}],
+        "compileGroups": [{"language": "C", "sourceIndexes": list(range(len(sources))),
+                           "includes": [{"path": "include"}]}],
+    }
+
+def generateSynthReply(outDir, synthCfg):
+    """
+    Write a synthetic CMake reply, source tree and build tree.
+
+    Arguments:
+        - outDir: directory to write to; "src" and "build" are created in it
+        - synthCfg: SynthConfig
+    Returns: path to the reply's index file
+    """
+    rnd = random.Random(synthCfg.seed)
+    srcDir = os.path.abspath(os.path.join(outDir, "src"))
+    buildDir = os.path.abspath(os.path.join(outDir, "build"))
+    replyDir = os.path.join(buildDir, ".cmake", "api", "v1", "reply")
+    os.makedirs(replyDir, exist_ok=True)
+
+    writeFile(os.path.join(srcDir, "CMakeLists.txt"), b"cmake_minimum_required(VERSION 3.13)\nproject(synth C)\n")
+    for h in range(synthCfg.numHeaders):
+        writeFile(os.path.join(srcDir, "include", f"common{h:03d}.h"),
+                  makeSourceData(rnd, synthCfg.sourceSize, f"common{h}"))
+
+    targetIDs = [f"{getTargetName(synthCfg, i)}::@{i:08x}" for i in range(synthCfg.numTargets)]
+    directories = [{"source": ".", "build": "."}]
+    cfgTargets = {configName: [] for configName in synthCfg.configNames}
+    for i in range(synthCfg.numTargets):
+        name = getTargetName(synthCfg, i)
+        deps = sorted(rnd.sample(range(i), min(synthCfg.fanOut, i)))
+        directories.append({"source": name, "build": name, "parentIndex": 0})
+        for configName in synthCfg.configNames:
+            js = makeTargetJSON(synthCfg, i, targetIDs, deps, configName)
+            jsonFile = f"target-{name}-{configName}.json" if configName else f"target-{name}.json"
+            with open(os.path.join(replyDir, jsonFile), "w") as f:
+                json.dump(js, f, indent=2)
+            cfgTargets[configName].append({"name": name, "id": targetIDs[i], "directoryIndex": i + 1,
+                                           "projectIndex": 0, "jsonFile": jsonFile})
+
+        # sources, and an object file for each in the build tree
+        for j in range(synthCfg.sourcesPerTarget):
+            srcName = f"src{j:04d}.c"
+            writeFile(os.path.join(srcDir, name, srcName),
+                      makeSourceData(rnd, synthCfg.sourceSize, f"{name}_{srcName[:-2]}"))
+            for configName in synthCfg.configNames:
+                objPath = os.path.join(buildDir, name, "CMakeFiles", name + ".dir", configName, srcName + ".obj")
+                writeFile(objPath, rnd.randbytes(max(synthCfg.sourceSize // 2, 1)))
+        for configName in synthCfg.configNames:
+            writeFile(os.path.join(buildDir, getArtifactPath(synthCfg, i, configName)), rnd.randbytes(synthCfg.artifactSize))
+
+    configurations = []
+    for configName in synthCfg.configNames:
+        configurations.append({
+            "name": configName,
+            "directories": directories,
+            "projects": [{"name": "synth", "directoryIndexes": list(range(len(directories))),
+                          "targetIndexes": list(range(synthCfg.numTargets))}],
+            "targets": cfgTargets[configName],
+        })
+    codemodel = {
+        "kind": "codemodel",
+        "version": {"major": 2, "minor": 0},
+        "paths": {"source": srcDir, "build": buildDir},
+        "configurations": configurations,
+    }
+    codemodelFile = "codemodel-v2-synth.json"
+    with open(os.path.join(replyDir, codemodelFile), "w") as f:
+        json.dump(codemodel, f, indent=2)
+
+    index = {
+        "cmake": {"version": {"string": "3.18.0"}},
+        "objects": [{"kind": "codemodel", "version": {"major": 2, "minor": 0}, "jsonFile": codemodelFile}],
+        "reply": {"codemodel-v2": {"kind": "codemodel", "version": {"major": 2, "minor": 0}, "jsonFile": codemodelFile}},
+    }
+    indexPath = os.path.join(replyDir, SYNTH_INDEX_FILE)
+    with open(indexPath, "w") as f:
+        json.dump(index, f, indent=2)
+    return indexPath
+
+def addSynthArguments(parser):
+    """Add the arguments for SynthConfig's settings to an argparse parser."""
+    parser.add_argument("--targets", type=int, default=200, help="number of targets (default 200)")
+    parser.add_argument("--sources", type=int, default=50, help="number of sources per target (default 50)")
+    parser.add_argument("--fan-out", type=int, default=3,
+                        help="maximum number of earlier targets each target depends on (default 3)")
+    parser.add_argument("--artifact-size", type=int, default=64 * 1024,
+                        help="size in bytes of each target's artifact (default 65536)")
+    parser.add_argument("--source-size", type=int, default=2 * 1024,
+                        help="approximate size in bytes of each source file (default 2048)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed (default 1)")
+    parser.add_argument("--configs", default="",
+                        help="comma-separated configuration names, for a multi-configuration build (default: one unnamed configuration)")
+
+def makeSynthConfig(args):
+    """Make a SynthConfig from arguments added by addSynthArguments."""
+    synthCfg = SynthConfig()
+    synthCfg.numTargets = args.targets
+    synthCfg.sourcesPerTarget = args.sources
+    synthCfg.fanOut = args.fan_out
+    synthCfg.artifactSize = args.artifact_size
+    synthCfg.sourceSize = args.source_size
+    synthCfg.seed = args.seed
+    if args.configs:
+        synthCfg.configNames = args.configs.split(",")
+    return synthCfg
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic CMake reply with source and build trees")
+    parser.add_argument("outDir", metavar="output-dir")
+    addSynthArguments(parser)
+    args = parser.parse_args()
+
+    print(generateSynthReply(args.outDir, makeSynthConfig(args)))
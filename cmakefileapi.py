@@ -1,8 +1,18 @@
 # SPDX-License-Identifier: Apache-2.0
 
+from array import array
 from enum import Enum
 
+# Index lists (e.g. sourceIndexes, childIndexes) are stored as arrays of
+# C ints rather than lists, since there may be very many of them.
+INDEX_TYPECODE = "i"
+
+def makeIndexArray(indexes=()):
+    """Return an index array holding the given indexes."""
+    return array(INDEX_TYPECODE, indexes)
+
 class Codemodel:
+    __slots__ = ("paths_source", "paths_build", "configurations")
 
     def __init__(self):
         super(Codemodel, self).__init__()
@@ -16,6 +26,7 @@ class Codemodel:
 
 # A member of the codemodel configurations array
 class Config:
+    __slots__ = ("name", "directories", "projects", "configTargets")
 
     def __init__(self):
         super(Config, self).__init__()
@@ -33,6 +44,11 @@ class Config:
 
 # A member of the configuration.directories array
 class ConfigDir:
+    __slots__ = (
+        "source", "build", "parentIndex", "childIndexes", "projectIndex",
+        "targetIndexes", "minimumCMakeVersion", "hasInstallRule", "parent",
+        "children", "project", "targets",
+    )
 
     def __init__(self):
         super(ConfigDir, self).__init__()
@@ -40,9 +56,9 @@ class ConfigDir:
         self.source = ""
         self.build = ""
         self.parentIndex = -1
-        self.childIndexes = []
+        self.childIndexes = makeIndexArray()
         self.projectIndex = -1
-        self.targetIndexes = []
+        self.targetIndexes = makeIndexArray()
         self.minimumCMakeVersion = ""
         self.hasInstallRule = False
 
@@ -57,15 +73,19 @@ class ConfigDir:
 
 # A member of the configuration.projects array
 class ConfigProject:
+    __slots__ = (
+        "name", "parentIndex", "childIndexes", "directoryIndexes",
+        "targetIndexes", "parent", "children", "directories", "targets",
+    )
 
     def __init__(self):
         super(ConfigProject, self).__init__()
 
         self.name = ""
         self.parentIndex = -1
-        self.childIndexes = []
-        self.directoryIndexes = []
-        self.targetIndexes = []
+        self.childIndexes = makeIndexArray()
+        self.directoryIndexes = makeIndexArray()
+        self.targetIndexes = makeIndexArray()
 
         # actual items, calculated from indices after loading
         self.parent = None
@@ -78,6 +98,10 @@ class ConfigProject:
 
 # A member of the configuration.configTargets array
 class ConfigTarget:
+    __slots__ = (
+        "name", "id", "directoryIndex", "projectIndex", "jsonFile",
+        "targetLoader", "loadedTarget", "directory", "project",
+    )
 
     def __init__(self):
         super(ConfigTarget, self).__init__()
@@ -88,13 +112,37 @@ class ConfigTarget:
         self.projectIndex = -1
         self.jsonFile = ""
 
-        # actual target data, loaded from self.jsonFile
-        self.target = None
+        # function taking no arguments and returning the Target parsed
+        # from self.jsonFile; if set, it is called on first access to
+        # self.target
+        self.targetLoader = None
+
+        # actual target data, loaded from self.jsonFile; see target below
+        self.loadedTarget = None
 
         # actual items, calculated from indices after loading
         self.directory = None
         self.project = None
 
+    # actual target data, loaded from self.jsonFile when first accessed
+    # if it wasn't loaded already
+    @property
+    def target(self):
+        if self.targetLoader is not None:
+            loader = self.targetLoader
+            self.targetLoader = None
+            self.loadedTarget = loader()
+        return self.loadedTarget
+
+    @target.setter
+    def target(self, target):
+        self.targetLoader = None
+        self.loadedTarget = target
+
+    # has the target data been loaded yet?
+    def isTargetLoaded(self):
+        return self.targetLoader is None
+
     def __repr__(self):
         return f"ConfigTarget: {self.name}"
 
@@ -110,6 +158,7 @@ class TargetType(Enum):
 
 # A member of the target.install_destinations array
 class TargetInstallDestination:
+    __slots__ = ("path", "backtrace")
 
     def __init__(self):
         super(TargetInstallDestination, self).__init__()
@@ -123,6 +172,7 @@ class TargetInstallDestination:
 # A member of the target.link_commandFragments and
 # archive_commandFragments array
 class TargetCommandFragment:
+    __slots__ = ("fragment", "role")
 
     def __init__(self):
         super(TargetCommandFragment, self).__init__()
@@ -135,6 +185,7 @@ class TargetCommandFragment:
 
 # A member of the target.dependencies array
 class TargetDependency:
+    __slots__ = ("id", "backtrace")
 
     def __init__(self):
         super(TargetDependency, self).__init__()
@@ -147,6 +198,10 @@ class TargetDependency:
 
 # A member of the target.sources array
 class TargetSource:
+    __slots__ = (
+        "path", "compileGroupIndex", "sourceGroupIndex", "isGenerated",
+        "backtrace", "compileGroup", "sourceGroup",
+    )
 
     def __init__(self):
         super(TargetSource, self).__init__()
@@ -166,12 +221,13 @@ class TargetSource:
 
 # A member of the target.sourceGroups array
 class TargetSourceGroup:
+    __slots__ = ("name", "sourceIndexes", "sources")
 
     def __init__(self):
         super(TargetSourceGroup, self).__init__()
 
         self.name = ""
-        self.sourceIndexes = []
+        self.sourceIndexes = makeIndexArray()
 
         # actual items, calculated from indices after loading
         self.sources = []
@@ -181,6 +237,7 @@ class TargetSourceGroup:
 
 # A member of the target.compileGroups.includes array
 class TargetCompileGroupInclude:
+    __slots__ = ("path", "isSystem", "backtrace")
 
     def __init__(self):
         super(TargetCompileGroupInclude, self).__init__()
@@ -194,6 +251,7 @@ class TargetCompileGroupInclude:
 
 # A member of the target.compileGroups.precompileHeaders array
 class TargetCompileGroupPrecompileHeader:
+    __slots__ = ("header", "backtrace")
 
     def __init__(self):
         super(TargetCompileGroupPrecompileHeader, self).__init__()
@@ -206,6 +264,7 @@ class TargetCompileGroupPrecompileHeader:
 
 # A member of the target.compileGroups.defines array
 class TargetCompileGroupDefine:
+    __slots__ = ("define", "backtrace")
 
     def __init__(self):
         super(TargetCompileGroupDefine, self).__init__()
@@ -218,11 +277,15 @@ class TargetCompileGroupDefine:
 
 # A member of the target.compileGroups array
 class TargetCompileGroup:
+    __slots__ = (
+        "sourceIndexes", "language", "compileCommandFragments", "includes",
+        "precompileHeaders", "defines", "sysroot", "sources",
+    )
 
     def __init__(self):
         super(TargetCompileGroup, self).__init__()
 
-        self.sourceIndexes = []
+        self.sourceIndexes = makeIndexArray()
         self.language = ""
         self.compileCommandFragments = []
         self.includes = []
@@ -238,6 +301,7 @@ class TargetCompileGroup:
 
 # A member of the target.backtraceGraph_nodes array
 class TargetBacktraceGraphNode:
+    __slots__ = ("file", "line", "command", "parent")
 
     def __init__(self):
         super(TargetBacktraceGraphNode, self).__init__()
@@ -250,9 +314,59 @@ class TargetBacktraceGraphNode:
     def __repr__(self):
         return f"TargetBacktraceGraphNode: {self.command}"
 
+# The target.backtraceGraph_nodes array. Stores each field of the nodes
+# in its own index array, and creates TargetBacktraceGraphNode objects
+# only when items are accessed; modifying those objects does not change
+# the stored nodes.
+class TargetBacktraceGraphNodes:
+    __slots__ = ("files", "lines", "commands", "parents")
+
+    def __init__(self):
+        super(TargetBacktraceGraphNodes, self).__init__()
+
+        self.files = makeIndexArray()
+        self.lines = makeIndexArray()
+        self.commands = makeIndexArray()
+        self.parents = makeIndexArray()
+
+    def append(self, node):
+        self.files.append(node.file)
+        self.lines.append(node.line)
+        self.commands.append(node.command)
+        self.parents.append(node.parent)
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        node = TargetBacktraceGraphNode()
+        node.file = self.files[i]
+        node.line = self.lines[i]
+        node.command = self.commands[i]
+        node.parent = self.parents[i]
+        return node
+
+    def __iter__(self):
+        for i in range(len(self.files)):
+            yield self[i]
+
+    def __repr__(self):
+        return f"TargetBacktraceGraphNodes: {len(self)} nodes"
+
 # Actual data in config.target.target, loaded from
 # config.target.jsonFile
 class Target:
+    __slots__ = (
+        "name", "id", "type", "backtrace", "folder", "paths_source",
+        "paths_build", "nameOnDisk", "artifacts", "isGeneratorProvided",
+        "install_prefix", "install_destinations", "link_language",
+        "link_commandFragments", "link_lto", "link_sysroot",
+        "archive_commandFragments", "archive_lto", "dependencies", "sources",
+        "sourceGroups", "compileGroups", "backtraceGraph_nodes",
+        "backtraceGraph_commands", "backtraceGraph_files",
+    )
 
     def __init__(self):
         super(Target, self).__init__()
@@ -296,7 +410,7 @@ class Target:
         self.compileGroups = []
 
         # graph of backtraces referenced from elsewhere
-        self.backtraceGraph_nodes = []
+        self.backtraceGraph_nodes = TargetBacktraceGraphNodes()
         self.backtraceGraph_commands = []
         self.backtraceGraph_files = []
 
@@ -1,79 +1,161 @@
 # SPDX-License-Identifier: Apache-2.0
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 import json
+import logging
 import os
+from sys import intern
 
 import cmakefileapi
-
-def parseReply(replyIndexPath):
+from cmakefileapi import makeIndexArray
+
+logger = logging.getLogger(__name__)
+
+# use a faster JSON decoder if one is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# default number of threads reading target files
+DEFAULT_READ_JOBS = 8
+
+# optional sections of a target file that can be parsed; the target's
+# name, ID, type, paths and other top-level values are always parsed
+TARGET_SECTIONS = [
+    "artifacts",
+    "install",
+    "link",
+    "archive",
+    "dependencies",
+    "sources",
+    "sourceGroups",
+    "compileGroups",
+    "backtraceGraph",
+]
+
+class ParseConfig:
+    def __init__(self):
+        super(ParseConfig, self).__init__()
+
+        # number of threads reading (and, if decodeJobs is 0, decoding)
+        # target files; 1 = read serially
+        self.readJobs = DEFAULT_READ_JOBS
+
+        # number of worker processes decoding target files' JSON;
+        # 0 = decode in the reading threads
+        self.decodeJobs = 0
+
+        # should target files only be parsed when ConfigTarget.target is
+        # first accessed, rather than all at once while parsing the reply?
+        self.lazyTargets = False
+
+        # list of names from TARGET_SECTIONS to parse from target files;
+        # other sections are left empty. None = parse all sections
+        self.targetSections = None
+
+# Function used to decode JSON: takes bytes or str, returns the decoded
+# object, raises ValueError on invalid JSON. Defaults to orjson if
+# installed, or else the standard json module; see setJSONDecoder.
+jsonDecoder = orjson.loads if orjson is not None else json.loads
+
+# Replace the function used to decode JSON.
+# takes: function taking bytes and returning the decoded object, raising
+#   ValueError (e.g. json.JSONDecodeError) on invalid JSON; or None to
+#   restore the default
+# Note that decoding worker processes (ParseConfig.decodeJobs) only see
+# the replaced function on platforms where they are forked.
+def setJSONDecoder(decoder):
+    global jsonDecoder
+    if decoder is None:
+        decoder = orjson.loads if orjson is not None else json.loads
+    jsonDecoder = decoder
+
+# Decode JSON with the current decoder.
+# takes: bytes
+# returns: decoded object
+def decodeJSON(buf):
+    return jsonDecoder(buf)
+
+# Read a file's contents.
+# takes: path to file
+# returns: bytes
+def readFile(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def parseReply(replyIndexPath, parseCfg=None):
     replyDir, replyIndexFilename = os.path.split(replyIndexPath)
+    if parseCfg is None:
+        parseCfg = ParseConfig()
 
     # first we need to find the codemodel reply file
     try:
-        with open(replyIndexPath, 'r') as indexFile:
-            js = json.load(indexFile)
-
-            # get reply object
-            reply_dict = js.get("reply", {})
-            if reply_dict == {}:
-                print(f"no \"reply\" field found in index file")
-                return None
-            # get codemodel object
-            cm_dict = reply_dict.get("codemodel-v2", {})
-            if cm_dict == {}:
-                print(f"no \"codemodel-v2\" field found in \"reply\" object in index file")
-                return None
-            # and get codemodel filename
-            jsonFile = cm_dict.get("jsonFile", "")
-            if jsonFile == "":
-                print(f"no \"jsonFile\" field found in \"codemodel-v2\" object in index file")
-                return None
-
-            return parseCodemodel(replyDir, jsonFile)
+        js = decodeJSON(readFile(replyIndexPath))
+
+        # get reply object
+        reply_dict = js.get("reply", {})
+        if reply_dict == {}:
+            logger.error(f"no \"reply\" field found in index file")
+            return None
+        # get codemodel object
+        cm_dict = reply_dict.get("codemodel-v2", {})
+        if cm_dict == {}:
+            logger.error(f"no \"codemodel-v2\" field found in \"reply\" object in index file")
+            return None
+        # and get codemodel filename
+        jsonFile = cm_dict.get("jsonFile", "")
+        if jsonFile == "":
+            logger.error(f"no \"jsonFile\" field found in \"codemodel-v2\" object in index file")
+            return None
+
+        return parseCodemodel(replyDir, jsonFile, parseCfg)
 
     except OSError as e:
-        print(f"Error loading {replyIndexPath}: {str(e)}")
+        logger.error(f"Unable to load {replyIndexPath}: {str(e)}")
         return None
-    except json.decoder.JSONDecodeError as e:
-        print(f"Error parsing JSON in {replyIndexPath}: {str(e)}")
+    except ValueError as e:
+        logger.error(f"Unable to parse JSON in {replyIndexPath}: {str(e)}")
         return None
 
-def parseCodemodel(replyDir, codemodelFile):
+def parseCodemodel(replyDir, codemodelFile, parseCfg=None):
     codemodelPath = os.path.join(replyDir, codemodelFile)
+    if parseCfg is None:
+        parseCfg = ParseConfig()
 
     try:
-        with open(codemodelPath, 'r') as cmFile:
-            js = json.load(cmFile)
+        js = decodeJSON(readFile(codemodelPath))
 
-            cm = cmakefileapi.Codemodel()
+        cm = cmakefileapi.Codemodel()
 
-            # FIXME for correctness, should probably check kind and version
+        # FIXME for correctness, should probably check kind and version
 
-            # get paths
-            paths_dict = js.get("paths", {})
-            cm.paths_source = paths_dict.get("source", "")
-            cm.paths_build = paths_dict.get("build", "")
+        # get paths
+        paths_dict = js.get("paths", {})
+        cm.paths_source = paths_dict.get("source", "")
+        cm.paths_build = paths_dict.get("build", "")
 
-            # get configurations
-            configs_arr = js.get("configurations", [])
-            for cfg_dict in configs_arr:
-                cfg = parseConfig(cfg_dict, replyDir)
-                if cfg:
-                    cm.configurations.append(cfg)
+        # get configurations
+        configs_arr = js.get("configurations", [])
+        for cfg_dict in configs_arr:
+            cfg = parseConfig(cfg_dict, replyDir, parseCfg)
+            if cfg:
+                cm.configurations.append(cfg)
 
-            # and after parsing is done, link all the indices
-            linkCodemodel(cm)
+        # and after parsing is done, link all the indices
+        linkCodemodel(cm)
 
-            return cm
+        return cm
 
     except OSError as e:
-        print(f"Error loading {replyIndexPath}: {str(e)}")
+        logger.error(f"Unable to load {codemodelPath}: {str(e)}")
         return None
-    except json.decoder.JSONDecodeError as e:
-        print(f"Error parsing JSON in {replyIndexPath}: {str(e)}")
+    except ValueError as e:
+        logger.error(f"Unable to parse JSON in {codemodelPath}: {str(e)}")
         return None
 
-def parseConfig(cfg_dict, replyDir):
+def parseConfig(cfg_dict, replyDir, parseCfg=None):
     cfg = cmakefileapi.Config()
     cfg.name = cfg_dict.get("name", "")
 
@@ -82,12 +164,12 @@ def parseConfig(cfg_dict, replyDir):
     for dir_dict in dirs_arr:
         if dir_dict != {}:
             cfgdir = cmakefileapi.ConfigDir()
-            cfgdir.source = dir_dict.get("source", "")
-            cfgdir.build = dir_dict.get("build", "")
+            cfgdir.source = intern(dir_dict.get("source", ""))
+            cfgdir.build = intern(dir_dict.get("build", ""))
             cfgdir.parentIndex = dir_dict.get("parentIndex", -1)
-            cfgdir.childIndexes = dir_dict.get("childIndexes", [])
+            cfgdir.childIndexes = makeIndexArray(dir_dict.get("childIndexes", []))
             cfgdir.projectIndex = dir_dict.get("projecttIndex", -1)
-            cfgdir.targetIndexes = dir_dict.get("targetIndexes", [])
+            cfgdir.targetIndexes = makeIndexArray(dir_dict.get("targetIndexes", []))
             minCMakeVer_dict = dir_dict.get("minimumCMakeVersion", {})
             cfgdir.minimumCMakeVersion = minCMakeVer_dict.get("string", "")
             cfgdir.hasInstallRule = dir_dict.get("hasInstallRule", False)
@@ -100,9 +182,9 @@ def parseConfig(cfg_dict, replyDir):
             prj = cmakefileapi.ConfigProject()
             prj.name = prj_dict.get("name", "")
             prj.parentIndex = prj_dict.get("parentIndex", -1)
-            prj.childIndexes = prj_dict.get("childIndexes", [])
-            prj.directoryIndexes = prj_dict.get("directoryIndexes", [])
-            prj.targetIndexes = prj_dict.get("targetIndexes", [])
+            prj.childIndexes = makeIndexArray(prj_dict.get("childIndexes", []))
+            prj.directoryIndexes = makeIndexArray(prj_dict.get("directoryIndexes", []))
+            prj.targetIndexes = makeIndexArray(prj_dict.get("targetIndexes", []))
             cfg.projects.append(prj)
 
     # parse and add each target
@@ -115,64 +197,137 @@ def parseConfig(cfg_dict, replyDir):
             cfgTarget.directoryIndex = cfgTarget_dict.get("directoryIndex", -1)
             cfgTarget.projectIndex = cfgTarget_dict.get("projectIndex", -1)
             cfgTarget.jsonFile = cfgTarget_dict.get("jsonFile", "")
-
-            if cfgTarget.jsonFile != "":
-                cfgTarget.target = parseTarget(os.path.join(replyDir, cfgTarget.jsonFile))
-            else:
-                cfgTarget.target = None
-
+            cfgTarget.target = None
             cfg.configTargets.append(cfgTarget)
 
+    if parseCfg is None:
+        parseCfg = ParseConfig()
+    loadTargets = [cfgTarget for cfgTarget in cfg.configTargets if cfgTarget.jsonFile != ""]
+
+    # if loading lazily, just record how to parse each target's own file
+    if parseCfg.lazyTargets:
+        for cfgTarget in loadTargets:
+            targetPath = os.path.join(replyDir, cfgTarget.jsonFile)
+            cfgTarget.targetLoader = partial(parseTarget, targetPath, parseCfg.targetSections)
+        return cfg
+
+    # otherwise load the targets' own files now, concurrently; results
+    # come back in the same order as the targets
+    targetPaths = [os.path.join(replyDir, cfgTarget.jsonFile) for cfgTarget in loadTargets]
+    jss = loadJSONFiles(targetPaths, parseCfg)
+    for cfgTarget, js in zip(loadTargets, jss):
+        if js is not None:
+            cfgTarget.target = parseTargetJSON(js, parseCfg.targetSections)
+
     return cfg
 
-def parseTarget(targetPath):
+# Read and decode several JSON files, using the thread and process pools
+# configured in parseCfg.
+# takes: array of paths to JSON files, ParseConfig
+# returns: array of decoded objects, in the same order as the paths;
+#   None for any file that couldn't be read or decoded
+def loadJSONFiles(paths, parseCfg=None):
+    if parseCfg is None:
+        parseCfg = ParseConfig()
+
+    readJobs = max(parseCfg.readJobs, 1)
+    if parseCfg.decodeJobs > 0:
+        with ThreadPoolExecutor(max_workers=readJobs) as readPool:
+            bufs = list(readPool.map(readFileOrNone, paths))
+        with ProcessPoolExecutor(max_workers=parseCfg.decodeJobs) as decodePool:
+            return list(decodePool.map(decodeJSONOrNone, paths, bufs, chunksize=16))
+
+    if readJobs == 1 or len(paths) <= 1:
+        return [loadJSONFile(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=readJobs) as readPool:
+        return list(readPool.map(loadJSONFile, paths))
+
+# Read a file's contents, printing an error if it can't be read.
+# takes: path to file
+# returns: bytes, or None on error
+def readFileOrNone(path):
     try:
-        with open(targetPath, 'r') as targetFile:
-            js = json.load(targetFile)
-
-            target = cmakefileapi.Target()
-
-            target.name = js.get("name", "")
-            target.id = js.get("id", "")
-            target.type = parseTargetType(js.get("type", "UNKNOWN"))
-            target.backtrace = js.get("backtrace", -1)
-            target.folder = js.get("folder", "")
-
-            # get paths
-            paths_dict = js.get("paths", {})
-            target.paths_source = paths_dict.get("source", "")
-            target.paths_build = paths_dict.get("build", "")
-
-            target.nameOnDisk = js.get("nameOnDisk", "")
-
-            # parse artifacts if present
-            artifacts_arr = js.get("artifacts", [])
-            target.artifacts = []
-            for artifact_dict in artifacts_arr:
-                artifact_path = artifact_dict.get("path", "")
-                if artifact_path != "":
-                    target.artifacts.append(artifact_path)
-
-            target.isGeneratorProvided = js.get("isGeneratorProvided", False)
-
-            # call separate functions to parse subsections
-            parseTargetInstall(target, js)
-            parseTargetLink(target, js)
-            parseTargetArchive(target, js)
-            parseTargetDependencies(target, js)
-            parseTargetSources(target, js)
-            parseTargetSourceGroups(target, js)
-            parseTargetCompileGroups(target, js)
-            parseTargetBacktraceGraph(target, js)
-
-            return target
-
+        return readFile(path)
     except OSError as e:
-        print(f"Error loading {replyIndexPath}: {str(e)}")
+        logger.error(f"Unable to load {path}: {str(e)}", extra={"category": "reply-file-unreadable", "path": path})
+        return None
+
+# Decode JSON, printing an error if it isn't valid.
+# takes: path the JSON was read from (for error messages), bytes or None
+# returns: decoded object, or None on error or if buf was None
+def decodeJSONOrNone(path, buf):
+    if buf is None:
+        return None
+    try:
+        return decodeJSON(buf)
+    except ValueError as e:
+        logger.error(f"Unable to parse JSON in {path}: {str(e)}", extra={"category": "reply-file-invalid", "path": path})
         return None
-    except json.decoder.JSONDecodeError as e:
-        print(f"Error parsing JSON in {replyIndexPath}: {str(e)}")
+
+# Read and decode a JSON file, printing an error if that fails.
+# takes: path to JSON file
+# returns: decoded object, or None on error
+def loadJSONFile(path):
+    return decodeJSONOrNone(path, readFileOrNone(path))
+
+# Parse a target file.
+# takes: path to target file, and list of names from TARGET_SECTIONS to
+#   parse (None = all)
+# returns: Target, or None on error
+def parseTarget(targetPath, sections=None):
+    js = loadJSONFile(targetPath)
+    if js is None:
         return None
+    return parseTargetJSON(js, sections)
+
+# Parse a target from its decoded JSON.
+# takes: decoded target file, and list of names from TARGET_SECTIONS to
+#   parse (None = all)
+# returns: Target
+def parseTargetJSON(js, sections=None):
+    if sections is None:
+        sections = TARGET_SECTIONS
+
+    target = cmakefileapi.Target()
+
+    target.name = js.get("name", "")
+    target.id = js.get("id", "")
+    target.type = parseTargetType(js.get("type", "UNKNOWN"))
+    target.backtrace = js.get("backtrace", -1)
+    target.folder = js.get("folder", "")
+
+    # get paths
+    paths_dict = js.get("paths", {})
+    target.paths_source = intern(paths_dict.get("source", ""))
+    target.paths_build = intern(paths_dict.get("build", ""))
+
+    target.nameOnDisk = js.get("nameOnDisk", "")
+    target.isGeneratorProvided = js.get("isGeneratorProvided", False)
+
+    # call separate functions to parse requested subsections
+    if "artifacts" in sections:
+        parseTargetArtifacts(target, js)
+    if "install" in sections:
+        parseTargetInstall(target, js)
+    if "link" in sections:
+        parseTargetLink(target, js)
+    if "archive" in sections:
+        parseTargetArchive(target, js)
+    if "dependencies" in sections:
+        parseTargetDependencies(target, js)
+    if "sources" in sections:
+        parseTargetSources(target, js)
+    if "sourceGroups" in sections:
+        parseTargetSourceGroups(target, js)
+    if "compileGroups" in sections:
+        parseTargetCompileGroups(target, js)
+    if "backtraceGraph" in sections:
+        parseTargetBacktraceGraph(target, js)
+
+    # and link the target's own indices
+    linkTarget(target)
+
+    return target
 
 def parseTargetType(targetType):
     if targetType == "EXECUTABLE":
@@ -190,17 +345,25 @@ def parseTargetType(targetType):
     else:
         return cmakefileapi.TargetType.UNKNOWN
 
+def parseTargetArtifacts(target, js):
+    artifacts_arr = js.get("artifacts", [])
+    target.artifacts = []
+    for artifact_dict in artifacts_arr:
+        artifact_path = artifact_dict.get("path", "")
+        if artifact_path != "":
+            target.artifacts.append(intern(artifact_path))
+
 def parseTargetInstall(target, js):
     install_dict = js.get("install", {})
     if install_dict == {}:
         return
     prefix_dict = install_dict.get("prefix", {})
-    target.install_prefix = prefix_dict.get("path", "")
+    target.install_prefix = intern(prefix_dict.get("path", ""))
 
     destinations_arr = install_dict.get("destinations", [])
     for destination_dict in destinations_arr:
         dest = cmakefileapi.TargetInstallDestination()
-        dest.path = destination_dict.get("path", "")
+        dest.path = intern(destination_dict.get("path", ""))
         dest.backtrace = destination_dict.get("backtrace", -1)
         target.install_destinations.append(dest)
 
@@ -211,13 +374,13 @@ def parseTargetLink(target, js):
     target.link_language = link_dict.get("language", {})
     target.link_lto = link_dict.get("lto", False)
     sysroot_dict = link_dict.get("sysroot", {})
-    target.link_sysroot = sysroot_dict.get("path", "")
+    target.link_sysroot = intern(sysroot_dict.get("path", ""))
 
     fragments_arr = link_dict.get("commandFragments", [])
     for fragment_dict in fragments_arr:
         fragment = cmakefileapi.TargetCommandFragment()
-        fragment.fragment = fragment_dict.get("fragment", "")
-        fragment.role = fragment_dict.get("role", "")
+        fragment.fragment = intern(fragment_dict.get("fragment", ""))
+        fragment.role = intern(fragment_dict.get("role", ""))
         target.link_commandFragments.append(fragment)
 
 def parseTargetArchive(target, js):
@@ -229,8 +392,8 @@ def parseTargetArchive(target, js):
     fragments_arr = archive_dict.get("commandFragments", [])
     for fragment_dict in fragments_arr:
         fragment = cmakefileapi.TargetCommandFragment()
-        fragment.fragment = fragment_dict.get("fragment", "")
-        fragment.role = fragment_dict.get("role", "")
+        fragment.fragment = intern(fragment_dict.get("fragment", ""))
+        fragment.role = intern(fragment_dict.get("role", ""))
         target.archive_commandFragments.append(fragment)
 
 def parseTargetDependencies(target, js):
@@ -245,7 +408,7 @@ def parseTargetSources(target, js):
     sources_arr = js.get("sources", [])
     for source_dict in sources_arr:
         src = cmakefileapi.TargetSource()
-        src.path = source_dict.get("path", "")
+        src.path = intern(source_dict.get("path", ""))
         src.compileGroupIndex = source_dict.get("compileGroupIndex", -1)
         src.sourceGroupIndex = source_dict.get("sourceGroupIndex", -1)
         src.isGenerated = source_dict.get("isGenerated", False)
@@ -256,28 +419,28 @@ def parseTargetSourceGroups(target, js):
     sourceGroups_arr = js.get("sourceGroups", [])
     for sourceGroup_dict in sourceGroups_arr:
         srcgrp = cmakefileapi.TargetSourceGroup()
-        srcgrp.name = sourceGroup_dict.get("name", "")
-        srcgrp.sourceIndexes = sourceGroup_dict.get("sourceIndexes", [])
+        srcgrp.name = intern(sourceGroup_dict.get("name", ""))
+        srcgrp.sourceIndexes = makeIndexArray(sourceGroup_dict.get("sourceIndexes", []))
         target.sourceGroups.append(srcgrp)
 
 def parseTargetCompileGroups(target, js):
     compileGroups_arr = js.get("compileGroups", [])
     for compileGroup_dict in compileGroups_arr:
         cmpgrp = cmakefileapi.TargetCompileGroup()
-        cmpgrp.sourceIndexes = compileGroup_dict.get("sourceIndexes", [])
-        cmpgrp.language = compileGroup_dict.get("language", "")
+        cmpgrp.sourceIndexes = makeIndexArray(compileGroup_dict.get("sourceIndexes", []))
+        cmpgrp.language = intern(compileGroup_dict.get("language", ""))
         cmpgrp.sysroot = compileGroup_dict.get("sysroot", "")
 
         commandFragments_arr = compileGroup_dict.get("compileCommandFragments", [])
         for commandFragment_dict in commandFragments_arr:
             fragment = commandFragment_dict.get("fragment", "")
             if fragment != "":
-                cmpgrp.compileCommandFragments.append(fragment)
+                cmpgrp.compileCommandFragments.append(intern(fragment))
 
         includes_arr = compileGroup_dict.get("includes", [])
         for include_dict in includes_arr:
             grpInclude = cmakefileapi.TargetCompileGroupInclude()
-            grpInclude.path = include_dict.get("path", "")
+            grpInclude.path = intern(include_dict.get("path", ""))
             grpInclude.isSystem = include_dict.get("isSystem", False)
             grpInclude.backtrace = include_dict.get("backtrace", -1)
             cmpgrp.includes.append(grpInclude)
@@ -285,14 +448,14 @@ def parseTargetCompileGroups(target, js):
         precompileHeaders_arr = compileGroup_dict.get("precompileHeaders", [])
         for precompileHeader_dict in precompileHeaders_arr:
             grpHeader = cmakefileapi.TargetCompileGroupPrecompileHeader()
-            grpHeader.header = precompileHeader_dict.get("header", "")
+            grpHeader.header = intern(precompileHeader_dict.get("header", ""))
             grpHeader.backtrace = precompileHeader_dict.get("backtrace", -1)
             cmpgrp.precompileHeaders.append(grpHeader)
 
         defines_arr = compileGroup_dict.get("defines", [])
         for define_dict in defines_arr:
             grpDefine = cmakefileapi.TargetCompileGroupDefine()
-            grpDefine.define = define_dict.get("define", "")
+            grpDefine.define = intern(define_dict.get("define", ""))
             grpDefine.backtrace = define_dict.get("backtrace", -1)
             cmpgrp.defines.append(grpDefine)
 
@@ -302,8 +465,8 @@ def parseTargetBacktraceGraph(target, js):
     backtraceGraph_dict = js.get("backtraceGraph", {})
     if backtraceGraph_dict == {}:
         return
-    target.backtraceGraph_commands = backtraceGraph_dict.get("commands", [])
-    target.backtraceGraph_files = backtraceGraph_dict.get("files", [])
+    target.backtraceGraph_commands = [intern(c) for c in backtraceGraph_dict.get("commands", [])]
+    target.backtraceGraph_files = [intern(f) for f in backtraceGraph_dict.get("files", [])]
 
     nodes_arr = backtraceGraph_dict.get("nodes", [])
     for node_dict in nodes_arr:
@@ -384,37 +547,45 @@ def linkConfigTarget(cfg, cfgTarget):
     else:
         cfgTarget.project = cfg.projects[cfgTarget.projectIndex]
 
-    # and link target's sources and source groups
-    for ts in cfgTarget.target.sources:
-        linkTargetSource(cfgTarget.target, ts)
-    for tsg in cfgTarget.target.sourceGroups:
-        linkTargetSourceGroup(cfgTarget.target, tsg)
-    for tcg in cfgTarget.target.compileGroups:
-        linkTargetCompileGroup(cfgTarget.target, tcg)
-
-# Create direct pointers for TargetSource indices
+# Create direct pointers for all contents of Target; called when the
+# target is parsed, since that may happen after the Config is linked
+# takes: Target
+def linkTarget(target):
+    for ts in target.sources:
+        linkTargetSource(target, ts)
+    for tsg in target.sourceGroups:
+        linkTargetSourceGroup(target, tsg)
+    for tcg in target.compileGroups:
+        linkTargetCompileGroup(target, tcg)
+
+# Create direct pointers for TargetSource indices; groups in sections
+# that weren't parsed are left as None
 # takes: Target and TargetSource
 def linkTargetSource(target, targetSrc):
-    if targetSrc.compileGroupIndex == -1:
+    if targetSrc.compileGroupIndex == -1 or targetSrc.compileGroupIndex >= len(target.compileGroups):
         targetSrc.compileGroup = None
     else:
         targetSrc.compileGroup = target.compileGroups[targetSrc.compileGroupIndex]
 
-    if targetSrc.sourceGroupIndex == -1:
+    if targetSrc.sourceGroupIndex == -1 or targetSrc.sourceGroupIndex >= len(target.sourceGroups):
         targetSrc.sourceGroup = None
     else:
         targetSrc.sourceGroup = target.sourceGroups[targetSrc.sourceGroupIndex]
 
-# Create direct pointers for TargetSourceGroup indices
+# Create direct pointers for TargetSourceGroup indices; if the sources
+# section wasn't parsed, the group's sources are left empty
 # takes: Target and TargetSourceGroup
 def linkTargetSourceGroup(target, targetSrcGrp):
     targetSrcGrp.sources = []
     for srcIndex in targetSrcGrp.sourceIndexes:
-        targetSrcGrp.sources.append(target.sources[srcIndex])
+        if srcIndex < len(target.sources):
+            targetSrcGrp.sources.append(target.sources[srcIndex])
 
-# Create direct pointers for TargetCompileGroup indices
+# Create direct pointers for TargetCompileGroup indices; if the sources
+# section wasn't parsed, the group's sources are left empty
 # takes: Target and TargetCompileGroup
 def linkTargetCompileGroup(target, targetCmpGrp):
     targetCmpGrp.sources = []
     for srcIndex in targetCmpGrp.sourceIndexes:
-        targetCmpGrp.sources.append(target.sources[srcIndex])
+        if srcIndex < len(target.sources):
+            targetCmpGrp.sources.append(target.sources[srcIndex])
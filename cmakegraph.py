@@ -0,0 +1,157 @@
+# SPDX-License-Identifier: Apache-2.0
+
+from cmakefileapi import TargetType
+
+# target types whose artifacts are linked into the targets depending on them
+LINKABLE_TARGET_TYPES = [TargetType.STATIC_LIBRARY, TargetType.OBJECT_LIBRARY]
+
+# Dependency graph of the targets in a CMake Config. Targets are numbered
+# by their position in Config.configTargets; sets of targets are stored as
+# integer bitsets, with bit N set for target N.
+class TargetGraph:
+
+    def __init__(self, cfg):
+        super(TargetGraph, self).__init__()
+
+        # Config this graph was built from
+        self.cfg = cfg
+
+        # ConfigTargets, by node number
+        self.configTargets = list(cfg.configTargets)
+
+        # target ID => node number
+        self.indexById = {}
+        for i, cfgTarget in enumerate(self.configTargets):
+            self.indexById[cfgTarget.id] = i
+
+        # node number => node numbers of direct dependencies, in the order
+        # listed by CMake; IDs not found in this Config are skipped
+        self.deps = []
+        # node number => node numbers of targets directly depending on it
+        self.rdeps = [[] for _ in self.configTargets]
+        for i, cfgTarget in enumerate(self.configTargets):
+            nodeDeps = []
+            if cfgTarget.target:
+                for dep in cfgTarget.target.dependencies:
+                    depIndex = self.indexById.get(dep.id)
+                    if depIndex is not None and depIndex not in nodeDeps:
+                        nodeDeps.append(depIndex)
+                        self.rdeps[depIndex].append(i)
+            self.deps.append(nodeDeps)
+
+        # node numbers ordered so that each target comes after all of its
+        # dependencies; targets in a cycle, if any, come last
+        self.topoOrder = []
+        self.hasCycle = False
+        self.calculateTopoOrder()
+
+        # node number => bitset of all direct and indirect dependencies
+        self.closure = []
+        self.calculateClosure()
+
+    def calculateTopoOrder(self):
+        """Fill in self.topoOrder and self.hasCycle, using Kahn's algorithm."""
+        remaining = [len(d) for d in self.deps]
+        ready = [i for i, n in enumerate(remaining) if n == 0]
+        pos = 0
+        while pos < len(ready):
+            i = ready[pos]
+            pos += 1
+            for r in self.rdeps[i]:
+                remaining[r] -= 1
+                if remaining[r] == 0:
+                    ready.append(r)
+        if len(ready) < len(self.deps):
+            self.hasCycle = True
+            seen = set(ready)
+            ready.extend([i for i in range(len(self.deps)) if i not in seen])
+        self.topoOrder = ready
+
+    def calculateClosure(self):
+        """Fill in self.closure, once self.topoOrder is known."""
+        self.closure = [0] * len(self.deps)
+        # a single pass in topological order is enough for an acyclic
+        # graph; with a cycle, repeat until nothing changes
+        changed = True
+        while changed:
+            changed = False
+            for i in self.topoOrder:
+                bits = 0
+                for d in self.deps[i]:
+                    bits |= (1 << d) | self.closure[d]
+                if bits != self.closure[i]:
+                    self.closure[i] = bits
+                    changed = True
+            if not self.hasCycle:
+                break
+
+    def getConfigTarget(self, targetId):
+        """Return ConfigTarget with the given target ID, or None."""
+        i = self.indexById.get(targetId)
+        if i is None:
+            return None
+        return self.configTargets[i]
+
+    def getTarget(self, targetId):
+        """Return Target with the given target ID, or None."""
+        cfgTarget = self.getConfigTarget(targetId)
+        if cfgTarget is None:
+            return None
+        return cfgTarget.target
+
+    def bitsToTargets(self, bits):
+        """Return Targets for the set bits, in node number order."""
+        targets = []
+        i = 0
+        while bits:
+            if bits & 1:
+                targets.append(self.configTargets[i].target)
+            bits >>= 1
+            i += 1
+        return targets
+
+    def getDependencies(self, targetId, transitive=False):
+        """
+        Find the targets that a target depends on.
+
+        Arguments:
+            - targetId: ID of target
+            - transitive: also include indirect dependencies?
+        Returns: array of Targets; direct dependencies are in CMake's
+                 order, transitive ones in node number order
+        """
+        i = self.indexById.get(targetId)
+        if i is None:
+            return []
+        if transitive:
+            return self.bitsToTargets(self.closure[i])
+        return [self.configTargets[d].target for d in self.deps[i]]
+
+    def getReverseDependencies(self, targetId, transitive=False):
+        """
+        Find the targets that depend on a target.
+
+        Arguments:
+            - targetId: ID of target
+            - transitive: also include targets depending on it indirectly?
+        Returns: array of Targets, in node number order
+        """
+        i = self.indexById.get(targetId)
+        if i is None:
+            return []
+        if not transitive:
+            return [self.configTargets[r].target for r in sorted(self.rdeps[i])]
+        bit = 1 << i
+        return [self.configTargets[n].target for n in range(len(self.closure)) if self.closure[n] & bit]
+
+    def getLinkDependencies(self, targetId, transitive=False):
+        """
+        Find the library targets whose artifacts link into a target.
+
+        Arguments:
+            - targetId: ID of target
+            - transitive: also include libraries linked in indirectly?
+        Returns: array of Targets
+        """
+        return [t for t in self.getDependencies(targetId, transitive)
+                if t and t.type in LINKABLE_TARGET_TYPES]
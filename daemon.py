@@ -0,0 +1,579 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import argparse
+import logging
+import os
+import selectors
+import signal
+import socket
+import sys
+import time
+
+from cmakefileapijson import parseReply
+from diagnostics import NORMAL, QUIET, VERBOSE, setupLogging
+from sbom import (OUTPUT_EXTENSIONS, SbomConfig, getBuildDocumentNames, getCmakeRelationships, getSourcesRootDirs,
+                  makeBuildDocumentConfig, makeBuildSpdx, makeSourcesDocumentConfig, makeSourcesSpdx)
+from spdx.cache import DEFAULT_MAX_ENTRIES, HashCache, MemoryCache
+from spdx.dedup import ScanDedup
+from spdx.watch import watchTrees
+
+logger = logging.getLogger("daemon")
+
+# Keeps cmake-spdx running alongside a build, and rewrites the SPDX
+# documents when the build changes them, without starting from scratch
+# each time. Between regenerations it keeps:
+#   - the parsed CMake reply and the relationships from it, until CMake
+#     writes a new reply;
+#   - the scan results of every file, in a MemoryCache, so that only
+#     files that changed are read again;
+#   - the sources document and its part of the relationship index, so
+#     that when only the build dir changes, only the build documents
+#     are rewritten.
+#
+# The reply dir, the sources dirs and the build dir are watched for
+# changes (see spdx.watch). Once they have been quiet for a moment, the
+# documents for whatever changed are regenerated. A rebuild touches many
+# files, so waiting for it to settle avoids regenerating over and over.
+#
+# It also listens on a unix socket for one-line commands, answering each
+# with one line starting with "ok:" or "error:":
+#   - regenerate: rewrite all the documents now, re-reading the reply if
+#     it has changed
+#   - status: report when the documents were last regenerated
+#   - stop: shut down
+
+# names of the watched trees
+REPLY = "reply"
+SOURCES = "sources"
+BUILD = "build"
+
+# default seconds to wait after the last change before regenerating
+DEFAULT_SETTLE_SECONDS = 2.0
+
+# default seconds between walks of the trees, when polling for changes
+DEFAULT_POLL_SECONDS = 5.0
+
+# name of the socket in the output directory, unless given
+DEFAULT_SOCKET_NAME = "cmake-spdx.sock"
+
+# longest command accepted on the socket, in bytes
+MAX_COMMAND_SIZE = 1024
+
+# seconds to wait for a client to send its command
+COMMAND_TIMEOUT = 5.0
+
+class SbomDaemon:
+    def __init__(self, replyIndexPath, spdxOutputDir, spdxNamespacePrefix, sbomCfg, socketPath,
+                 hashCache=None, collector=None):
+        super(SbomDaemon, self).__init__()
+
+        # path to the CMake reply index file; replaced by the newest one
+        # in the same directory when CMake writes a new reply
+        self.replyIndexPath = replyIndexPath
+
+        # output directory where SPDX documents will be written
+        self.spdxOutputDir = spdxOutputDir
+
+        # prefix for SPDX Document Namespace
+        self.spdxNamespacePrefix = spdxNamespacePrefix
+
+        # SbomConfig with options for each regeneration; its hashCache
+        # is replaced each time
+        self.sbomCfg = sbomCfg
+
+        # path of the unix socket to listen for commands on
+        self.socketPath = socketPath
+
+        # opened HashCache to keep scan results in between restarts, or None
+        self.hashCache = hashCache
+
+        # diagnostics.DiagnosticsCollector to summarize and reset after
+        # each regeneration, or None
+        self.collector = collector
+
+        # seconds to wait after the last change before regenerating
+        self.settleSeconds = DEFAULT_SETTLE_SECONDS
+
+        # seconds between walks of the trees, if polling for changes
+        self.pollSeconds = DEFAULT_POLL_SECONDS
+
+        # poll for changes, even if inotify is available?
+        self.usePolling = False
+
+        # scan results of every file scanned, in front of the hash cache
+        self.memoryCache = MemoryCache(hashCache)
+
+        # state kept from the last regeneration: the parsed reply and
+        # what was found from it, and the sources document
+        self.cm = None
+        self.srcRootDirs = None
+        self.fileRlnsByCfg = None
+        self.srcDocCfg = None
+        self.srcDoc = None
+
+        # holds the RelationshipIndex from the last build documents, so
+        # its sources part can be reused; see sbom.makeBuildSpdx
+        self.rlnIndexes = []
+
+        # spdx.watch watcher for the reply, sources and build trees
+        self.watcher = None
+
+        # listening socket for commands
+        self.server = None
+
+        # names of trees that have changed and not been regenerated yet,
+        # and time.monotonic() of the latest change
+        self.pending = set()
+        self.lastChange = 0.0
+
+        # set by the stop command
+        self.stopping = False
+
+        # number of regenerations done, and how the last one went
+        self.regenerations = 0
+        self.lastRegenerated = None
+        self.lastSucceeded = False
+
+    def loadReply(self):
+        """
+        Parse the CMake reply, and find the sources packages and the
+        relationships for each configuration. The documents made from an
+        earlier reply are dropped.
+
+        Returns: True on success, False on failure.
+        """
+        cm = parseReply(self.replyIndexPath, self.sbomCfg.parseCfg)
+        if cm is None:
+            return False
+        self.cm = cm
+        self.srcRootDirs = getSourcesRootDirs(cm)
+        self.fileRlnsByCfg = [getCmakeRelationships(cm, transitiveLinks=self.sbomCfg.transitiveLinks, cfg=cfg)
+                              for cfg in cm.configurations]
+        self.srcDocCfg = None
+        self.srcDoc = None
+        self.rlnIndexes = []
+        return True
+
+    def findNewestReply(self):
+        """
+        Return the path to the newest index file in the reply directory;
+        as the file API documents, that's the one whose name sorts last.
+        Returns the current path if there are none.
+        """
+        replyDir = os.path.dirname(os.path.abspath(self.replyIndexPath))
+        try:
+            names = [name for name in os.listdir(replyDir) if name.startswith("index-") and name.endswith(".json")]
+        except OSError:
+            return self.replyIndexPath
+        if len(names) == 0:
+            return self.replyIndexPath
+        return os.path.join(replyDir, max(names))
+
+    def getOutputPaths(self):
+        """Return list of absolute paths of the files this daemon writes."""
+        ext = OUTPUT_EXTENSIONS[self.sbomCfg.outputFormat]
+        docNames = ["sources"] + getBuildDocumentNames(self.cm)
+        paths = [os.path.join(self.spdxOutputDir, docName + ext) for docName in docNames]
+        paths.append(self.socketPath)
+        if self.hashCache is not None:
+            paths.extend([self.hashCache.cachePath, self.hashCache.cachePath + "-journal"])
+        return [os.path.abspath(path) for path in paths]
+
+    def getWatchedTrees(self):
+        """
+        Return the trees to watch: the reply directory, and each
+        directory scanned, with the same excludes as when it is scanned
+        plus the files written here, so writing them isn't seen as a
+        change.
+
+        Returns: list of (name, top directory, excludes) tuples
+        """
+        outputPaths = self.getOutputPaths()
+        trees = [(REPLY, os.path.dirname(os.path.abspath(self.replyIndexPath)), [])]
+        srcDocCfg = makeSourcesDocumentConfig(self.cm, self.srcRootDirs, self.spdxNamespacePrefix, self.sbomCfg)
+        for pkgCfg in srcDocCfg.packageConfigs.values():
+            trees.append((SOURCES, pkgCfg.scandir, pkgCfg.excludeDirs + outputPaths))
+        buildDocCfg = makeBuildDocumentConfig(self.cm, self.spdxNamespacePrefix, self.sbomCfg)
+        for pkgCfg in buildDocCfg.packageConfigs.values():
+            trees.append((BUILD, pkgCfg.scandir, pkgCfg.excludeDirs + outputPaths))
+        return trees
+
+    def startWatching(self):
+        """Start watching the trees for the current reply, replacing any earlier watcher."""
+        if self.watcher is not None:
+            self.watcher.close()
+        self.watcher = watchTrees(self.getWatchedTrees(), self.usePolling)
+
+    def noteChanges(self, changed):
+        """Record trees that have changed, to regenerate once they settle."""
+        if changed:
+            logger.debug(f"Changes seen in {', '.join(sorted(changed))}")
+            self.pending |= changed
+            self.lastChange = time.monotonic()
+
+    def regenerate(self, changed):
+        """
+        Rewrite the documents affected by changes to the named trees: all
+        of them if the reply or the sources changed, since the build
+        documents refer to the sources document by its hash; or just the
+        build documents if only the build dir changed.
+
+        Arguments:
+            - changed: set of names of trees that have changed
+        Returns: True on success, False on failure; on failure, the next
+                 regeneration rewrites all the documents
+        """
+        start = time.monotonic()
+        self.regenerations += 1
+        self.lastRegenerated = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self.lastSucceeded = False
+
+        if REPLY in changed or self.cm is None:
+            newestReply = self.findNewestReply()
+            if newestReply != self.replyIndexPath:
+                logger.info(f"Using new CMake reply {newestReply}")
+                self.replyIndexPath = newestReply
+            if not self.loadReply():
+                logger.error(f"Unable to regenerate SPDX documents: couldn't parse CMake reply {self.replyIndexPath}")
+                return False
+            self.startWatching()
+
+        # build documents can't be written without a sources document
+        doSources = SOURCES in changed or self.srcDoc is None
+
+        # dedup by inode and content is only for the length of one
+        # regeneration; the memory cache lasts until the daemon stops
+        self.memoryCache.startRun()
+        scanDedup = ScanDedup(self.memoryCache)
+        self.sbomCfg.hashCache = scanDedup
+        self.sbomCfg.contentIndex = scanDedup.contentIndex
+
+        written = []
+        if doSources:
+            self.srcDoc = None
+            res = makeSourcesSpdx(self.cm, self.srcRootDirs, self.spdxOutputDir, self.spdxNamespacePrefix, self.sbomCfg)
+            if res is None:
+                self.finishRegeneration()
+                return False
+            (self.srcDocCfg, self.srcDoc) = res
+            written.append("sources")
+
+        buildDocs = makeBuildSpdx(self.cm, self.srcDocCfg, self.srcDoc, self.fileRlnsByCfg, self.spdxOutputDir,
+                                  self.spdxNamespacePrefix, self.sbomCfg, rlnIndexes=self.rlnIndexes)
+        if buildDocs is None:
+            self.finishRegeneration()
+            return False
+        written.extend(getBuildDocumentNames(self.cm))
+
+        # forget files that were in the trees scanned, but weren't found
+        if doSources:
+            for srcRootDir in self.srcRootDirs.values():
+                self.memoryCache.prune(srcRootDir)
+        self.memoryCache.prune(self.cm.paths_build)
+
+        self.lastSucceeded = True
+        logger.info(f"Regenerated {', '.join(written)} in {time.monotonic() - start:.1f}s")
+        if scanDedup.hasSavings():
+            logger.info(scanDedup)
+        logger.info(self.memoryCache)
+        self.finishRegeneration()
+        return True
+
+    def finishRegeneration(self):
+        """Save pending hash cache writes, and summarize and forget the issues found."""
+        if self.hashCache is not None:
+            self.hashCache.flush()
+        if self.collector is not None:
+            for line in self.collector.getSummary():
+                print(line)
+            self.collector.reset()
+
+    def openSocket(self):
+        """
+        Listen for commands on the unix socket, replacing one left behind
+        by a daemon that has stopped.
+
+        Returns: True on success, False on error.
+        """
+        if os.path.exists(self.socketPath):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(self.socketPath)
+                    logger.error(f"Unable to listen on {self.socketPath}: another daemon is already listening there")
+                    return False
+                except OSError:
+                    pass
+            try:
+                os.unlink(self.socketPath)
+            except OSError as e:
+                logger.error(f"Unable to remove old socket {self.socketPath}: {str(e)}")
+                return False
+
+        try:
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(self.socketPath)
+            os.chmod(self.socketPath, 0o600)
+            self.server.listen()
+            self.server.setblocking(False)
+        except OSError as e:
+            logger.error(f"Unable to listen on {self.socketPath}: {str(e)}")
+            return False
+        return True
+
+    def handleConnection(self):
+        """Accept a connection on the socket, and run and answer its command."""
+        try:
+            (conn, _) = self.server.accept()
+        except OSError:
+            return
+        with conn:
+            try:
+                conn.settimeout(COMMAND_TIMEOUT)
+                data = b""
+                while b"\n" not in data and len(data) < MAX_COMMAND_SIZE:
+                    chunk = conn.recv(MAX_COMMAND_SIZE)
+                    if not chunk:
+                        break
+                    data += chunk
+                command = data.split(b"\n")[0].decode("utf-8", "replace").strip()
+                reply = self.runCommand(command)
+                conn.settimeout(None)
+                conn.sendall((reply + "\n").encode("utf-8"))
+            except OSError as e:
+                logger.warning(f"Lost connection on {self.socketPath}: {str(e)}")
+
+    def runCommand(self, command):
+        """
+        Run a command received on the socket.
+
+        Arguments:
+            - command: "regenerate", "status" or "stop"
+        Returns: one-line reply, starting with "ok:" or "error:"
+        """
+        logger.debug(f"Received command: {command}")
+        if command == "regenerate":
+            self.noteChanges(self.watcher.readChanges())
+            changed = self.pending | {SOURCES, BUILD}
+            self.pending = set()
+            if self.regenerate(changed):
+                return f"ok: regenerated SPDX documents in {self.spdxOutputDir}"
+            return "error: unable to regenerate SPDX documents; see the daemon's log"
+        if command == "status":
+            if self.lastRegenerated is None:
+                last = "not regenerated yet"
+            else:
+                last = f"last regenerated at {self.lastRegenerated} ({'succeeded' if self.lastSucceeded else 'failed'})"
+            how = "inotify" if self.watcher.fileno() is not None else "polling"
+            pending = ", ".join(sorted(self.pending)) if self.pending else "none"
+            return (f"ok: {self.regenerations} regenerations, {last}; watching with {how}; "
+                    f"changes pending: {pending}; {len(self.memoryCache.files)} files in memory")
+        if command == "stop":
+            self.stopping = True
+            return "ok: stopping"
+        return f"error: unknown command {command!r}; expected regenerate, status or stop"
+
+    def serve(self):
+        """
+        Regenerate the documents, then watch for changes and commands
+        until told to stop.
+
+        Returns: True if stopped by a command, False if the socket couldn't
+                 be opened.
+        """
+        if not self.openSocket():
+            return False
+        try:
+            if not self.regenerate({REPLY, SOURCES, BUILD}) and self.watcher is None:
+                # nothing to watch without a reply; wait for CMake to write one
+                self.watcher = watchTrees([(REPLY, os.path.dirname(os.path.abspath(self.replyIndexPath)), [])],
+                                          self.usePolling)
+            logger.info(f"Watching for changes; send commands to {self.socketPath}")
+
+            selector = selectors.DefaultSelector()
+            selector.register(self.server, selectors.EVENT_READ, "command")
+            watcher = None
+            watcherFd = None
+            nextPoll = time.monotonic() + self.pollSeconds
+            while not self.stopping:
+                # the watcher is replaced when a new reply is read
+                if watcher is not self.watcher:
+                    if watcherFd is not None:
+                        selector.unregister(watcherFd)
+                    watcher = self.watcher
+                    watcherFd = watcher.fileno()
+                    if watcherFd is not None:
+                        selector.register(watcherFd, selectors.EVENT_READ, "watch")
+
+                now = time.monotonic()
+                timeout = None
+                if watcher.fileno() is None:
+                    timeout = max(0.0, nextPoll - now)
+                if self.pending:
+                    settleLeft = max(0.0, self.lastChange + self.settleSeconds - now)
+                    timeout = settleLeft if timeout is None else min(timeout, settleLeft)
+
+                for (key, _) in selector.select(timeout):
+                    if key.data == "command":
+                        self.handleConnection()
+                    elif watcher is self.watcher:
+                        self.noteChanges(watcher.readChanges())
+                if self.stopping or watcher is not self.watcher:
+                    continue
+
+                if watcher.fileno() is None and time.monotonic() >= nextPoll:
+                    self.noteChanges(watcher.readChanges())
+                    nextPoll = time.monotonic() + self.pollSeconds
+                if self.pending and time.monotonic() - self.lastChange >= self.settleSeconds:
+                    changed = self.pending
+                    self.pending = set()
+                    self.regenerate(changed)
+            selector.close()
+        finally:
+            self.close()
+        return True
+
+    def close(self):
+        """Stop watching and listening, and remove the socket."""
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+            try:
+                os.unlink(self.socketPath)
+            except OSError:
+                pass
+
+def sendCommand(socketPath, command):
+    """
+    Send a command to a running daemon, and wait for its reply.
+
+    Arguments:
+        - socketPath: path of the daemon's unix socket
+        - command: command to send; see SbomDaemon.runCommand
+    Returns: reply, or None on error
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.connect(socketPath)
+            conn.sendall((command + "\n").encode("utf-8"))
+            conn.shutdown(socket.SHUT_WR)
+            data = b""
+            while True:
+                chunk = conn.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+    except OSError as e:
+        logger.error(f"Unable to send command to daemon at {socketPath}: {str(e)}")
+        return None
+    return data.decode("utf-8", "replace").strip()
+
+def stopOnSignal(signum, frame):
+    """Signal handler to shut down cleanly, the same as for Ctrl-C."""
+    raise KeyboardInterrupt()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep SPDX documents for a CMake build up to date as it changes")
+    parser.add_argument("replyIndexPath", metavar="path-to-cmake-api-index.json", nargs="?")
+    parser.add_argument("spdxOutputDir", metavar="spdx-output-dir", nargs="?")
+    parser.add_argument("spdxNamespacePrefix", metavar="spdx-namespace-prefix", nargs="?")
+    parser.add_argument("--socket", metavar="PATH",
+                        help=f"unix socket to listen for commands on (default {DEFAULT_SOCKET_NAME} in the output dir)")
+    parser.add_argument("--send", metavar="COMMAND", choices=["regenerate", "status", "stop"],
+                        help="send a command (regenerate, status or stop) to a running daemon, print its reply and exit")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS, metavar="SECONDS",
+                        help=f"seconds to wait after the last change before regenerating (default {DEFAULT_SETTLE_SECONDS})")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS, metavar="SECONDS",
+                        help=f"seconds between checks for changes when inotify isn't available (default {DEFAULT_POLL_SECONDS})")
+    parser.add_argument("--use-polling", action="store_true",
+                        help="poll for changes, even if inotify is available")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes for hashing and scanning files (0 = one per CPU; default 1)")
+    parser.add_argument("--async", type=int, default=0, metavar="N", dest="async_concurrency",
+                        help="walk and scan files with asyncio, with up to N file system calls in flight at once; replaces -j")
+    parser.add_argument("--hash-cache", metavar="PATH",
+                        help="SQLite file for caching hashes and licenses of unchanged files, to start up faster")
+    parser.add_argument("--hash-cache-size", type=int, default=DEFAULT_MAX_ENTRIES, metavar="N",
+                        help=f"maximum number of files kept in the hash cache (default {DEFAULT_MAX_ENTRIES})")
+    parser.add_argument("--max-scan-size", type=int, default=0, metavar="BYTES",
+                        help="only hash files larger than this with SHA1, without scanning them for licenses (default 0 = no limit)")
+    parser.add_argument("--transitive-links", action="store_true",
+                        help="also create STATIC_LINK relationships for indirectly linked libraries")
+    parser.add_argument("--format", choices=list(OUTPUT_EXTENSIONS.keys()), default="tag-value",
+                        help="format of the SPDX documents (default tag-value)")
+    parser.add_argument("--stream", action="store_true",
+                        help="write file sections as they are scanned, to bound memory use for very large trees")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print every issue found as it happens, and debug messages")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="only print errors")
+    parser.add_argument("--diagnostics-report", metavar="PATH",
+                        help="write every warning and error to PATH, one JSON object per line")
+    args = parser.parse_args()
+    if args.async_concurrency and args.jobs != 1:
+        parser.error("--async can't be used with --jobs")
+    if args.verbose and args.quiet:
+        parser.error("--verbose can't be used with --quiet")
+
+    verbosity = NORMAL
+    if args.verbose:
+        verbosity = VERBOSE
+    elif args.quiet:
+        verbosity = QUIET
+
+    if args.send:
+        socketPath = args.socket
+        if socketPath is None and args.spdxOutputDir is not None:
+            socketPath = os.path.join(args.spdxOutputDir, DEFAULT_SOCKET_NAME)
+        if socketPath is None:
+            parser.error("--send needs --socket, or the arguments the daemon was started with")
+        setupLogging(verbosity)
+        reply = sendCommand(socketPath, args.send)
+        if reply is None:
+            sys.exit(1)
+        print(reply)
+        sys.exit(0 if reply.startswith("ok:") else 1)
+
+    if args.spdxNamespacePrefix is None:
+        parser.error("the path to the CMake reply index, the output dir and the namespace prefix are required")
+
+    collector = setupLogging(verbosity, args.diagnostics_report)
+    if collector is None:
+        sys.exit(1)
+
+    sbomCfg = SbomConfig()
+    sbomCfg.jobs = args.jobs
+    sbomCfg.asyncConcurrency = args.async_concurrency
+    sbomCfg.maxScanSize = args.max_scan_size
+    sbomCfg.transitiveLinks = args.transitive_links
+    sbomCfg.streamFiles = args.stream
+    sbomCfg.outputFormat = args.format
+
+    hashCache = None
+    if args.hash_cache:
+        hashCache = HashCache(args.hash_cache, args.hash_cache_size)
+        if not hashCache.open():
+            sys.exit(1)
+
+    socketPath = args.socket or os.path.join(args.spdxOutputDir, DEFAULT_SOCKET_NAME)
+    daemon = SbomDaemon(args.replyIndexPath, args.spdxOutputDir, args.spdxNamespacePrefix, sbomCfg, socketPath,
+                        hashCache, collector)
+    daemon.settleSeconds = args.settle
+    daemon.pollSeconds = args.poll
+    daemon.usePolling = args.use_polling
+
+    signal.signal(signal.SIGTERM, stopOnSignal)
+    try:
+        retval = daemon.serve()
+    except KeyboardInterrupt:
+        retval = True
+
+    if hashCache:
+        hashCache.close()
+        logger.info(hashCache)
+    collector.close()
+
+    if not retval:
+        sys.exit(1)
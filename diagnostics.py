@@ -0,0 +1,169 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import logging
+import sys
+
+# number of example messages kept for each category
+DEFAULT_MAX_SAMPLES = 5
+
+# extra fields copied from log records into the JSONL report, if present
+REPORT_FIELDS = ["category", "path", "target"]
+
+# verbosity levels for setupLogging
+QUIET = -1
+NORMAL = 0
+VERBOSE = 1
+
+# Modules log through the standard logging module. Issues that can occur
+# once per file or target, such as a relationship that can't be resolved,
+# are logged as warnings or errors with a category, e.g.
+#
+#   logger.warning(f"{path} not found in build document", extra={"category": "build-file-not-found", "path": path})
+#
+# Those aren't printed as they happen, unless running verbosely; instead
+# a DiagnosticsCollector counts them, keeps a few of each as examples,
+# and prints a summary at the end. Other messages are printed as usual.
+class DiagnosticsCollector(logging.Handler):
+    def __init__(self, maxSamples=DEFAULT_MAX_SAMPLES, reportPath=None):
+        super(DiagnosticsCollector, self).__init__(logging.WARNING)
+
+        # number of example messages kept for each category
+        self.maxSamples = maxSamples
+
+        # path to write every warning and error to, one JSON object per
+        # line, or None
+        self.reportPath = reportPath
+
+        # file object for the report, while open
+        self.reportFile = None
+
+        # category => number of warnings and errors
+        self.counts = {}
+
+        # category => list of up to maxSamples distinct messages
+        self.samples = {}
+
+        # category => highest level seen
+        self.levels = {}
+
+    def open(self):
+        """
+        Open the report file, if there is one.
+
+        Returns: True on success, False on error.
+        """
+        if self.reportPath is None:
+            return True
+        try:
+            self.reportFile = open(self.reportPath, "w")
+            return True
+        except OSError as e:
+            print(f"Error: Unable to open diagnostics report {self.reportPath}: {str(e)}")
+            return False
+
+    def emit(self, record):
+        category = getCategory(record)
+        self.counts[category] = self.counts.get(category, 0) + 1
+        self.levels[category] = max(self.levels.get(category, 0), record.levelno)
+        samples = self.samples.setdefault(category, [])
+        if len(samples) < self.maxSamples:
+            message = record.getMessage()
+            if message not in samples:
+                samples.append(message)
+        if self.reportFile is not None:
+            entry = {"level": record.levelname.lower(), "logger": record.name}
+            for field in REPORT_FIELDS:
+                if hasattr(record, field):
+                    entry[field] = getattr(record, field)
+            entry["category"] = category
+            entry["message"] = record.getMessage()
+            self.reportFile.write(json.dumps(entry) + "\n")
+
+    def close(self):
+        if self.reportFile is not None:
+            self.reportFile.close()
+            self.reportFile = None
+        super(DiagnosticsCollector, self).close()
+
+    def reset(self):
+        """Forget the warnings and errors counted so far, to summarize the next run separately."""
+        self.counts = {}
+        self.samples = {}
+        self.levels = {}
+
+    def hasErrors(self):
+        """Return True if any errors were logged."""
+        return any(level >= logging.ERROR for level in self.levels.values())
+
+    def getSummary(self):
+        """
+        Summarize the warnings and errors logged.
+
+        Returns: list of lines, empty if there were none
+        """
+        if len(self.counts) == 0:
+            return []
+        numErrors = sum(count for (category, count) in self.counts.items() if self.levels[category] >= logging.ERROR)
+        numWarnings = sum(self.counts.values()) - numErrors
+        lines = [f"{numErrors} errors, {numWarnings} warnings:"]
+        for category in sorted(self.counts, key=lambda category: (-self.counts[category], category)):
+            lines.append(f"  {category}: {self.counts[category]}")
+            for message in self.samples[category]:
+                lines.append(f"    {message}")
+            if self.counts[category] > len(self.samples[category]):
+                lines.append("    ...")
+        if self.reportPath is not None:
+            lines.append(f"  (all written to {self.reportPath})")
+        return lines
+
+def getCategory(record):
+    """Return the category of a log record; uncategorized ones are named after their level."""
+    return getattr(record, "category", record.levelname.lower())
+
+def isUncategorized(record):
+    """Return True if a log record has no category, so is printed as it happens."""
+    return not hasattr(record, "category")
+
+# Prefixes warnings and errors with their level, e.g. "Error: ...".
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        message = super(ConsoleFormatter, self).format(record)
+        if record.levelno >= logging.WARNING:
+            return f"{record.levelname.capitalize()}: {message}"
+        return message
+
+def setupLogging(verbosity=NORMAL, reportPath=None, maxSamples=DEFAULT_MAX_SAMPLES):
+    """
+    Set up logging to the console, and a DiagnosticsCollector.
+
+    Arguments:
+        - verbosity: QUIET to print only errors without a category;
+                     NORMAL to print progress, and warnings and errors
+                     without a category; VERBOSE to print everything,
+                     including debug messages and each categorized issue.
+                     Printing the collector's summary is up to the caller.
+        - reportPath: path for the collector's JSONL report, or None
+        - maxSamples: number of example messages kept for each category
+    Returns: opened DiagnosticsCollector, or None on error
+    """
+    collector = DiagnosticsCollector(maxSamples, reportPath)
+    if not collector.open():
+        return None
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(ConsoleFormatter())
+    if verbosity <= QUIET:
+        console.setLevel(logging.ERROR)
+        console.addFilter(isUncategorized)
+    elif verbosity == NORMAL:
+        console.setLevel(logging.INFO)
+        console.addFilter(isUncategorized)
+    else:
+        console.setLevel(logging.DEBUG)
+
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG if verbosity >= VERBOSE else logging.INFO)
+    root.addHandler(console)
+    root.addHandler(collector)
+    return collector
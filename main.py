@@ -1,15 +1,129 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import argparse
+import logging
+import os
 import sys
 
-from sbom import makeSpdxFromCmakeReply
+from diagnostics import NORMAL, QUIET, VERBOSE, setupLogging
+from sbom import OUTPUT_EXTENSIONS, SbomConfig, makeSpdxFromCmakeReply
+from spdx.cache import DEFAULT_MAX_ENTRIES, HashCache
+from spdx.dedup import ScanDedup
+from spdx.profiler import Profiler
+
+logger = logging.getLogger("main")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 4:
-        print(f"Usage: {sys.argv[0]} <path-to-cmake-api-index.json> <spdx-output-dir> <spdx-namespace-prefix>")
+    parser = argparse.ArgumentParser(description="Create SPDX documents from a CMake file API reply")
+    parser.add_argument("replyIndexPath", metavar="path-to-cmake-api-index.json")
+    parser.add_argument("spdxOutputDir", metavar="spdx-output-dir")
+    parser.add_argument("spdxNamespacePrefix", metavar="spdx-namespace-prefix")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes for hashing and scanning files (0 = one per CPU; default 1)")
+    parser.add_argument("--async", type=int, default=0, metavar="N", dest="async_concurrency",
+                        help="walk and scan files with asyncio, with up to N file system calls in flight at once, for high-latency file systems such as NFS; replaces -j")
+    parser.add_argument("--hash-cache", metavar="PATH",
+                        help="SQLite file for caching hashes and licenses of unchanged files between runs")
+    parser.add_argument("--hash-cache-size", type=int, default=DEFAULT_MAX_ENTRIES, metavar="N",
+                        help=f"maximum number of files kept in the hash cache (default {DEFAULT_MAX_ENTRIES})")
+    parser.add_argument("--max-scan-size", type=int, default=0, metavar="BYTES",
+                        help="only hash files larger than this with SHA1, without scanning them for licenses (default 0 = no limit)")
+    parser.add_argument("--transitive-links", action="store_true",
+                        help="also create STATIC_LINK relationships for indirectly linked libraries")
+    parser.add_argument("--decode-jobs", type=int, default=0, metavar="N",
+                        help="number of worker processes for decoding CMake reply target files (default 0 = decode while reading)")
+    parser.add_argument("--incremental", metavar="PREV_DIR",
+                        help="reuse scan results for unchanged files from the SPDX documents of an earlier run in PREV_DIR")
+    parser.add_argument("--format", choices=list(OUTPUT_EXTENSIONS.keys()), default="tag-value",
+                        help="format of the SPDX documents (default tag-value)")
+    parser.add_argument("--save-snapshot", metavar="DIR",
+                        help="also save binary snapshots of the scanned documents in DIR")
+    parser.add_argument("--from-snapshot", metavar="DIR",
+                        help="write the documents from snapshots saved in DIR, instead of scanning files")
+    parser.add_argument("--stream", action="store_true",
+                        help="write file sections as they are scanned, to bound memory use for very large trees")
+    parser.add_argument("--profile", action="store_true",
+                        help="record the time taken by each phase, and the slowest files, in profile.json in the output dir")
+    parser.add_argument("--profile-phase", metavar="PHASE",
+                        help="with --profile, also profile this phase (e.g. build/scan) in detail")
+    parser.add_argument("--profile-tool", choices=["cprofile", "tracemalloc"], default="cprofile",
+                        help="tool for profiling --profile-phase in detail (default cprofile)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="print every issue found as it happens, and debug messages")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="only print errors")
+    parser.add_argument("--diagnostics-report", metavar="PATH",
+                        help="write every warning and error to PATH, one JSON object per line")
+    args = parser.parse_args()
+    if args.stream and args.save_snapshot:
+        parser.error("--save-snapshot can't be used with --stream")
+    if args.async_concurrency and args.jobs != 1:
+        parser.error("--async can't be used with --jobs")
+    if args.verbose and args.quiet:
+        parser.error("--verbose can't be used with --quiet")
+
+    verbosity = NORMAL
+    if args.verbose:
+        verbosity = VERBOSE
+    elif args.quiet:
+        verbosity = QUIET
+    collector = setupLogging(verbosity, args.diagnostics_report)
+    if collector is None:
         sys.exit(1)
 
-    replyIndexPath = sys.argv[1]
-    spdxOutputDir = sys.argv[2]
-    spdxNamespacePrefix = sys.argv[3]
-    makeSpdxFromCmakeReply(replyIndexPath, spdxOutputDir, spdxNamespacePrefix)
+    # the snapshots are only saved once the documents have been written,
+    # so make sure there is somewhere to save them before scanning
+    if args.save_snapshot:
+        try:
+            os.makedirs(args.save_snapshot, exist_ok=True)
+        except OSError as e:
+            logger.error(f"Unable to create snapshot directory {args.save_snapshot}: {str(e)}")
+            sys.exit(1)
+
+    sbomCfg = SbomConfig()
+    sbomCfg.jobs = args.jobs
+    sbomCfg.asyncConcurrency = args.async_concurrency
+    sbomCfg.maxScanSize = args.max_scan_size
+    sbomCfg.transitiveLinks = args.transitive_links
+    sbomCfg.parseCfg.decodeJobs = args.decode_jobs
+    sbomCfg.streamFiles = args.stream
+    sbomCfg.outputFormat = args.format
+    sbomCfg.previousDir = args.incremental
+    sbomCfg.saveSnapshotDir = args.save_snapshot
+    sbomCfg.fromSnapshotDir = args.from_snapshot
+    if args.profile:
+        sbomCfg.profiler = Profiler(detailPhase=args.profile_phase, detailTool=args.profile_tool,
+                                    detailDir=args.spdxOutputDir)
+
+    hashCache = None
+    if args.hash_cache:
+        hashCache = HashCache(args.hash_cache, args.hash_cache_size)
+        if not hashCache.open():
+            sys.exit(1)
+    # hard links and copies share scan results, ahead of the hash cache
+    scanDedup = ScanDedup(hashCache)
+    sbomCfg.hashCache = scanDedup
+    sbomCfg.contentIndex = scanDedup.contentIndex
+
+    retval = makeSpdxFromCmakeReply(args.replyIndexPath, args.spdxOutputDir, args.spdxNamespacePrefix, sbomCfg)
+
+    if hashCache:
+        hashCache.close()
+        logger.info(hashCache)
+    if scanDedup.hasSavings():
+        logger.info(scanDedup)
+
+    if sbomCfg.profiler:
+        sbomCfg.profiler.checkDetail()
+        profilePath = os.path.join(args.spdxOutputDir, "profile.json")
+        if sbomCfg.profiler.writeJSON(profilePath):
+            logger.info(f"Saved profile to {profilePath}")
+
+    # summarize the issues found, rather than listing each one
+    collector.close()
+    if verbosity != QUIET or collector.hasErrors():
+        for line in collector.getSummary():
+            print(line)
+
+    if not retval:
+        sys.exit(1)
@@ -1,33 +1,31 @@
 # SPDX-License-Identifier: Apache-2.0
 
 from cmakefileapi import TargetType
+from cmakegraph import TargetGraph
 
 # Create a Graphviz DOT file corresponding to the relationships
 # among targets in a CMake Config.
-# takes: Config, DOT output filename
+# takes: Config, DOT output filename, and optionally an already-built
+# TargetGraph for the Config
 # returns: True on success, False on error
-def makeDot(cfg, outfile):
+def makeDot(cfg, outfile, graph=None):
     try:
         with open(outfile, "w") as f:
             f.write("digraph D {\n")
 
-            # create node for each target
-            nodeNum = 0
-            nodeMap = {}
-            for cfgTgt in cfg.configTargets:
+            # create node for each target, numbered by its index in the graph
+            if graph is None:
+                graph = TargetGraph(cfg)
+            for nodeNum, cfgTgt in enumerate(graph.configTargets):
                 f.write(f"node{nodeNum} [label=\"{cfgTgt.name}\" shape={getShapeType(cfgTgt.target.type)}]\n")
-                nodeMap[cfgTgt.target.id] = nodeNum
-                nodeNum += 1
 
             # second pass, create edge for each dependency
-            toNodeNum = 0
-            for cfgTgt in cfg.configTargets:
-                for dep in cfgTgt.target.dependencies:
-                    fromNodeNum = nodeMap[dep.id]
+            for toNodeNum, fromNodeNums in enumerate(graph.deps):
+                for fromNodeNum in fromNodeNums:
                     f.write(f"node{fromNodeNum} -> node{toNodeNum}\n")
-                toNodeNum += 1
 
             f.write("}\n")
+            return True
 
     except OSError as e:
         print(f"Error writing to {outfile}: {str(e)}")
@@ -1,170 +1,489 @@
 # SPDX-License-Identifier: Apache-2.0
 
-import hashlib
+import logging
 import os
 import sys
 
 from cmakefileapi import TargetType
-from cmakefileapijson import parseReply
-from spdx.builder import BuilderDocumentConfig, BuilderPackageConfig, convertToSPDXIDSafe, makeSPDX
-from spdx.relationships import outputSPDXRelationships
+from cmakegraph import TargetGraph
+from cmakefileapijson import ParseConfig, parseReply
+from spdx.builder import BuilderDocumentConfig, BuilderPackageConfig, convertToSPDXIDSafe, formatScanSettings, makeSPDXVariants, outputSPDXVariants
+from spdx.incremental import makePreviousScans
+from spdx.profiler import profilePhase
+from spdx.reader import readSPDX
+from spdx.relationships import RelationshipIndex, getSPDXRelationships
+from spdx.snapshot import loadSnapshot, saveSnapshot
 
-def getCmakeRelationships(cm):
+logger = logging.getLogger(__name__)
+
+# file name extension of the SPDX documents for each output format
+OUTPUT_EXTENSIONS = {
+    "tag-value": ".spdx",
+    "json": ".spdx.json",
+}
+
+class SbomConfig:
+    def __init__(self):
+        super(SbomConfig, self).__init__()
+
+        # number of worker processes to use for scanning files
+        # (1 = scan serially, 0 = one per CPU)
+        self.jobs = 1
+
+        # number of file system calls to have in flight at once when
+        # walking and scanning with asyncio, for high-latency file systems
+        # (0 = don't use asyncio); see BuilderPackageConfig
+        self.asyncConcurrency = 0
+
+        # opened spdx.cache.HashCache to reuse scan results of unchanged
+        # files from earlier runs, or a cache in front of one with the same
+        # interface (such as spdx.dedup.ScanDedup), or None
+        self.hashCache = None
+
+        # spdx.dedup.ContentIndex to reuse the scan results of files with
+        # the same contents within the run, or None
+        self.contentIndex = None
+
+        # files larger than this many bytes are only hashed with SHA1, not
+        # scanned for licenses (0 = no limit); see BuilderPackageConfig
+        self.maxScanSize = 0
+
+        # also create STATIC_LINK relationships for libraries that are
+        # only linked in indirectly?
+        self.transitiveLinks = False
+
+        # write file sections as they are scanned, instead of building
+        # each document in memory first; see BuilderDocumentConfig
+        self.streamFiles = False
+
+        # format of the SPDX documents: "tag-value" or "json"
+        self.outputFormat = "tag-value"
+
+        # directory to save binary snapshots of the scanned documents in,
+        # or None; see spdx.snapshot
+        self.saveSnapshotDir = None
+
+        # directory with snapshots saved by an earlier run, to write the
+        # documents from instead of scanning, or None
+        self.fromSnapshotDir = None
+
+        # directory with the sources.spdx and first build document
+        # written by an earlier run, to reuse the scan results for files
+        # that haven't changed since; or None to scan every file
+        self.previousDir = None
+
+        # spdx.profiler.Profiler to record the time taken by each phase
+        # of the run, or None
+        self.profiler = None
+
+        # cmakefileapijson.ParseConfig for parsing the CMake reply; only
+        # the target file sections used for relationships are parsed
+        self.parseCfg = ParseConfig()
+        self.parseCfg.targetSections = ["artifacts", "dependencies", "sources"]
+
+def getCmakeRelationships(cm, graph=None, transitiveLinks=False, cfg=None):
     """
     Extracts details from Cmake API about which built files derive from
-    which sources. Looks at all targets within the first configuration
-    in the CodeModel.
+    which sources. Looks at all targets within one configuration in the
+    CodeModel.
 
     Arguments:
         - cm: CodeModel
-    Returns: list of tuples with relationships: [(filepathA, is_buildA, rln, filepathB, is_buildB), ...]
+        - graph: TargetGraph for the configuration; if None, one is built
+                 here
+        - transitiveLinks: also create STATIC_LINK relationships for
+                 libraries that are only linked in indirectly?
+        - cfg: Config to look at; if None, the first configuration
+    Returns: list of tuples with relationships: [(filepathA, is_buildA, rln, filepathB, is_buildB), ...],
+             without duplicates, in the order first seen
     """
+    if cfg is None:
+        cfg = cm.configurations[0]
+    if graph is None:
+        graph = TargetGraph(cfg)
+
     # get relative path: os.path.relpath(filename, cfg.scandir)
     rlns = []
+    # a source shared by several targets is only related to each artifact once
+    seen = set()
     # walk through targets
-    for cfgTarget in cm.configurations[0].configTargets:
+    for cfgTarget in graph.configTargets:
         target = cfgTarget.target
         # FIXME currently only handles static / object libraries
         # for static / object libraries or executables, gather source files
         if target.type in [TargetType.EXECUTABLE, TargetType.STATIC_LIBRARY, TargetType.OBJECT_LIBRARY]:
             # FIXME currently only handles one artifact in list
             if len(target.artifacts) != 1:
-                print(f"For target {target.name}, expected 1 artifact, got {len(target.artifacts)}; not generating relationships")
+                logger.warning(f"For target {target.name}, expected 1 artifact, got {len(target.artifacts)}; not generating relationships",
+                               extra={"category": "target-artifacts", "target": target.name})
                 continue
             artifactPath = target.artifacts[0]
             for src in target.sources:
                 # FIXME this assumes that isGenerated tells us whether the file
                 # FIXME is in build or sources; may not always be correct
                 newRln = (os.path.join(".", artifactPath), True, "GENERATED_FROM", src.path, src.isGenerated)
-                rlns.append(newRln)
+                if newRln not in seen:
+                    seen.add(newRln)
+                    rlns.append(newRln)
             # also, if any dependencies of static libraries or executables created
             # artifacts, include STATIC_LINK relationships for those
+            # only link in library dependencies, not utility or executable
             if target.type in [TargetType.EXECUTABLE, TargetType.STATIC_LIBRARY]:
-                for dep in target.dependencies:
-                    # now we need to find the target with this dep's ID
-                    for depCfgTarget in cm.configurations[0].configTargets:
-                        depTarget = depCfgTarget.target
-                        if depTarget.id != dep.id:
-                            continue
-                        # now we've got the right one; check the dep types
-                        # only link in library dependencies, not utility or executable
-                        if depTarget.type in [TargetType.STATIC_LIBRARY, TargetType.OBJECT_LIBRARY]:
-                            if len(depTarget.artifacts) != 1:
-                                print(f"For dependency {depTarget.name}, expected 1 artifact, got {len(depTarget.artifacts)}; not generating linking relationship")
-                                continue
-                            depArtifactPath = depTarget.artifacts[0]
-                            # FIXME this assumes that artifacts are always statically linking to something
-                            # FIXME that was in the build directory; may not always be correct
-                            newDepRln = (os.path.join(".", artifactPath), True, "STATIC_LINK",
-                                         os.path.join(".", depArtifactPath), True)
-                            rlns.append(newDepRln)
-                            break
+                for depTarget in graph.getLinkDependencies(target.id, transitiveLinks):
+                    if len(depTarget.artifacts) != 1:
+                        logger.warning(f"For dependency {depTarget.name}, expected 1 artifact, got {len(depTarget.artifacts)}; not generating linking relationship",
+                                       extra={"category": "dependency-artifacts", "target": depTarget.name})
+                        continue
+                    depArtifactPath = depTarget.artifacts[0]
+                    # FIXME this assumes that artifacts are always statically linking to something
+                    # FIXME that was in the build directory; may not always be correct
+                    newDepRln = (os.path.join(".", artifactPath), True, "STATIC_LINK",
+                                 os.path.join(".", depArtifactPath), True)
+                    if newDepRln not in seen:
+                        seen.add(newDepRln)
+                        rlns.append(newDepRln)
     return rlns
 
-def makeCmakeSpdx(cm, srcRootDirs, spdxOutputDir, spdxNamespacePrefix):
+def getBuildDocumentNames(cm, warn=False):
     """
-    Parse Cmake data and scan source / build directories, and create a
-    corresponding SPDX tag-value document.
+    Return the names of the build documents: "build" if there is only
+    one configuration, or else "build-" followed by each configuration's
+    name, e.g. "build-Debug". Names are made SPDX-ID-safe, which can
+    make two of them the same (e.g. "Rel With" and "Rel-With"); later
+    ones then get a numeric suffix, e.g. "build-Rel-With-2", so that no
+    document overwrites another.
+
+    Arguments:
+        - cm: Cmake codemodel parsed by parseReply()
+        - warn: log a warning for each name given a suffix?
+    Returns: list of names, one per configuration in cm.configurations
+    """
+    if len(cm.configurations) == 1:
+        return ["build"]
+    baseNames = ["build" if cfg.name == "" else "build-" + convertToSPDXIDSafe(cfg.name)
+                 for cfg in cm.configurations]
+    docNames = []
+    for (cfg, baseName) in zip(cm.configurations, baseNames):
+        docName = baseName
+        if docName in docNames:
+            n = 2
+            while f"{baseName}-{n}" in docNames or f"{baseName}-{n}" in baseNames:
+                n += 1
+            docName = f"{baseName}-{n}"
+            if warn:
+                logger.warning(f"Build document name {baseName} for configuration {cfg.name} is already used by another configuration; naming it {docName}")
+        docNames.append(docName)
+    return docNames
+
+def readPreviousDoc(sbomCfg, docName):
+    """
+    Read a document written by an earlier run, if incremental mode is on.
+
+    Arguments:
+        - sbomCfg: SbomConfig with options for this run
+        - docName: "sources", or the name of a build document
+    Returns: BuilderDocument, or None if not in incremental mode or the
+             document can't be read
+    """
+    if sbomCfg.previousDir is None or sbomCfg.fromSnapshotDir is not None:
+        return None
+    prevPath = os.path.join(sbomCfg.previousDir, docName + ".spdx")
+    res = readSPDX(prevPath)
+    if res is None or res.doc.created is None:
+        logger.warning(f"Couldn't read previous {docName} SPDX file {prevPath}; scanning all {docName} files")
+        return None
+    return res.doc
+
+def makeSourcesDocumentConfig(cm, srcRootDirs, spdxNamespacePrefix, sbomCfg):
+    """
+    Make the document config for the sources SPDX document, with a
+    package for each sources root dir.
 
     Arguments:
         - cm: Cmake codemodel parsed by parseReply()
         - srcRootDirs: mapping of package SPDX ID (without "SPDXRef-") =>
                        sources root dir
-        - spdxOutputDir: output directory where SPDX documents will be written
-        - spdxNamespacePrefix: prefix for SPDX Document Namespace (will have 
-            "sources" and "build" appended); see Document Creation Info
-            section in SPDX spec for more information
-    Returns: True on success, False on failure; note that failure may still
-             produce one or more partial SPDX documents
+        - spdxNamespacePrefix: prefix for SPDX Document Namespace
+        - sbomCfg: SbomConfig with options for this run
+    Returns: BuilderDocumentConfig
     """
-    # create SPDX file for sources
-    srcSpdxPath = os.path.join(spdxOutputDir, "sources.spdx")
     srcDocCfg = BuilderDocumentConfig()
     srcDocCfg.documentName = "sources"
     srcDocCfg.documentNamespace = os.path.join(spdxNamespacePrefix, "sources")
+    srcDocCfg.streamFiles = sbomCfg.streamFiles
+    srcDocCfg.outputFormat = sbomCfg.outputFormat
+    srcDocCfg.profiler = sbomCfg.profiler
     for pkgID, pkgRootDir in srcRootDirs.items():
         srcPkgCfg = BuilderPackageConfig()
         srcPkgCfg.packageName = pkgID + " sources"
         srcPkgCfg.spdxID = "SPDXRef-" + pkgID
         srcPkgCfg.doSHA256 = True
         srcPkgCfg.scandir = pkgRootDir
+        srcPkgCfg.jobs = sbomCfg.jobs
+        srcPkgCfg.asyncConcurrency = sbomCfg.asyncConcurrency
+        srcPkgCfg.hashCache = sbomCfg.hashCache
+        srcPkgCfg.contentIndex = sbomCfg.contentIndex
+        srcPkgCfg.maxScanSize = sbomCfg.maxScanSize
+        srcPkgCfg.profiler = sbomCfg.profiler
         # FIXME is this correct as-is, or needs adjustment / resolve relative?
         srcPkgCfg.excludeDirs.append(cm.paths_build)
         srcDocCfg.packageConfigs[pkgRootDir] = srcPkgCfg
+        # the same for every package
+        srcDocCfg.scanSettings = formatScanSettings(srcPkgCfg)
+    return srcDocCfg
 
-    srcDoc = makeSPDX(srcDocCfg, srcSpdxPath)
-    if srcDoc:
-        print(f"Saved sources SPDX to {srcSpdxPath}")
-    else:
-        print(f"Couldn't generate sources SPDX file")
-        return False
-
-    # get hash of sources SPDX file, to use for build doc's extRef
-    hSHA256 = hashlib.sha256()
-    with open(srcSpdxPath, 'rb') as f:
-        buf = f.read()
-        hSHA256.update(buf)
-    srcSHA256 = hSHA256.hexdigest()
-
-    # get auto-generated relationships between filenames
-    fileRlns = getCmakeRelationships(cm)
+def makeBuildDocumentConfig(cm, spdxNamespacePrefix, sbomCfg):
+    """
+    Make the document config for the build SPDX document, with a single
+    package for the build dir. Its external document ref to the sources
+    document is left to be filled in once that document is written.
 
-    # create SPDX file for build
-    buildSpdxPath = os.path.join(spdxOutputDir, "build.spdx")
+    Arguments:
+        - cm: Cmake codemodel parsed by parseReply()
+        - spdxNamespacePrefix: prefix for SPDX Document Namespace
+        - sbomCfg: SbomConfig with options for this run
+    Returns: BuilderDocumentConfig
+    """
     buildDocCfg = BuilderDocumentConfig()
     buildDocCfg.documentName = "build"
     buildDocCfg.documentNamespace = os.path.join(spdxNamespacePrefix, "build")
+    buildDocCfg.streamFiles = sbomCfg.streamFiles
+    buildDocCfg.outputFormat = sbomCfg.outputFormat
+    buildDocCfg.profiler = sbomCfg.profiler
 
     buildPkgCfg = BuilderPackageConfig()
     buildPkgCfg.packageName = "build"
     buildPkgCfg.spdxID = "SPDXRef-build"
     buildPkgCfg.doSHA256 = True
     buildPkgCfg.scandir = cm.paths_build
+    buildPkgCfg.jobs = sbomCfg.jobs
+    buildPkgCfg.asyncConcurrency = sbomCfg.asyncConcurrency
+    buildPkgCfg.hashCache = sbomCfg.hashCache
+    buildPkgCfg.contentIndex = sbomCfg.contentIndex
+    buildPkgCfg.maxScanSize = sbomCfg.maxScanSize
+    buildPkgCfg.profiler = sbomCfg.profiler
     buildDocCfg.packageConfigs[cm.paths_build] = buildPkgCfg
-
-    # add external document ref to sources SPDX file
-    buildDocCfg.extRefs = [("DocumentRef-sources", srcDocCfg.documentNamespace, "SHA256", srcSHA256)]
+    buildDocCfg.scanSettings = formatScanSettings(buildPkgCfg)
 
     # exclude CMake file-based API responses -- presume only used for this
     # SPDX generation scan, not for actual build artifact
     buildExcludeDir = os.path.join(cm.paths_build, ".cmake", "api")
     buildPkgCfg.excludeDirs.append(buildExcludeDir)
 
-    buildDoc = makeSPDX(buildDocCfg, buildSpdxPath)
-    if buildDoc:
-        print(f"Saved build SPDX to {buildSpdxPath}")
-    else:
-        print(f"Couldn't generate build SPDX file")
-        return False
+    return buildDocCfg
 
-    # and print relationships to build file also
-    retval = outputSPDXRelationships(cm.paths_source, cm.paths_build, srcDoc, buildDoc, fileRlns, buildSpdxPath)
-    if retval:
-        print(f"Added relationships to {buildSpdxPath}")
-    else:
-        print(f"Couldn't add relationships to build SPDX file")
-        return False
+def makeSbomDocuments(docCfg, outputs, sbomCfg):
+    """
+    Scan and write one or more SPDX documents with the same files, or
+    write them from a snapshot of an earlier scan; and save a snapshot of
+    the scan if asked to.
 
-    return True
+    Arguments:
+        - docCfg: BuilderDocumentConfig for the scan; its document name is
+                 used to name the snapshot
+        - outputs: list of (BuilderDocumentConfig, path to write SPDX
+                 content, function to get relationships) tuples, one per
+                 document; see spdx.builder.makeSPDXVariants
+        - sbomCfg: SbomConfig with options for this run
+    Returns: list of BuilderDocuments, one per output, on success; None
+             on failure.
+    """
+    snapshotName = docCfg.documentName + ".snapshot"
+
+    if sbomCfg.fromSnapshotDir is not None:
+        with profilePhase(sbomCfg.profiler, "loadSnapshot"):
+            doc = loadSnapshot(os.path.join(sbomCfg.fromSnapshotDir, snapshotName))
+        if doc is None:
+            return None
+        # keep the scanned contents, but use this run's document settings
+        return outputSPDXVariants(doc, outputs)
+
+    docs = makeSPDXVariants(docCfg, outputs)
+    if docs and sbomCfg.saveSnapshotDir is not None:
+        with profilePhase(sbomCfg.profiler, "saveSnapshot"):
+            saved = saveSnapshot(docs[0], os.path.join(sbomCfg.saveSnapshotDir, snapshotName))
+        if not saved:
+            return None
+    return docs
 
-def makeSpdxFromCmakeReply(replyIndexPath, spdxOutputDir, spdxNamespacePrefix):
+def makeSbomDocument(docCfg, spdxPath, sbomCfg, getRelationships=None):
     """
-    Parse Cmake data to determine source / build directories, and call
-    makeCmakeSpdx to create the corresponding SPDX tag-value document.
+    Scan and write an SPDX document, or write it from a snapshot of an
+    earlier scan; and save a snapshot of it if asked to.
 
     Arguments:
-        - replyIndexPath: path to index file from Cmake API reply JSON file
+        - docCfg: BuilderDocumentConfig
+        - spdxPath: path to write SPDX content
+        - sbomCfg: SbomConfig with options for this run
+        - getRelationships: function to get relationships to write after
+                 the packages; see spdx.builder.writeRelationships
+    Returns: BuilderDocument on success, None on failure.
+    """
+    docs = makeSbomDocuments(docCfg, [(docCfg, spdxPath, getRelationships)], sbomCfg)
+    if docs is None:
+        return None
+    return docs[0]
+
+def makeSourcesSpdx(cm, srcRootDirs, spdxOutputDir, spdxNamespacePrefix, sbomCfg, prevSrcDoc=None):
+    """
+    Scan the sources directories and create the sources SPDX document.
+
+    Arguments:
+        - cm: Cmake codemodel parsed by parseReply()
+        - srcRootDirs: mapping of package SPDX ID (without "SPDXRef-") =>
+                       sources root dir
         - spdxOutputDir: output directory where SPDX documents will be written
-        - spdxNamespacePrefix: prefix for SPDX Document Namespace (will have
-            "sources" and "build" appended); see Document Creation Info
-            section in SPDX spec for more information
+        - spdxNamespacePrefix: prefix for SPDX Document Namespace
+        - sbomCfg: SbomConfig with options for this run
+        - prevSrcDoc: sources BuilderDocument written by an earlier run,
+                 to reuse the scan results of unchanged files; or None
+    Returns: tuple of (BuilderDocumentConfig, BuilderDocument) on success,
+             None on failure.
+    """
+    srcSpdxPath = os.path.join(spdxOutputDir, "sources" + OUTPUT_EXTENSIONS[sbomCfg.outputFormat])
+    srcDocCfg = makeSourcesDocumentConfig(cm, srcRootDirs, spdxNamespacePrefix, sbomCfg)
+
+    prevScans = []
+    if prevSrcDoc:
+        prevScans = makePreviousScans(prevSrcDoc, srcDocCfg.packageConfigs.values(), sbomCfg.hashCache)
+
+    with profilePhase(sbomCfg.profiler, "sources"):
+        srcDoc = makeSbomDocument(srcDocCfg, srcSpdxPath, sbomCfg)
+    if not srcDoc:
+        logger.error(f"Couldn't generate sources SPDX file")
+        return None
+
+    logger.info(f"Saved sources SPDX to {srcSpdxPath}")
+    for prevScan in prevScans:
+        logger.info(prevScan)
+    return (srcDocCfg, srcDoc)
+
+def makeBuildSpdx(cm, srcDocCfg, srcDoc, fileRlnsByCfg, spdxOutputDir, spdxNamespacePrefix, sbomCfg,
+                  prevBuildDoc=None, rlnIndexes=None):
+    """
+    Scan the build directory and create a build SPDX document for each
+    configuration, referring to the sources document.
+
+    Arguments:
+        - cm: Cmake codemodel parsed by parseReply()
+        - srcDocCfg: BuilderDocumentConfig of the sources document
+        - srcDoc: sources BuilderDocument, as written
+        - fileRlnsByCfg: list of relationships from getCmakeRelationships,
+                 one per configuration in cm.configurations
+        - spdxOutputDir: output directory where SPDX documents will be written
+        - spdxNamespacePrefix: prefix for SPDX Document Namespace
+        - sbomCfg: SbomConfig with options for this run
+        - prevBuildDoc: build BuilderDocument written by an earlier run,
+                 to reuse the scan results of unchanged files; or None
+        - rlnIndexes: list to leave the RelationshipIndex built for this
+                 run in, or None; if it holds one from an earlier call
+                 with the same srcDoc, its sources part is reused
+    Returns: list of BuilderDocuments, one per configuration, on success;
+             None on failure.
+    """
+    buildDocCfg = makeBuildDocumentConfig(cm, spdxNamespacePrefix, sbomCfg)
+    buildPkgCfg = buildDocCfg.packageConfigs[cm.paths_build]
+
+    # relationships are resolved once the build files are known, and
+    # written at the end of each build doc in the same pass; the build
+    # files are the same for every configuration, so they are only
+    # indexed once
+    prevIndex = rlnIndexes[0] if rlnIndexes else None
+    builtIndexes = []
+    def makeGetBuildRelationships(fileRlns):
+        def getBuildRelationships(buildDoc):
+            if len(builtIndexes) == 0:
+                builtIndexes.append(RelationshipIndex(cm.paths_source, cm.paths_build, srcDoc, buildDoc, prevIndex))
+            return getSPDXRelationships(cm.paths_source, cm.paths_build, srcDoc, buildDoc, fileRlns, builtIndexes[0])
+        return getBuildRelationships
+
+    outputs = []
+    for (docName, fileRlns) in zip(getBuildDocumentNames(cm, warn=True), fileRlnsByCfg):
+        cfgDocCfg = BuilderDocumentConfig()
+        cfgDocCfg.documentName = docName
+        cfgDocCfg.documentNamespace = os.path.join(spdxNamespacePrefix, docName)
+        cfgDocCfg.outputFormat = buildDocCfg.outputFormat
+        cfgDocCfg.profiler = buildDocCfg.profiler
+        # add external document ref to sources SPDX file
+        # (its hash was calculated as it was written)
+        cfgDocCfg.extRefs = [("DocumentRef-sources", srcDocCfg.documentNamespace, "SHA256", srcDoc.sha256)]
+        buildSpdxPath = os.path.join(spdxOutputDir, docName + OUTPUT_EXTENSIONS[sbomCfg.outputFormat])
+        outputs.append((cfgDocCfg, buildSpdxPath, makeGetBuildRelationships(fileRlns)))
+
+    prevScans = []
+    if prevBuildDoc:
+        prevScans = makePreviousScans(prevBuildDoc, [buildPkgCfg], sbomCfg.hashCache)
+
+    with profilePhase(sbomCfg.profiler, "build"):
+        buildDocs = makeSbomDocuments(buildDocCfg, outputs, sbomCfg)
+    if not buildDocs:
+        logger.error(f"Couldn't generate build SPDX file")
+        return None
+
+    for (_, buildSpdxPath, _) in outputs:
+        logger.info(f"Saved build SPDX with relationships to {buildSpdxPath}")
+    for prevScan in prevScans:
+        logger.info(prevScan)
+    if rlnIndexes is not None:
+        rlnIndexes[:] = builtIndexes
+    return buildDocs
+
+def makeCmakeSpdx(cm, srcRootDirs, spdxOutputDir, spdxNamespacePrefix, sbomCfg=None):
+    """
+    Parse Cmake data and scan source / build directories, and create
+    corresponding SPDX documents.
+
+    Arguments:
+        - cm: Cmake codemodel parsed by parseReply()
+        - srcRootDirs: mapping of package SPDX ID (without "SPDXRef-") =>
+                       sources root dir
+        - spdxOutputDir: output directory where SPDX documents will be written
+        - spdxNamespacePrefix: prefix for SPDX Document Namespace (will have 
+            "sources" and the build document names appended); see Document
+            Creation Info section in SPDX spec for more information
+        - sbomCfg: SbomConfig with options for this run; if None, the
+            defaults are used
     Returns: True on success, False on failure; note that failure may still
              produce one or more partial SPDX documents
     """
-    # get CMake info from build
-    cm = parseReply(replyIndexPath)
+    if sbomCfg is None:
+        sbomCfg = SbomConfig()
 
-    # determine source packages and directory mappings
+    # read both earlier documents before either one is overwritten; with
+    # several configurations, every build document has the same files, so
+    # the first one is enough
+    with profilePhase(sbomCfg.profiler, "readPrevious"):
+        prevSrcDoc = readPreviousDoc(sbomCfg, "sources")
+        prevBuildDoc = readPreviousDoc(sbomCfg, getBuildDocumentNames(cm)[0])
+
+    # create SPDX file for sources
+    res = makeSourcesSpdx(cm, srcRootDirs, spdxOutputDir, spdxNamespacePrefix, sbomCfg, prevSrcDoc)
+    if res is None:
+        return False
+    (srcDocCfg, srcDoc) = res
+
+    # get auto-generated relationships between filenames, for each
+    # configuration
+    with profilePhase(sbomCfg.profiler, "cmakeRelationships"):
+        fileRlnsByCfg = [getCmakeRelationships(cm, transitiveLinks=sbomCfg.transitiveLinks, cfg=cfg)
+                         for cfg in cm.configurations]
+
+    # create SPDX files for build; the build dir is scanned once, and a
+    # document written for each configuration, with its own relationships
+    buildDocs = makeBuildSpdx(cm, srcDocCfg, srcDoc, fileRlnsByCfg, spdxOutputDir, spdxNamespacePrefix, sbomCfg,
+                              prevBuildDoc)
+    return buildDocs is not None
+
+def getSourcesRootDirs(cm):
+    """
+    Determine the source packages, one per CMake project, and the top
+    directory of each one's sources.
+
+    Arguments:
+        - cm: Cmake codemodel parsed by parseReply()
+    Returns: mapping of package SPDX ID (without "SPDXRef-") => sources
+             root dir
+    """
     srcRootDirs = {}
     for prj in cm.configurations[0].projects:
         # go through the directories and determine top directory for this package
@@ -181,7 +500,7 @@ def makeSpdxFromCmakeReply(replyIndexPath, spdxOutputDir, spdxNamespacePrefix):
                 seen_first_dir = True
             else:
                 if is_prj_relative != is_dir_relative:
-                    print(f"directories for project {prj.name} contain both absolute and relative paths; skipping")
+                    logger.warning(f"directories for project {prj.name} contain both absolute and relative paths; skipping")
                     should_skip = True
                     break
             dirs_seen.append(dt.source)
@@ -198,5 +517,35 @@ def makeSpdxFromCmakeReply(replyIndexPath, spdxOutputDir, spdxNamespacePrefix):
         # add it to map
         srcRootDirs[pkgID] = srcRootDir
 
+    return srcRootDirs
+
+def makeSpdxFromCmakeReply(replyIndexPath, spdxOutputDir, spdxNamespacePrefix, sbomCfg=None):
+    """
+    Parse Cmake data to determine source / build directories, and call
+    makeCmakeSpdx to create the corresponding SPDX tag-value document.
+
+    Arguments:
+        - replyIndexPath: path to index file from Cmake API reply JSON file
+        - spdxOutputDir: output directory where SPDX documents will be written
+        - spdxNamespacePrefix: prefix for SPDX Document Namespace (will have
+            "sources" and "build" appended); see Document Creation Info
+            section in SPDX spec for more information
+        - sbomCfg: SbomConfig with options for this run; if None, the
+            defaults are used
+    Returns: True on success, False on failure; note that failure may still
+             produce one or more partial SPDX documents
+    """
+    if sbomCfg is None:
+        sbomCfg = SbomConfig()
+
+    # get CMake info from build
+    with profilePhase(sbomCfg.profiler, "parseReply"):
+        cm = parseReply(replyIndexPath, sbomCfg.parseCfg)
+    if cm is None:
+        return False
+
+    # determine source packages and directory mappings
+    srcRootDirs = getSourcesRootDirs(cm)
+
     # scan and create SPDX document
-    return makeCmakeSpdx(cm, srcRootDirs, spdxOutputDir, spdxNamespacePrefix)
+    return makeCmakeSpdx(cm, srcRootDirs, spdxOutputDir, spdxNamespacePrefix, sbomCfg)
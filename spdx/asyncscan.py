@@ -0,0 +1,169 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import stat
+import threading
+
+from spdx.walk import ExcludeMatcher
+
+# Walking and scanning with asyncio, for file systems such as NFS where
+# each listing, stat and open waits on the network. The blocking calls
+# still happen in a pool of threads, but up to `concurrency` of them are
+# in flight at once, so the waits overlap instead of adding up. Results
+# are returned in the same form as the serial functions, and the caller
+# sorts them, so the documents are the same either way.
+#
+# File system calls go through a shim object, LocalFS by default, so
+# that a slower one can be substituted to try this out locally; see
+# bench/asyncscan.py.
+
+class LocalFS:
+    def listDir(self, path):
+        """Return list of os.DirEntry for the entries in directory path."""
+        with os.scandir(path) as it:
+            return list(it)
+
+    def stat(self, path):
+        """Return os.stat_result for path, following symbolic links."""
+        return os.stat(path)
+
+    def open(self, path):
+        """Open path for reading bytes, unbuffered."""
+        return open(path, 'rb', buffering=0)
+
+async def walkAsync(topDir, matcher, fs, loop, executor, limit):
+    """
+    Find all files within topDir or its children; see walkFilesAsync.
+
+    Arguments:
+        - topDir: root directory of files being collected
+        - matcher: ExcludeMatcher
+        - fs: file system shim
+        - loop: running event loop
+        - executor: executor for blocking calls
+        - limit: asyncio.Semaphore bounding the calls in flight
+    Returns: array of (path, os.stat_result or None) tuples, in no
+             particular order
+    """
+    found = []
+
+    async def call(func, *args):
+        async with limit:
+            return await loop.run_in_executor(executor, func, *args)
+
+    async def statFile(path):
+        try:
+            return await call(fs.stat, path)
+        except OSError:
+            return None
+
+    async def walkDir(currentDir, absCurrentDir, relCurrentDir):
+        try:
+            entries = await call(fs.listDir, currentDir)
+        except OSError:
+            return
+        subdirs = []
+        filePaths = []
+        for entry in entries:
+            relPath = entry.name if relCurrentDir == "" else relCurrentDir + "/" + entry.name
+            absPath = os.path.join(absCurrentDir, entry.name)
+            try:
+                isDir = entry.is_dir()
+            except OSError:
+                isDir = False
+            if isDir:
+                if entry.is_symlink() or matcher.shouldPruneDir(absPath, relPath):
+                    continue
+                subdirs.append(walkDir(entry.path, absPath, relPath))
+                continue
+            if matcher.shouldExcludeFile(absPath, relPath):
+                continue
+            filePaths.append(entry.path)
+        stats = await asyncio.gather(*[statFile(filePath) for filePath in filePaths])
+        found.extend((filePath, st) for (filePath, st) in zip(filePaths, stats)
+                     if st is None or stat.S_ISREG(st.st_mode))
+        await asyncio.gather(*subdirs)
+
+    await walkDir(topDir, os.path.abspath(topDir), "")
+    return found
+
+def walkFilesAsync(topDir, excludes, concurrency, fs=None):
+    """
+    Find all files within topDir or its children, listing directories and
+    stat'ing files concurrently. Skips the same files and directories as
+    spdx.walk.walkFiles.
+
+    Arguments:
+        - topDir: root directory of files being collected
+        - excludes: array of excludes; see spdx.walk.ExcludeMatcher
+        - concurrency: maximum number of file system calls in flight
+        - fs: file system shim, or None for LocalFS
+    Returns: array of (path, os.stat_result or None if it can't be
+             determined) tuples, in no particular order
+    """
+    if fs is None:
+        fs = LocalFS()
+    matcher = ExcludeMatcher(excludes)
+    if matcher.isAbsPathExcluded(os.path.abspath(topDir)):
+        return []
+
+    async def run():
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return await walkAsync(topDir, matcher, fs, asyncio.get_running_loop(),
+                                   executor, asyncio.Semaphore(concurrency))
+    return asyncio.run(run())
+
+# Runs a blocking function over batches of items with asyncio, on an
+# event loop in a thread of its own. The loop and its pool of threads are
+# kept until the mapper is closed, so that a scan fed in batches doesn't
+# start new ones for each batch, and one batch can be running while the
+# caller is still using the results of the previous one.
+class AsyncMapper:
+    def __init__(self, concurrency):
+        super(AsyncMapper, self).__init__()
+
+        # maximum number of calls in flight at once, across all batches
+        self.concurrency = concurrency
+
+        # pool of threads making the blocking calls
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+        # event loop, running in self.thread until closed
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def start(self, func, items):
+        """
+        Start calling a blocking function on each item, with up to
+        concurrency calls in flight at once.
+
+        Arguments:
+            - func: function taking one item
+            - items: array of items
+        Returns: concurrent.futures.Future for an array of results, in
+                 the same order as items
+        """
+        return asyncio.run_coroutine_threadsafe(self.mapItems(func, items), self.loop)
+
+    async def mapItems(self, func, items):
+        results = [None] * len(items)
+        # a fixed set of workers takes items in turn, rather than a task
+        # per item, so memory use doesn't grow with the number of items
+        nextIndex = iter(range(len(items)))
+
+        async def worker():
+            for i in nextIndex:
+                results[i] = await self.loop.run_in_executor(self.executor, func, items[i])
+
+        await asyncio.gather(*[worker() for _ in range(min(self.concurrency, len(items)))])
+        return results
+
+    def shutdown(self):
+        """Stop the event loop and its threads; call once the batches started have finished."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.executor.shutdown()
@@ -1,9 +1,61 @@
 # SPDX-License-Identifier: Apache-2.0
 
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+import copy
 from datetime import datetime
+from functools import partial
 import hashlib
+import logging
 import os
 import re
+import time
+
+from spdx.asyncscan import AsyncMapper, walkFilesAsync
+from spdx.dedup import ContentIndex
+from spdx.filetypes import BINARY_TYPES, getFileTypeByName, isTextByName, sniffFileType
+from spdx.jsonwriter import JSONWriter
+from spdx.pathtrie import PathTrie
+from spdx.profiler import profilePhase
+from spdx.tagvalue import HashingFile, TagValueWriter, WRITE_BUFFER_SIZE
+from spdx.walk import iterSortedFiles, walkFiles
+
+logger = logging.getLogger(__name__)
+
+# size of the blocks in which files are read for hashing and scanning
+READ_CHUNK_SIZE = 1024 * 1024
+
+# writer classes for each output format
+OUTPUT_WRITERS = {
+    "tag-value": TagValueWriter,
+    "json": JSONWriter,
+}
+
+# number of files scanned and written at a time when streaming
+STREAM_BATCH_SIZE = 4096
+
+# only this much of the start of each line is searched for an
+# SPDX-License-Identifier tag; the rest of a longer line is skipped
+MAX_SCAN_LINE_LENGTH = 64 * 1024
+
+# expressions are cut short at this many bytes, in case the tag is
+# followed by the rest of a long line (e.g. in a minified file)
+MAX_EXPRESSION_LENGTH = 1024
+
+# default number of bytes at the start of each file that are searched for
+# an SPDX-License-Identifier tag
+DEFAULT_SCAN_BYTES = 1024 * 1024
+
+# files with a NUL byte this near their start are treated as binary, and
+# not searched for an SPDX-License-Identifier tag
+BINARY_SNIFF_SIZE = 8 * 1024
+
+# the tag searched for, as bytes
+EXPRESSION_TAG = b"SPDX-License-Identifier:"
+
+# ContentIndex for the files scanned by this process, if it is a worker
+# process started by makeScanPool; see scanFileInWorker
+workerContentIndex = None
 
 class BuilderDocumentConfig:
     def __init__(self):
@@ -27,6 +79,24 @@ class BuilderDocumentConfig:
         # configs for packages: package root dir => BuilderPackageConfig
         self.packageConfigs = {}
 
+        # write each file's section as soon as it is scanned, rather than
+        # keeping all BuilderFiles in memory until the document is written?
+        # if set, BuilderPackage.files stays empty and fileIDs is filled in
+        self.streamFiles = False
+
+        # format to write: "tag-value" or "json"; see OUTPUT_WRITERS
+        self.outputFormat = "tag-value"
+
+        # settings the document's files were scanned with, from
+        # formatScanSettings, recorded in the document so that a later
+        # incremental run can tell whether its scan results can be
+        # reused; or "" if not known
+        self.scanSettings = ""
+
+        # spdx.profiler.Profiler to record the time taken by each phase
+        # of building and writing the document, or None
+        self.profiler = None
+
 class BuilderPackageConfig:
     def __init__(self):
         super(BuilderPackageConfig, self).__init__()
@@ -55,15 +125,19 @@ class BuilderPackageConfig:
         self.copyrightText = "NOASSERTION"
 
         # should include SHA256 hashes? (will also include SHA1 regardless)
+        # SHA256 is only calculated if this is set
         self.doSHA256 = False
 
-        # should include MD5 hashes? (will also include MD5 regardless)
+        # should include MD5 hashes? (will also include SHA1 regardless)
+        # MD5 is only calculated if this is set
         self.doMD5 = False
 
         # root directory to be scanned
         self.scandir = ""
 
-        # directories whose files should not be included
+        # directories (or files) whose files should not be included:
+        # absolute paths, or relative paths / glob patterns matched at
+        # any depth; see spdx.walk.ExcludeMatcher
         self.excludeDirs = [".git/"]
 
         # directories whose files should be included, but not scanned
@@ -74,6 +148,48 @@ class BuilderPackageConfig:
         # defaults to 20
         self.numLinesScanned = 20
 
+        # number of bytes at the start of each file to scan for
+        # SPDX-License-Identifier (0 = all); applies as well as
+        # numLinesScanned, whichever limit is reached first
+        self.numBytesScanned = DEFAULT_SCAN_BYTES
+
+        # SPDX file types (see spdx.filetypes) whose files aren't scanned
+        # for SPDX-License-Identifier, only hashed
+        self.skipLicenseScanTypes = BINARY_TYPES
+
+        # files larger than this many bytes are only hashed with SHA1, not
+        # scanned for SPDX-License-Identifier or hashed with SHA256 or MD5
+        # (0 = no limit)
+        self.maxScanSize = 0
+
+        # number of worker processes to use for hashing and scanning files
+        # (1 = scan serially in this process, 0 = one per CPU)
+        # defaults to 1
+        self.jobs = 1
+
+        # number of file system calls (directory listings, stats and file
+        # scans) to have in flight at once, using asyncio and a pool of
+        # threads, for file systems such as NFS where each call has high
+        # latency; takes the place of jobs (0 = don't use asyncio)
+        self.asyncConcurrency = 0
+
+        # file system shim for walking and reading files with asyncio (see
+        # spdx.asyncscan.LocalFS), or None for the local file system
+        self.fs = None
+
+        # spdx.cache.HashCache consulted before reading each file, and
+        # updated with new results; None to always read files
+        self.hashCache = None
+
+        # spdx.dedup.ContentIndex consulted once each file is hashed, so
+        # that a copy of a file already scanned isn't searched for an
+        # expression again; or None to search every file
+        self.contentIndex = None
+
+        # spdx.profiler.Profiler to record the time taken to scan each
+        # file, or None
+        self.profiler = None
+
 class BuilderDocument:
     def __init__(self, docCfg):
         super(BuilderDocument, self).__init__()
@@ -86,6 +202,25 @@ class BuilderDocument:
         for rootPath, pkgCfg in docCfg.packageConfigs.items():
             self.packages[rootPath] = BuilderPackage(pkgCfg)
 
+        # package root dirs may be nested; each file belongs only to the
+        # deepest package containing it, so a package's walk skips the
+        # root dirs of any packages below it
+        roots = PathTrie()
+        for pkg in self.packages.values():
+            roots.add(os.path.abspath(pkg.config.scandir), os.path.abspath(pkg.config.scandir))
+        for pkg in self.packages.values():
+            nested = roots.getDescendants(os.path.abspath(pkg.config.scandir))
+            if len(nested) > 0:
+                pkg.walkExcludes = pkg.config.excludeDirs + sorted(nested)
+
+        # SHA256 of the document as written to disk, once it has been
+        self.sha256 = ""
+
+        # time (UTC) recorded as the document's Created time; this is when
+        # scanning started, so that any file modified since it was scanned
+        # has a later modification time
+        self.created = datetime.utcnow()
+
 class BuilderPackage:
     def __init__(self, pkgCfg):
         super(BuilderPackage, self).__init__()
@@ -102,13 +237,21 @@ class BuilderPackage:
         self.copyrightText = pkgCfg.copyrightText
         self.files = []
 
+        # if files were streamed to disk rather than kept in self.files:
+        # dict of normalized relative file path => SPDX ID; otherwise None
+        self.fileIDs = None
+
+        # excludes used when walking the package's files: the config's,
+        # plus any nested packages' root dirs; see BuilderDocument
+        self.walkExcludes = pkgCfg.excludeDirs
+
 class BuilderFile:
     def __init__(self):
         super(BuilderFile, self).__init__()
 
         self.name = ""
         self.spdxID = ""
-        # FIXME not yet implementing FileType
+        # SPDX file type, or "" if not known; see spdx.filetypes
         self.type = ""
         self.sha1 = ""
         self.sha256 = ""
@@ -117,19 +260,239 @@ class BuilderFile:
         self.licenseInfoInFile = []
         self.copyrightText = "NOASSERTION"
 
-def shouldExcludeFile(filename, excludes):
+class FileScanResult:
+    def __init__(self):
+        super(FileScanResult, self).__init__()
+
+        # data gathered from reading a file's contents, before it is
+        # turned into a BuilderFile; kept separate so that it can be
+        # computed in a worker process
+        self.sha1 = ""
+        self.sha256 = ""
+        self.md5 = ""
+        # parsed SPDX-License-Identifier expression, or None if not found
+        self.expression = None
+        # SPDX file type; see spdx.filetypes
+        self.fileType = ""
+        # seconds taken to read the file, or None if the results didn't
+        # come from reading it (e.g. they were cached)
+        self.scanSeconds = None
+        # True if the file was only hashed, and its expression taken from
+        # a file with the same contents (see spdx.dedup.ContentIndex)
+        self.contentReused = False
+
+class PackageSummary:
+    def __init__(self):
+        super(PackageSummary, self).__init__()
+
+        # package-level data accumulated one file at a time, so that a
+        # package can be finished without keeping its BuilderFiles
+
+        # SHA1 digests of all files, as 20-byte strings
+        self.sha1s = []
+
+        # licenses seen, as for getPackageLicenses
+        self.licsConcluded = set()
+        self.licsFromFiles = set()
+
+    def addFile(self, bf):
+        """Record a BuilderFile's contribution to its package."""
+        self.sha1s.append(bytes.fromhex(bf.sha1))
+        self.licsConcluded.add(bf.licenseConcluded)
+        for licInfo in bf.licenseInfoInFile:
+            self.licsFromFiles.add(licInfo)
+
+    def finish(self, pkg):
+        """Fill in pkg's verification code and license fields."""
+        # sorting the raw digests gives the same order as sorting their
+        # lowercase hex strings
+        self.sha1s.sort()
+        hSHA1 = hashlib.sha1()
+        hSHA1.update("".join([sha1.hex() for sha1 in self.sha1s]).encode('utf-8'))
+        pkg.verificationCode = hSHA1.hexdigest()
+
+        if pkg.config.shouldConcludeLicense:
+            pkg.licenseConcluded = normalizeExpression(sorted(self.licsConcluded))
+        pkg.licenseInfoFromFiles = sorted(self.licsFromFiles)
+
+# Searches the start of a file for an SPDX-License-Identifier tag, as its
+# contents are fed in a block at a time. The tag is found with a bytes
+# pattern rather than by decoding and splitting lines, so content that
+# isn't valid UTF-8 doesn't stop the search; only the expression itself
+# has to decode. Files that look binary are not searched at all.
+class ExpressionScanner:
+    def __init__(self, numLines, numBytes=0):
+        super(ExpressionScanner, self).__init__()
+
+        # number of lines to scan for an expression (0 = all)
+        self.numLines = numLines
+
+        # number of bytes to scan for an expression (0 = all)
+        self.numBytes = numBytes
+
+        # number of complete lines scanned so far, if there is a line
+        # limit
+        self.lineno = 0
+
+        # number of bytes fed in so far
+        self.numFed = 0
+
+        # start of a line that continues into the next block fed in
+        self.partial = b""
+
+        # True while skipping the rest of a line longer than
+        # MAX_SCAN_LINE_LENGTH, once its start has been searched
+        self.skipLine = False
+
+        # parsed expression, if found
+        self.expression = None
+
+        # True if the file was found to be binary
+        self.isBinary = False
+
+        # True once no more data needs to be fed in
+        self.done = False
+
+    def feed(self, buf):
+        """
+        Scan the next block of the file's contents.
+
+        Arguments:
+            - buf: bytes following the ones previously fed in
+        Returns: None; sets self.done once the scan is complete
+        """
+        if self.done:
+            return
+        if self.numFed == 0 and buf.find(b"\0", 0, BINARY_SNIFF_SIZE) != -1:
+            self.isBinary = True
+            self.done = True
+            return
+        # past the byte budget, only the complete lines before it are
+        # searched, so that an expression is never cut short; a line
+        # ending exactly at the budget is only known to be cut short once
+        # more data follows it, and is otherwise scanned by finish()
+        if self.numBytes > 0 and self.numFed >= self.numBytes and len(buf) > 0:
+            self.partial = b""
+            self.done = True
+            return
+        overBudget = self.numBytes > 0 and self.numFed + len(buf) > self.numBytes
+        if overBudget:
+            buf = buf[:self.numBytes - self.numFed]
+        self.numFed += len(buf)
+
+        if self.skipLine:
+            end = buf.find(b"\n")
+            if end == -1:
+                buf = b""
+            else:
+                self.skipLine = False
+                buf = buf[end+1:]
+                if self.numLines > 0:
+                    self.lineno += 1
+                    if self.lineno >= self.numLines:
+                        self.done = True
+                        return
+
+        # only search complete lines; the rest is kept for the next block
+        end = buf.rfind(b"\n")
+        if end == -1:
+            self.partial += buf
+        else:
+            if self.partial:
+                data = self.partial + buf[:end+1]
+            else:
+                data = buf[:end+1]
+            self.partial = buf[end+1:]
+            self.scanLines(data)
+        # a line too long to wait for the end of is searched as far as
+        # scanLines would search it, and the rest of it skipped
+        if not self.done and len(self.partial) > MAX_SCAN_LINE_LENGTH:
+            self.scanLines(self.partial[:MAX_SCAN_LINE_LENGTH])
+            self.partial = b""
+            self.skipLine = True
+        if overBudget:
+            self.partial = b""
+            self.done = True
+
+    def finish(self):
+        """Scan the last line, if the file didn't end with a newline."""
+        if not self.done and self.partial != b"":
+            self.scanLines(self.partial)
+        self.partial = b""
+        self.done = True
+
+    def scanLines(self, data):
+        """
+        Search complete lines for an expression. Only a tag within the
+        first MAX_SCAN_LINE_LENGTH bytes of its line is found, and the
+        expression following it is cut short at MAX_EXPRESSION_LENGTH
+        bytes or the end of that part of the line.
+
+        Arguments:
+            - data: bytes, from the start of a line to the end of a line
+                    (or, for a line too long to wait for the end of, its
+                    first MAX_SCAN_LINE_LENGTH bytes)
+        Returns: None; sets self.expression and self.done if found, and
+                 self.done if the line limit has been reached
+        """
+        if self.numLines > 0:
+            # only search as far as the end of the last line allowed
+            limit = 0
+            while self.lineno < self.numLines:
+                lineEnd = data.find(b"\n", limit)
+                if lineEnd == -1:
+                    limit = len(data)
+                    break
+                limit = lineEnd + 1
+                self.lineno += 1
+        else:
+            limit = len(data)
+
+        pos = 0
+        while True:
+            tagStart = data.find(EXPRESSION_TAG, pos, limit)
+            if tagStart == -1:
+                break
+            tagEnd = tagStart + len(EXPRESSION_TAG)
+            lineStart = data.rfind(b"\n", 0, tagStart) + 1
+            lineEnd = data.find(b"\n", tagEnd)
+            if lineEnd == -1:
+                lineEnd = len(data)
+            if tagEnd - lineStart > MAX_SCAN_LINE_LENGTH:
+                # too far along a long line; keep looking from the next one
+                pos = lineEnd
+                continue
+            expressionEnd = min(lineEnd, lineStart + MAX_SCAN_LINE_LENGTH, tagEnd + MAX_EXPRESSION_LENGTH)
+            expression = cleanExpression(data[tagEnd:expressionEnd])
+            if expression:
+                self.expression = expression
+                self.done = True
+                return
+            # not usable; keep looking from the next line
+            pos = tagEnd
+        if self.numLines > 0 and self.lineno >= self.numLines:
+            self.done = True
+
+def getAllPathsWithStats(topDir, excludes, pkgCfg=None):
     """
-    Determines whether a file is in an excluded directory.
+    Gathers a list of all paths for all files within topDir or its children,
+    along with the stat results found while walking the directories.
 
     Arguments:
-        - filename: filename being tested
-        - excludes: array of excluded directory names
-    Returns: True if should exclude, False if not.
+        - topDir: root directory of files being collected
+        - excludes: array of excluded paths or patterns; see
+                    spdx.walk.ExcludeMatcher
+        - pkgCfg: BuilderPackageConfig, if its asyncConcurrency and fs
+                  settings should be used for walking; or None
+    Returns: tuple of (sorted array of paths,
+                       dict of path => os.stat_result or None)
     """
-    for exc in excludes:
-        if exc in filename:
-            return True
-    return False
+    if pkgCfg is not None and pkgCfg.asyncConcurrency > 0:
+        found = walkFilesAsync(topDir, excludes, pkgCfg.asyncConcurrency, pkgCfg.fs)
+    else:
+        found = walkFiles(topDir, excludes)
+    stats = dict(found)
+    return (sorted(stats.keys()), stats)
 
 def getAllPaths(topDir, excludes):
     """
@@ -137,17 +500,36 @@ def getAllPaths(topDir, excludes):
 
     Arguments:
         - topDir: root directory of files being collected
-        - excludes: array of excluded directory names
+        - excludes: array of excluded paths or patterns; see
+                    spdx.walk.ExcludeMatcher
     Returns: array of paths
     """
-    paths = []
-    # ignoring second item in tuple, which lists immediate subdirectories
-    for (currentDir, _, filenames) in os.walk(topDir):
-        for filename in filenames:
-            p = os.path.join(currentDir, filename)
-            if not shouldExcludeFile(p, excludes):
-                paths.append(p)
-    return sorted(paths)
+    (paths, _) = getAllPathsWithStats(topDir, excludes)
+    return paths
+
+def cleanExpression(raw):
+    """
+    Turn the bytes following an SPDX-License-Identifier tag into an
+    expression.
+
+    Arguments:
+        - raw: rest of the line after the tag, as bytes; it may end part
+               way through a character if it was cut short
+    Returns: expression, or None if it is empty or isn't valid UTF-8
+    """
+    try:
+        expression = raw.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.reason != "unexpected end of data":
+            return None
+        expression = raw[:e.start].decode("utf-8")
+    # strip away trailing comment marks and whitespace, if any
+    expression = expression.strip()
+    expression = expression.rstrip("/*")
+    expression = expression.strip()
+    if expression == "":
+        return None
+    return expression
 
 def parseLineForExpression(line):
     """Return parsed SPDX expression if tag found in line, or None otherwise."""
@@ -160,7 +542,7 @@ def parseLineForExpression(line):
     expression = expression.strip()
     return expression
 
-def getExpressionData(filePath, numLines):
+def getExpressionData(filePath, numLines, numBytes=DEFAULT_SCAN_BYTES):
     """
     Scans the specified file for the first SPDX-License-Identifier:
     tag in the file.
@@ -169,24 +551,19 @@ def getExpressionData(filePath, numLines):
         - filePath: path to file to scan.
         - numLines: number of lines to scan for an expression before
                     giving up. If 0, will scan the entire file.
+        - numBytes: number of bytes to scan for an expression before
+                    giving up. If 0, will scan the entire file.
     Returns: parsed expression if found; None if not found.
     """
-    with open(filePath, "r") as f:
-        try:
-            lineno = 0
-            for line in f:
-                lineno += 1
-                if numLines > 0 and lineno > numLines:
-                    break
-                expression = parseLineForExpression(line)
-                if expression is not None:
-                    return expression
-        except UnicodeDecodeError:
-            # invalid UTF-8 content
-            return None
-
-    # if we get here, we didn't find an expression
-    return None
+    scanner = ExpressionScanner(numLines, numBytes)
+    with open(filePath, 'rb') as f:
+        while not scanner.done:
+            buf = f.read(READ_CHUNK_SIZE)
+            if not buf:
+                break
+            scanner.feed(buf)
+    scanner.finish()
+    return scanner.expression
 
 def splitExpression(expression):
     """
@@ -207,6 +584,50 @@ def splitExpression(expression):
 
     return sorted(e4)
 
+def readAndHash(filePath, hashers, scanner=None, fs=None, kept=None, keepBytes=0):
+    """
+    Read a file once, in blocks, feeding its contents to each hasher and
+    (until it is done) to an ExpressionScanner.
+
+    Arguments:
+        - filePath: path to file to read.
+        - hashers: array of hashlib objects to update.
+        - scanner: ExpressionScanner to feed, or None.
+        - fs: file system shim to open the file with (see
+              spdx.asyncscan.LocalFS), or None to open it directly.
+        - kept: list to append the blocks of the first keepBytes bytes of
+                the file to, to scan once it has been hashed; or None.
+        - keepBytes: number of bytes to keep in kept.
+    Returns: up to the first BINARY_SNIFF_SIZE bytes of the file, for
+             classifying it; updates hashers, scanner and kept in-place.
+    """
+    head = None
+    keptBytes = 0
+    buf = bytearray(READ_CHUNK_SIZE)
+    view = memoryview(buf)
+    f = open(filePath, 'rb', buffering=0) if fs is None else fs.open(filePath)
+    with f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            if head is None:
+                head = bytes(chunk[:BINARY_SNIFF_SIZE])
+            for h in hashers:
+                h.update(chunk)
+            if scanner is not None and not scanner.done:
+                scanner.feed(bytes(chunk))
+            if kept is not None and keptBytes < keepBytes:
+                block = bytes(chunk[:keepBytes - keptBytes])
+                kept.append(block)
+                keptBytes += len(block)
+    if scanner is not None:
+        scanner.finish()
+    if head is None:
+        return b""
+    return head
+
 def getHashes(filePath):
     """
     Scan for and return hashes.
@@ -219,11 +640,7 @@ def getHashes(filePath):
     hSHA256 = hashlib.sha256()
     hMD5 = hashlib.md5()
 
-    with open(filePath, 'rb') as f:
-        buf = f.read()
-        hSHA1.update(buf)
-        hSHA256.update(buf)
-        hMD5.update(buf)
+    readAndHash(filePath, [hSHA1, hSHA256, hMD5])
 
     return (hSHA1.hexdigest(), hSHA256.hexdigest(), hMD5.hexdigest())
 
@@ -301,7 +718,160 @@ def getUniqueID(filenameOnly, timesSeen):
     timesSeen[converted] = filenameTimesSeen
     return spdxID
 
-def makeFileData(filePath, pkgCfg, timesSeen):
+def isHashOnly(size, pkgCfg):
+    """
+    Determine whether a file is too large to be fully scanned, so is
+    only hashed with SHA1.
+
+    Arguments:
+        - size: size of file in bytes.
+        - pkgCfg: BuilderPackageConfig for this scan.
+    Returns: True if the file is larger than pkgCfg.maxScanSize.
+    """
+    return pkgCfg.maxScanSize > 0 and size > pkgCfg.maxScanSize
+
+def formatScanSettings(pkgCfg):
+    """
+    Describe the settings that affect which parts of a package's files
+    are scanned, e.g. "lines=20 bytes=1048576 maxScanSize=0 skipTypes=...".
+
+    Arguments:
+        - pkgCfg: BuilderPackageConfig for this scan.
+    Returns: string of space-separated name=value pairs
+    """
+    skipTypes = ",".join(sorted(pkgCfg.skipLicenseScanTypes))
+    return (f"lines={pkgCfg.numLinesScanned} bytes={pkgCfg.numBytesScanned} maxScanSize={pkgCfg.maxScanSize} "
+            f"skipTypes={skipTypes}")
+
+def scanFile(filePath, pkgCfg, fs=None, size=None):
+    """
+    Get hashes, file type and scan for expression for a single file,
+    reading it only once. Only the hashes that pkgCfg asks for are
+    calculated, and only files of types that pkgCfg doesn't skip are
+    scanned for an expression.
+
+    Arguments:
+        - filePath: path to file to scan.
+        - pkgCfg: BuilderPackageConfig for this scan.
+        - fs: file system shim to read the file with (see
+              spdx.asyncscan.LocalFS), or None to read it directly.
+        - size: size of file in bytes if already known, or None to look
+                it up if pkgCfg.maxScanSize needs it.
+    Returns: FileScanResult
+    """
+    start = time.perf_counter()
+    fileType = getFileTypeByName(filePath)
+    if pkgCfg.maxScanSize > 0:
+        if size is None:
+            size = os.path.getsize(filePath) if fs is None else fs.stat(filePath).st_size
+        hashOnly = isHashOnly(size, pkgCfg)
+    else:
+        hashOnly = False
+
+    hSHA1 = hashlib.sha1()
+    hashers = [hSHA1]
+    if pkgCfg.doSHA256 and not hashOnly:
+        hSHA256 = hashlib.sha256()
+        hashers.append(hSHA256)
+    if pkgCfg.doMD5 and not hashOnly:
+        hMD5 = hashlib.md5()
+        hashers.append(hMD5)
+    scanner = None
+    if not hashOnly and (fileType not in pkgCfg.skipLicenseScanTypes or isTextByName(filePath)):
+        scanner = ExpressionScanner(pkgCfg.numLinesScanned, pkgCfg.numBytesScanned)
+
+    # with a content index, the file is hashed first, keeping as much of
+    # its start as the scanner could need (a byte more than its budget, so
+    # it can tell whether the file goes on past it, and at least enough
+    # to check for a NUL byte); the scan is then only done if no file with
+    # the same contents has been scanned
+    contentIndex = None
+    if scanner is not None and pkgCfg.numBytesScanned > 0:
+        contentIndex = pkgCfg.contentIndex
+    if contentIndex is not None:
+        kept = []
+        head = readAndHash(filePath, hashers, None, fs, kept, max(pkgCfg.numBytesScanned + 1, BINARY_SNIFF_SIZE))
+    else:
+        head = readAndHash(filePath, hashers, scanner, fs)
+
+    sr = FileScanResult()
+    sr.sha1 = hSHA1.hexdigest()
+    if pkgCfg.doSHA256 and not hashOnly:
+        sr.sha256 = hSHA256.hexdigest()
+    if pkgCfg.doMD5 and not hashOnly:
+        sr.md5 = hMD5.hexdigest()
+
+    known = None
+    if contentIndex is not None:
+        known = contentIndex.lookup(sr.sha1, pkgCfg)
+    sniffedType = None
+    if known is not None:
+        (sr.expression, sniffedType) = known
+        sr.contentReused = True
+    elif scanner is not None:
+        if contentIndex is not None:
+            for block in kept:
+                if scanner.done:
+                    break
+                scanner.feed(block)
+            scanner.finish()
+        # the scanner gives up on a file once it finds a NUL byte near its
+        # start, so an expression found is kept, whatever type the file's
+        # start was sniffed as
+        sr.expression = scanner.expression
+    if fileType is None:
+        if sniffedType is None:
+            sniffedType = sniffFileType(head)
+        fileType = sniffedType
+    if contentIndex is not None and known is None:
+        contentIndex.store(sr.sha1, pkgCfg, sr.expression, sniffedType)
+
+    sr.scanSeconds = time.perf_counter() - start
+    sr.fileType = fileType
+    return sr
+
+def scanFileCached(filePath, pkgCfg, st=None):
+    """
+    Get scan results for a single file from pkgCfg's hash cache if it
+    has valid ones, or else scan the file and add them to the cache.
+
+    Arguments:
+        - filePath: path to file to scan.
+        - pkgCfg: BuilderPackageConfig for this scan.
+        - st: os.stat_result for filePath if already known, or None.
+    Returns: FileScanResult
+    """
+    cache = pkgCfg.hashCache
+    if cache is None:
+        return scanFile(filePath, pkgCfg, size=None if st is None else st.st_size)
+
+    if st is None:
+        st = os.stat(filePath)
+    sr = cache.lookup(filePath, st, pkgCfg)
+    if sr is None:
+        sr = scanFile(filePath, pkgCfg, size=st.st_size)
+        cache.store(filePath, st, pkgCfg, sr)
+    return sr
+
+def scanFileSized(item, pkgCfg, fs=None):
+    """Scan a file given as a (path, size in bytes or None) tuple, for mapping over in a pool; see scanFile."""
+    (filePath, size) = item
+    return scanFile(filePath, pkgCfg, fs, size)
+
+def scanFileInWorker(item, pkgCfg, useContentIndex):
+    """
+    Scan a file in a worker process, as for scanFileSized. The main
+    process's content index can't be shared with workers, so each has its
+    own, used if useContentIndex is set.
+    """
+    global workerContentIndex
+    if useContentIndex:
+        if workerContentIndex is None:
+            workerContentIndex = ContentIndex()
+        pkgCfg.contentIndex = workerContentIndex
+    return scanFileSized(item, pkgCfg)
+
+def makeFileData(filePath, pkgCfg, timesSeen, sr=None, st=None):
     """
     Scan for expression, get hashes, and fill in data.
 
@@ -310,6 +880,10 @@ def makeFileData(filePath, pkgCfg, timesSeen):
         - pkgCfg: BuilderPackageConfig for this scan.
         - timesSeen: dict of all filename-only (converted to SPDX-ID-safe)
                      to number of times seen.
+        - sr: FileScanResult for filePath if it was already scanned
+              (e.g. by a worker process); if None, it is looked up in
+              the hash cache or scanned here.
+        - st: os.stat_result for filePath if already known, or None.
     Returns: BuilderFile
     """
     bf = BuilderFile()
@@ -318,38 +892,285 @@ def makeFileData(filePath, pkgCfg, timesSeen):
     filenameOnly = os.path.basename(filePath)
     bf.spdxID = getUniqueID(filenameOnly, timesSeen)
 
-    (sha1, sha256, md5) = getHashes(filePath)
-    bf.sha1 = sha1
+    if sr is None:
+        sr = scanFileCached(filePath, pkgCfg, st)
+    if pkgCfg.profiler is not None and sr.scanSeconds is not None:
+        size = st.st_size if st is not None else getFileSize(filePath, {})
+        pkgCfg.profiler.recordFile(filePath, size, sr.scanSeconds)
+    bf.type = sr.fileType
+    bf.sha1 = sr.sha1
     if pkgCfg.doSHA256:
-        bf.sha256 = sha256
+        bf.sha256 = sr.sha256
     if pkgCfg.doMD5:
-        bf.md5 = md5
+        bf.md5 = sr.md5
 
-    expression = getExpressionData(filePath, pkgCfg.numLinesScanned)
-    if expression != None:
-        bf.licenseConcluded = expression
-        bf.licenseInfoInFile = splitExpression(expression)
+    if sr.expression != None:
+        bf.licenseConcluded = sr.expression
+        bf.licenseInfoInFile = splitExpression(sr.expression)
 
     return bf
 
-def makeAllFileData(filePaths, pkgCfg, timesSeen):
+def getNumJobs(pkgCfg):
     """
-    Scan all files for expressions and hashes, and fill in data.
+    Determine how many worker processes to use for scanning.
+
+    Arguments:
+        - pkgCfg: BuilderPackageConfig for this scan.
+    Returns: number of worker processes; 1 means scan serially.
+    """
+    if pkgCfg.jobs == 0:
+        return os.cpu_count() or 1
+    return max(pkgCfg.jobs, 1)
+
+def getScanChunkSize(numPaths, numJobs):
+    """
+    Choose how many files to hand to a worker process at a time. Small
+    enough that the workers finish together, large enough to keep the
+    inter-process overhead low.
+
+    Arguments:
+        - numPaths: number of files to be scanned.
+        - numJobs: number of worker processes.
+    Returns: chunk size
+    """
+    return max(1, min(64, numPaths // (numJobs * 16)))
+
+def getFileSize(filePath, stats):
+    """Return size of filePath in bytes, or 0 if it can't be determined."""
+    st = stats.get(filePath)
+    if st is not None:
+        return st.st_size
+    try:
+        return os.path.getsize(filePath)
+    except OSError:
+        return 0
+
+def makeScanPool(pkgCfg):
+    """
+    Start the workers to scan a package's files with, unless they are to
+    be scanned serially. The same pool is used for every batch of files
+    in the package.
+
+    Arguments:
+        - pkgCfg: BuilderPackageConfig for this scan.
+    Returns: spdx.asyncscan.AsyncMapper if pkgCfg.asyncConcurrency is set;
+             ProcessPoolExecutor if more than one job is to be used; or
+             None to scan serially. Either kind of pool is closed with
+             shutdown().
+    """
+    if pkgCfg.asyncConcurrency > 0:
+        return AsyncMapper(pkgCfg.asyncConcurrency)
+    numJobs = getNumJobs(pkgCfg)
+    if numJobs > 1:
+        return ProcessPoolExecutor(max_workers=numJobs)
+    return None
+
+def startScans(filePaths, pkgCfg, pool, stats):
+    """
+    Start scanning files for expressions and hashes in a pool, without
+    waiting for the results. With worker processes, largest files are
+    handed out first, so that one big file doesn't end up running alone
+    at the end while other workers are idle.
+
+    Arguments:
+        - filePaths: array of paths to files to scan.
+        - pkgCfg: BuilderPackageConfig for this scan.
+        - pool: pool from makeScanPool, not None.
+        - stats: dict of file path => os.stat_result for files whose
+                 stat results are already known.
+    Returns: function that waits for the scans to finish, and returns
+             dict of file path => FileScanResult
+    """
+    if len(filePaths) == 0:
+        return lambda: {}
+
+    # sizes from walking the directories save the scans looking them up
+    def withSizes(paths):
+        return [(filePath, None if stats.get(filePath) is None else stats[filePath].st_size) for filePath in paths]
+
+    if isinstance(pool, AsyncMapper):
+        future = pool.start(partial(scanFileSized, pkgCfg=pkgCfg, fs=pkgCfg.fs), withSizes(filePaths))
+        return lambda: dict(zip(filePaths, future.result()))
+
+    # workers only need the settings for scanning, not the caches or
+    # profiler
+    workerCfg = copy.copy(pkgCfg)
+    workerCfg.hashCache = None
+    workerCfg.contentIndex = None
+    workerCfg.profiler = None
+
+    largestFirst = sorted(filePaths, key=lambda filePath: getFileSize(filePath, stats), reverse=True)
+    chunkSize = getScanChunkSize(len(largestFirst), getNumJobs(pkgCfg))
+    # map hands all of the files to the workers now, and only waits for
+    # them as the results are read
+    scan = partial(scanFileInWorker, pkgCfg=workerCfg, useContentIndex=pkgCfg.contentIndex is not None)
+    srs = pool.map(scan, withSizes(largestFirst), chunksize=chunkSize)
+    return lambda: dict(zip(largestFirst, srs))
+
+def startFileData(filePaths, pkgCfg, pool, stats):
+    """
+    Look up files in the hash cache, if any, and start scanning the rest
+    in a pool; see finishFileData.
 
     Arguments:
         - filePaths: sorted array of paths to files to scan.
         - pkgCfg: BuilderPackageConfig for this scan.
+        - pool: pool from makeScanPool, or None to scan serially (in
+                finishFileData).
+        - stats: dict of file path => os.stat_result (or None) from
+                 walking the directories.
+    Returns: function that waits for the scans to finish, and returns
+             dict of file path => FileScanResult for the files scanned
+             or found in the cache
+    """
+    if pool is None:
+        return lambda: {}
+
+    cache = pkgCfg.hashCache
+    if cache is None:
+        return startScans(filePaths, pkgCfg, pool, stats)
+
+    # only send files that aren't validly cached to the workers; hard
+    # links to a file already being sent are looked up again once it has
+    # been scanned (see spdx.dedup.ScanDedup)
+    statFile = os.stat if pkgCfg.fs is None else pkgCfg.fs.stat
+    srs = {}
+    misses = {}
+    missInodes = set()
+    links = []
+    for filePath in filePaths:
+        st = stats.get(filePath)
+        if st is None:
+            st = statFile(filePath)
+        sr = cache.lookup(filePath, st, pkgCfg)
+        if sr is not None:
+            srs[filePath] = sr
+        elif st.st_nlink > 1 and (st.st_dev, st.st_ino) in missInodes:
+            links.append((filePath, st))
+        else:
+            misses[filePath] = st
+            if st.st_nlink > 1:
+                missInodes.add((st.st_dev, st.st_ino))
+    waitForScans = startScans(list(misses.keys()), pkgCfg, pool, misses)
+
+    def finish():
+        scanned = waitForScans()
+        for filePath, sr in scanned.items():
+            cache.store(filePath, misses[filePath], pkgCfg, sr)
+        srs.update(scanned)
+        for (filePath, st) in links:
+            srs[filePath] = scanFileCached(filePath, pkgCfg, st)
+        return srs
+    return finish
+
+def finishFileData(filePaths, pkgCfg, timesSeen, stats, waitForScans):
+    """
+    Wait for the scans started by startFileData, and fill in data; files
+    not scanned in a pool are scanned here.
+
+    Arguments:
+        - filePaths: sorted array of paths to files, as given to
+                     startFileData.
+        - pkgCfg: BuilderPackageConfig for this scan.
         - timesSeen: dict of all filename-only (converted to SPDX-ID-safe)
                      to number of times seen.
+        - stats: dict of file path => os.stat_result (or None) from
+                 walking the directories.
+        - waitForScans: function returned by startFileData.
     Returns: array of BuilderFiles
     """
+    # scanning may happen in parallel or with asyncio, but IDs are always
+    # assigned here in filePaths order, so that the results match a serial
+    # scan exactly
+    srs = waitForScans()
     bfs = []
     for filePath in filePaths:
-        bf = makeFileData(filePath, pkgCfg, timesSeen)
+        bf = makeFileData(filePath, pkgCfg, timesSeen, srs.get(filePath), stats.get(filePath))
         bfs.append(bf)
-
     return bfs
 
+def makeAllFileData(filePaths, pkgCfg, timesSeen, stats=None):
+    """
+    Scan all files for expressions and hashes, and fill in data.
+
+    Arguments:
+        - filePaths: sorted array of paths to files to scan.
+        - pkgCfg: BuilderPackageConfig for this scan.
+        - timesSeen: dict of all filename-only (converted to SPDX-ID-safe)
+                     to number of times seen.
+        - stats: dict of file path => os.stat_result (or None) from
+                 walking the directories, or None if not available.
+    Returns: array of BuilderFiles
+    """
+    if stats is None:
+        stats = {}
+
+    pool = makeScanPool(pkgCfg) if len(filePaths) > 1 or pkgCfg.asyncConcurrency > 0 else None
+    try:
+        waitForScans = startFileData(filePaths, pkgCfg, pool, stats)
+        return finishFileData(filePaths, pkgCfg, timesSeen, stats, waitForScans)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def iterFileData(pathStats, pkgCfg, timesSeen, batchSize=STREAM_BATCH_SIZE):
+    """
+    Scan files and fill in data a batch at a time, so that only a couple
+    of batches of BuilderFiles need to be held in memory. One pool of
+    workers scans every batch, and the next batch is started before the
+    current one is yielded, so the workers keep scanning while the caller
+    writes.
+
+    Arguments:
+        - pathStats: iterable of (path, os.stat_result or None) tuples,
+                     sorted by path; see spdx.walk.iterSortedFiles
+        - pkgCfg: BuilderPackageConfig for this scan.
+        - timesSeen: dict of all filename-only (converted to SPDX-ID-safe)
+                     to number of times seen.
+        - batchSize: number of files to scan at a time.
+    Yields: BuilderFiles, in path order
+    """
+    pool = makeScanPool(pkgCfg)
+    try:
+        # (paths, stats, function to wait for its scans) for the batch
+        # being scanned, not yet yielded
+        pending = None
+        for (filePaths, stats) in iterBatches(pathStats, batchSize):
+            started = (filePaths, stats, startFileData(filePaths, pkgCfg, pool, stats))
+            if pending is not None:
+                (prevPaths, prevStats, waitForScans) = pending
+                yield from finishFileData(prevPaths, pkgCfg, timesSeen, prevStats, waitForScans)
+            pending = started
+        if pending is not None:
+            (prevPaths, prevStats, waitForScans) = pending
+            yield from finishFileData(prevPaths, pkgCfg, timesSeen, prevStats, waitForScans)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def iterBatches(pathStats, batchSize):
+    """
+    Group (path, os.stat_result or None) tuples into batches.
+
+    Arguments:
+        - pathStats: iterable of (path, os.stat_result or None) tuples
+        - batchSize: maximum number of paths in a batch
+    Yields: (array of paths, dict of path => os.stat_result for those
+            whose stat result is known) tuples
+    """
+    filePaths = []
+    stats = {}
+    for (filePath, st) in pathStats:
+        filePaths.append(filePath)
+        if st is not None:
+            stats[filePath] = st
+        if len(filePaths) >= batchSize:
+            yield (filePaths, stats)
+            filePaths = []
+            stats = {}
+    if filePaths:
+        yield (filePaths, stats)
+
 def getPackageLicenses(bfs):
     """
     Extract lists of all concluded and infoInFile licenses seen.
@@ -404,15 +1225,19 @@ def makePackageData(pkg, timesSeen):
                      to number of times seen.
     Returns: None; fills in Package data in-place
     """
-    filePaths = getAllPaths(pkg.config.scandir, pkg.config.excludeDirs)
-    bfs = makeAllFileData(filePaths, pkg.config, timesSeen)
-    (licsConcluded, licsFromFiles) = getPackageLicenses(bfs)
-
-    if pkg.config.shouldConcludeLicense:
-        pkg.licenseConcluded = normalizeExpression(licsConcluded)
-    pkg.licenseInfoFromFiles = licsFromFiles
-    pkg.files = bfs
-    pkg.verificationCode = calculateVerificationCode(bfs)
+    profiler = pkg.config.profiler
+    with profilePhase(profiler, "walk"):
+        (filePaths, stats) = getAllPathsWithStats(pkg.config.scandir, pkg.walkExcludes, pkg.config)
+    with profilePhase(profiler, "scan"):
+        bfs = makeAllFileData(filePaths, pkg.config, timesSeen, stats)
+    with profilePhase(profiler, "summarize"):
+        (licsConcluded, licsFromFiles) = getPackageLicenses(bfs)
+
+        if pkg.config.shouldConcludeLicense:
+            pkg.licenseConcluded = normalizeExpression(licsConcluded)
+        pkg.licenseInfoFromFiles = licsFromFiles
+        pkg.files = bfs
+        pkg.verificationCode = calculateVerificationCode(bfs)
 
 def makeDocument(docCfg):
     """
@@ -431,87 +1256,224 @@ def makeDocument(docCfg):
 
     return doc
 
-def outputSPDX(doc, spdxPath):
+def writeRelationships(writer, doc, getRelationships):
+    """
+    Write the relationships for a document whose packages have been written.
+
+    Arguments:
+        - writer: TagValueWriter or JSONWriter for the document
+        - doc: BuilderDocument
+        - getRelationships: function taking doc and returning an iterable
+                 of (SPDX ID A, relationship type, SPDX ID B) tuples, or None
     """
-    Write SPDX doc, package and files content to disk.
+    if getRelationships is None:
+        return
+    with profilePhase(doc.config.profiler, "relationships"):
+        rlns = getRelationships(doc)
+    for (spdxIDA, rlnType, spdxIDB) in rlns:
+        writer.writeRelationship(spdxIDA, rlnType, spdxIDB)
+
+def outputSPDX(doc, spdxPath, getRelationships=None):
+    """
+    Write SPDX doc, package and files content to disk, and record the
+    document's SHA256 in doc.sha256.
 
     Arguments:
         - doc: BuilderDocument
         - spdxPath: path to write SPDX content
+        - getRelationships: function to get relationships to write after
+                 the packages; see writeRelationships
     Returns: True on success, False on error.
     """
     try:
-        with open(spdxPath, 'w') as f:
-            # write document creation info section
-            f.write(f"""SPDXVersion: SPDX-2.2
-DataLicense: CC0-1.0
-SPDXID: SPDXRef-DOCUMENT
-DocumentName: {doc.config.documentName}
-DocumentNamespace: {doc.config.documentNamespace}
-Creator: Tool: cmake-spdx
-Created: {datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")}
-""")
-            # write any external document references
-            for extRef in doc.config.extRefs:
-                f.write(f"ExternalDocumentRef: {extRef[0]} {extRef[1]} {extRef[2]}:{extRef[3]}\n")
-            f.write(f"\n")
-
-            # write package sections
-            for pkg in doc.packages.values():
-                f.write(f"""##### Package: {pkg.name}
-
-PackageName: {pkg.name}
-SPDXID: {pkg.spdxID}
-PackageDownloadLocation: {pkg.downloadLocation}
-FilesAnalyzed: true
-PackageVerificationCode: {pkg.verificationCode}
-PackageLicenseConcluded: {pkg.licenseConcluded}
-""")
-                for licFromFiles in pkg.licenseInfoFromFiles:
-                    f.write(f"PackageLicenseInfoFromFiles: {licFromFiles}\n")
-                f.write(f"""PackageLicenseDeclared: {pkg.licenseDeclared}
-PackageCopyrightText: NOASSERTION
-
-Relationship: SPDXRef-DOCUMENT DESCRIBES {pkg.spdxID}
-
-""")
-
-                # write file sections
-                for bf in pkg.files:
-                    f.write(f"""FileName: {bf.name}
-SPDXID: {bf.spdxID}
-FileChecksum: SHA1: {bf.sha1}
-""")
-                    if bf.sha256 != "":
-                        f.write(f"FileChecksum: SHA256: {bf.sha256}\n")
-                    if bf.md5 != "":
-                        f.write(f"FileChecksum: MD5: {bf.md5}\n")
-                    f.write(f"LicenseConcluded: {bf.licenseConcluded}\n")
-                    if len(bf.licenseInfoInFile) == 0:
-                        f.write(f"LicenseInfoInFile: NONE\n")
-                    else:
-                        for licInfoInFile in bf.licenseInfoInFile:
-                            f.write(f"LicenseInfoInFile: {licInfoInFile}\n")
-                    f.write(f"FileCopyrightText: {bf.copyrightText}\n\n")
-
-            # we're done for now; will do other relationships later
-            return True
+        with profilePhase(doc.config.profiler, "write"), \
+                open(spdxPath, 'wb', buffering=WRITE_BUFFER_SIZE) as rawFile:
+            f = HashingFile(rawFile)
+            writer = OUTPUT_WRITERS[doc.config.outputFormat](f)
+            try:
+                writer.startDocument(doc)
+                for pkg in doc.packages.values():
+                    writer.startPackage(pkg)
+                    for bf in pkg.files:
+                        writer.addFile(bf)
+                    writer.finishPackage(pkg)
+                writeRelationships(writer, doc, getRelationships)
+                writer.finishDocument()
+            finally:
+                writer.close()
+        doc.sha256 = f.hexdigest()
+        return True
 
     except OSError as e:
-        print(f"Error: Unable to write to {spdxPath}: {str(e)}")
+        logger.error(f"Unable to write to {spdxPath}: {str(e)}")
         return False
 
-def makeSPDX(docCfg, spdxPath):
+def makeDocumentVariant(doc, variantCfg):
+    """
+    Make another version of a scanned document, with a different name,
+    namespace, external document refs and output format, sharing its
+    packages and files.
+
+    Arguments:
+        - doc: BuilderDocument
+        - variantCfg: BuilderDocumentConfig with the document info to use;
+                 its packageConfigs are ignored
+    Returns: BuilderDocument
+    """
+    cfg = copy.copy(doc.config)
+    cfg.documentName = variantCfg.documentName
+    cfg.documentNamespace = variantCfg.documentNamespace
+    cfg.extRefs = variantCfg.extRefs
+    cfg.outputFormat = variantCfg.outputFormat
+    cfg.profiler = variantCfg.profiler
+    variant = copy.copy(doc)
+    variant.config = cfg
+    variant.sha256 = ""
+    return variant
+
+def outputSPDXVariants(doc, outputs):
+    """
+    Write several versions of a scanned document; see makeSPDXVariants.
+
+    Arguments:
+        - doc: BuilderDocument
+        - outputs: list of (variant BuilderDocumentConfig, path to write
+                 SPDX content, function to get relationships) tuples
+    Returns: list of BuilderDocuments, one per output, on success; None
+             on failure.
+    """
+    variants = []
+    for (variantCfg, spdxPath, getRelationships) in outputs:
+        variant = makeDocumentVariant(doc, variantCfg)
+        if not outputSPDX(variant, spdxPath, getRelationships):
+            return None
+        variants.append(variant)
+    return variants
+
+def streamSPDX(docCfg, spdxPath, getRelationships=None):
+    """
+    Scan and write SPDX details to disk, writing each file's section as
+    it is scanned rather than building the whole document in memory
+    first. Files are walked in sorted order (spilling to temporary files
+    for very large packages), and the parts of the document that depend on
+    all of a package's files are spooled by the writer until they can be
+    written.
+
+    Arguments:
+        - docCfg: BuilderDocumentConfig
+        - spdxPath: path to write SPDX content
+        - getRelationships: function to get relationships to write after
+                 the packages; see writeRelationships
+    Returns: BuilderDocument on success, None on failure. Its packages
+             have fileIDs filled in instead of files.
+    """
+    docs = streamSPDXVariants(docCfg, [(docCfg, spdxPath, getRelationships)])
+    if docs is None:
+        return None
+    return docs[0]
+
+def streamSPDXVariants(docCfg, outputs):
+    """
+    Scan once and write several versions of the document, as for
+    streamSPDX; each file is written to every document as it is scanned.
+
+    Arguments:
+        - docCfg: BuilderDocumentConfig for the scan
+        - outputs: list of (variant BuilderDocumentConfig, path to write
+                 SPDX content, function to get relationships) tuples;
+                 see makeSPDXVariants
+    Returns: list of BuilderDocuments, one per output, on success; None
+             on failure. Their packages have fileIDs filled in instead of
+             files.
+    """
+    doc = BuilderDocument(docCfg)
+    variants = [makeDocumentVariant(doc, variantCfg) for (variantCfg, _, _) in outputs]
+    spdxPaths = [spdxPath for (_, spdxPath, _) in outputs]
+    # dict of filename-only (converted to SPDX-ID-safe) to number of times seen
+    # for use in making unique identifiers
+    timesSeen = {}
+    spoolDir = os.path.dirname(os.path.abspath(spdxPaths[0]))
+    # walking, scanning and writing are interleaved, so are only timed
+    # together, as the "stream" phase
+    try:
+        with profilePhase(docCfg.profiler, "stream"), contextlib.ExitStack() as stack:
+            files = []
+            writers = []
+            for (variant, spdxPath) in zip(variants, spdxPaths):
+                rawFile = stack.enter_context(open(spdxPath, 'wb', buffering=WRITE_BUFFER_SIZE))
+                f = HashingFile(rawFile)
+                writer = OUTPUT_WRITERS[variant.config.outputFormat](f, spool=True,
+                    spoolDir=os.path.dirname(os.path.abspath(spdxPath)))
+                stack.callback(writer.close)
+                files.append(f)
+                writers.append(writer)
+
+            for (writer, variant) in zip(writers, variants):
+                writer.startDocument(variant)
+            for pkg in doc.packages.values():
+                pkg.fileIDs = {}
+                summary = PackageSummary()
+                for writer in writers:
+                    writer.startPackage(pkg)
+                pathStats = iterSortedFiles(pkg.config.scandir, pkg.walkExcludes, tmpDir=spoolDir)
+                for bf in iterFileData(pathStats, pkg.config, timesSeen):
+                    for writer in writers:
+                        writer.addFile(bf)
+                    summary.addFile(bf)
+                    pkg.fileIDs[os.path.normpath(bf.name)] = bf.spdxID
+                summary.finish(pkg)
+                for writer in writers:
+                    writer.finishPackage(pkg)
+            for (writer, variant, (_, _, getRelationships)) in zip(writers, variants, outputs):
+                writeRelationships(writer, variant, getRelationships)
+                writer.finishDocument()
+        for (variant, f) in zip(variants, files):
+            variant.sha256 = f.hexdigest()
+
+    except OSError as e:
+        logger.error(f"Unable to write to {', '.join(spdxPaths)}: {str(e)}")
+        return None
+
+    return variants
+
+def makeSPDX(docCfg, spdxPath, getRelationships=None):
     """
     Scan, create and write SPDX details to disk.
 
     Arguments:
         - docCfg: BuilderDocumentConfig
         - spdxPath: path to write SPDX content
+        - getRelationships: function to get relationships to write after
+                 the packages; see writeRelationships
     Returns: BuilderDocument on success, None on failure.
     """
+    if docCfg.streamFiles:
+        return streamSPDX(docCfg, spdxPath, getRelationships)
+
     doc = makeDocument(docCfg)
-    if outputSPDX(doc, spdxPath):
+    if outputSPDX(doc, spdxPath, getRelationships):
         return doc
     else:
         return None
+
+def makeSPDXVariants(docCfg, outputs):
+    """
+    Scan once, and write several versions of the document with the same
+    packages and files, but different document info and relationships;
+    e.g. one for each configuration of a multi-configuration build.
+
+    Arguments:
+        - docCfg: BuilderDocumentConfig for the scan
+        - outputs: list of (variant BuilderDocumentConfig, path to write
+                 SPDX content, function to get relationships) tuples; the
+                 variant config's document name, namespace, external
+                 document refs and output format are used for that
+                 document, and the function is as for writeRelationships
+    Returns: list of BuilderDocuments, one per output, on success; None
+             on failure.
+    """
+    if docCfg.streamFiles:
+        return streamSPDXVariants(docCfg, outputs)
+
+    doc = makeDocument(docCfg)
+    return outputSPDXVariants(doc, outputs)
@@ -0,0 +1,303 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import copy
+import logging
+import os
+import sqlite3
+import time
+
+from spdx.builder import FileScanResult, isHashOnly
+from spdx.dedup import getScanSettings
+
+logger = logging.getLogger(__name__)
+
+# bump whenever the table layout or the meaning of stored values changes;
+# a cache file with any other version is discarded and rebuilt
+CACHE_SCHEMA_VERSION = 5
+
+# default maximum number of files to keep in the cache
+DEFAULT_MAX_ENTRIES = 500000
+
+# files modified less than this long before they are scanned are not
+# stored, since they may be modified again within the same mtime tick
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+# number of pending writes to collect before sending them to the database
+WRITE_BATCH_SIZE = 1000
+
+class HashCache:
+    def __init__(self, cachePath, maxEntries=DEFAULT_MAX_ENTRIES):
+        super(HashCache, self).__init__()
+
+        # path to SQLite database file
+        self.cachePath = cachePath
+
+        # maximum number of files kept; least recently used are evicted
+        # when the cache is closed
+        self.maxEntries = maxEntries
+
+        # counters for this run
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        # open database connection, or None if not open
+        self.conn = None
+
+        # incremented each time the cache is opened; recorded on each
+        # entry as it is used, to find the least recently used ones
+        self.generation = 0
+
+        # writes not yet sent to the database
+        self.pendingStores = []
+        self.pendingTouches = []
+
+    def open(self):
+        """
+        Open (creating if needed) the cache database.
+
+        Returns: True on success, False on error.
+        """
+        try:
+            self.conn = sqlite3.connect(self.cachePath)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != CACHE_SCHEMA_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS files")
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (CACHE_SCHEMA_VERSION,))
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', 0)")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                inode INTEGER,
+                numLines INTEGER,
+                numBytes INTEGER,
+                hashOnly INTEGER,
+                skipTypes TEXT,
+                sha1 TEXT,
+                sha256 TEXT,
+                md5 TEXT,
+                expression TEXT,
+                fileType TEXT,
+                lastUsed INTEGER)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS files_lastUsed ON files (lastUsed)")
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+            self.generation = (row[0] if row else 0) + 1
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (self.generation,))
+            self.conn.commit()
+            return True
+
+        except sqlite3.Error as e:
+            logger.error(f"Unable to open hash cache {self.cachePath}: {str(e)}")
+            self.conn = None
+            return False
+
+    def lookup(self, filePath, st, pkgCfg):
+        """
+        Find cached scan results for a file, if they are still valid.
+
+        An entry is only valid if the file's size, mtime and inode are
+        unchanged, it was scanned with the same limits and skipped file
+        types, it is still (or still isn't) too large to do more than hash,
+        and it has every hash that pkgCfg asks for (other than for files
+        only hashed with SHA1).
+
+        Arguments:
+            - filePath: path to file.
+            - st: os.stat_result for filePath.
+            - pkgCfg: BuilderPackageConfig for this scan.
+        Returns: FileScanResult, or None if not found or no longer valid.
+        """
+        if self.conn is None:
+            self.misses += 1
+            return None
+        absPath = os.path.abspath(filePath)
+        row = self.conn.execute("SELECT size, mtime_ns, inode, numLines, numBytes, hashOnly, skipTypes, sha1, sha256, md5, expression, fileType FROM files WHERE path = ?", (absPath,)).fetchone()
+        hashOnly = isHashOnly(st.st_size, pkgCfg)
+        key = (st.st_size, st.st_mtime_ns, st.st_ino, pkgCfg.numLinesScanned, pkgCfg.numBytesScanned,
+               int(hashOnly), getSkipTypesKey(pkgCfg))
+        if row is None or row[0:7] != key or (not hashOnly and
+                ((pkgCfg.doSHA256 and row[8] == "") or (pkgCfg.doMD5 and row[9] == ""))):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.pendingTouches.append((self.generation, absPath))
+        if len(self.pendingTouches) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+        sr = FileScanResult()
+        sr.sha1 = row[7]
+        if pkgCfg.doSHA256:
+            sr.sha256 = row[8]
+        if pkgCfg.doMD5:
+            sr.md5 = row[9]
+        sr.expression = row[10]
+        sr.fileType = row[11]
+        return sr
+
+    def store(self, filePath, st, pkgCfg, sr):
+        """
+        Record scan results for a file.
+
+        Arguments:
+            - filePath: path to file.
+            - st: os.stat_result for filePath, taken before it was scanned.
+            - pkgCfg: BuilderPackageConfig for this scan.
+            - sr: FileScanResult for filePath.
+        Returns: None
+        """
+        if self.conn is None:
+            return
+        if st.st_mtime_ns >= time.time_ns() - RACY_WINDOW_NS:
+            return
+        self.stores += 1
+        self.pendingStores.append((os.path.abspath(filePath), st.st_size, st.st_mtime_ns, st.st_ino,
+                                   pkgCfg.numLinesScanned, pkgCfg.numBytesScanned, int(isHashOnly(st.st_size, pkgCfg)),
+                                   getSkipTypesKey(pkgCfg), sr.sha1, sr.sha256, sr.md5, sr.expression,
+                                   sr.fileType, self.generation))
+        if len(self.pendingStores) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Send pending writes to the database."""
+        if self.conn is None:
+            return
+        try:
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.pendingStores)
+            self.conn.executemany("UPDATE files SET lastUsed = ? WHERE path = ?", self.pendingTouches)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Unable to write to hash cache {self.cachePath}: {str(e)}")
+        self.pendingStores = []
+        self.pendingTouches = []
+
+    def close(self):
+        """Write pending changes, evict entries over the size cap and close."""
+        if self.conn is None:
+            return
+        self.flush()
+        try:
+            count = self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            if count > self.maxEntries:
+                cur = self.conn.execute("DELETE FROM files WHERE path IN (SELECT path FROM files ORDER BY lastUsed ASC LIMIT ?)",
+                                        (count - self.maxEntries,))
+                self.evictions += cur.rowcount
+            self.conn.commit()
+            self.conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Unable to write to hash cache {self.cachePath}: {str(e)}")
+        self.conn = None
+
+    def getStats(self):
+        """Return dict of counters for this run."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+    def __repr__(self):
+        total = self.hits + self.misses
+        hitRate = (100.0 * self.hits / total) if total > 0 else 0.0
+        return f"HashCache: {self.hits} hits, {self.misses} misses ({hitRate:.1f}% hit rate), {self.stores} stored, {self.evictions} evicted"
+
+# Scan results kept in memory for as long as the process runs, for the
+# daemon, which regenerates the documents many times over the same trees.
+# It has the same lookup / store interface as HashCache, and passes on
+# anything it can't answer to the next cache (a HashCache), if there is
+# one, so that results survive a restart.
+class MemoryCache:
+    def __init__(self, nextCache=None):
+        super(MemoryCache, self).__init__()
+
+        # absolute path => (size, mtime_ns, inode, scan settings, FileScanResult)
+        self.files = {}
+
+        # absolute path => generation in which it was last looked up or
+        # stored, to forget files that are no longer there
+        self.lastUsed = {}
+
+        # incremented by startRun() before each regeneration
+        self.generation = 0
+
+        # HashCache to consult for other files, or None
+        self.nextCache = nextCache
+
+        # counters since the process started
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, filePath, st, pkgCfg):
+        """
+        Find scan results for a file that hasn't changed since it was
+        last scanned by this process; otherwise, ask the next cache.
+
+        Arguments:
+            - filePath: path to file.
+            - st: os.stat_result for filePath.
+            - pkgCfg: BuilderPackageConfig for this scan.
+        Returns: FileScanResult, or None if the file needs to be scanned.
+        """
+        absPath = os.path.abspath(filePath)
+        entry = self.files.get(absPath)
+        if entry is not None and entry[0:4] == (st.st_size, st.st_mtime_ns, st.st_ino, getScanSettings(pkgCfg)):
+            self.hits += 1
+            self.lastUsed[absPath] = self.generation
+            # it wasn't read this time, so its scan time isn't counted again
+            sr = copy.copy(entry[4])
+            sr.scanSeconds = None
+            return sr
+
+        self.misses += 1
+        if self.nextCache is None:
+            return None
+        sr = self.nextCache.lookup(filePath, st, pkgCfg)
+        if sr is not None:
+            self.remember(absPath, st, pkgCfg, sr)
+        return sr
+
+    def store(self, filePath, st, pkgCfg, sr):
+        """Record newly scanned results, and pass them on to the next cache, if any."""
+        if st.st_mtime_ns < time.time_ns() - RACY_WINDOW_NS:
+            self.remember(os.path.abspath(filePath), st, pkgCfg, sr)
+        if self.nextCache is not None:
+            self.nextCache.store(filePath, st, pkgCfg, sr)
+
+    def remember(self, absPath, st, pkgCfg, sr):
+        """Keep a file's scan results, as used in this generation."""
+        self.files[absPath] = (st.st_size, st.st_mtime_ns, st.st_ino, getScanSettings(pkgCfg), sr)
+        self.lastUsed[absPath] = self.generation
+
+    def startRun(self):
+        """Start a new generation, before the trees are scanned again."""
+        self.generation += 1
+
+    def prune(self, topDir):
+        """
+        Forget files within topDir that weren't used in this generation,
+        since they weren't found when it was scanned.
+
+        Arguments:
+            - topDir: directory scanned in this generation
+        Returns: number of files forgotten
+        """
+        prefix = os.path.join(os.path.abspath(topDir), "")
+        gone = [absPath for (absPath, generation) in self.lastUsed.items()
+                if generation < self.generation and absPath.startswith(prefix)]
+        for absPath in gone:
+            del self.files[absPath]
+            del self.lastUsed[absPath]
+        return len(gone)
+
+    def __repr__(self):
+        total = self.hits + self.misses
+        hitRate = (100.0 * self.hits / total) if total > 0 else 0.0
+        return f"MemoryCache: {len(self.files)} files, {self.hits} hits, {self.misses} misses ({hitRate:.1f}% hit rate)"
+
+def getSkipTypesKey(pkgCfg):
+    """Return pkgCfg's skipLicenseScanTypes as a string, for storing and comparing."""
+    return ",".join(sorted(pkgCfg.skipLicenseScanTypes))
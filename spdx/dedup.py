@@ -0,0 +1,171 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import collections
+import copy
+import threading
+
+# number of distinct file contents whose scan results a ContentIndex
+# keeps; each entry takes about 250 bytes, so the index stays under about
+# 16 MiB
+CONTENT_INDEX_SIZE = 65536
+
+# Scan results shared between files within one run. A hard link to a file
+# already scanned (same device and inode) gets that file's results without
+# being read again; only files with more than one link are indexed, to
+# keep memory use down for very large trees. It has the same lookup /
+# store interface as spdx.cache.HashCache, so it can be used as a
+# BuilderPackageConfig's hashCache; anything it can't answer is passed on
+# to the real hash cache, if there is one.
+#
+# Copies of a file on other inodes can't be recognized until they have
+# been read, so they are handled while scanning instead: contentIndex is
+# used by spdx.builder.scanFile (through BuilderPackageConfig.contentIndex)
+# to reuse the expression found in a file with the same SHA1, rather than
+# searching the copy again. ScanDedup counts the files that saved.
+class ScanDedup:
+    def __init__(self, nextCache=None):
+        super(ScanDedup, self).__init__()
+
+        # (device, inode) => (size, mtime_ns, scan settings, FileScanResult)
+        self.byInode = {}
+
+        # spdx.cache.HashCache to consult for other files, or None
+        self.nextCache = nextCache
+
+        # index of scan results by content, for files scanned in this
+        # process
+        self.contentIndex = ContentIndex()
+
+        # counters for this run
+        self.inodeFiles = 0
+        self.inodeBytes = 0
+        self.contentFiles = 0
+        self.contentBytes = 0
+
+    def lookup(self, filePath, st, pkgCfg):
+        """
+        Find scan results for a file that is a hard link to one already
+        scanned in this run; otherwise, ask the next cache.
+
+        Arguments:
+            - filePath: path to file.
+            - st: os.stat_result for filePath.
+            - pkgCfg: BuilderPackageConfig for this scan.
+        Returns: FileScanResult, or None if the file needs to be scanned.
+        """
+        entry = self.byInode.get((st.st_dev, st.st_ino))
+        if entry is not None and entry[0:3] == (st.st_size, st.st_mtime_ns, getScanSettings(pkgCfg)):
+            self.inodeFiles += 1
+            self.inodeBytes += st.st_size
+            # it wasn't read this time, so its scan time isn't counted again
+            sr = copy.copy(entry[3])
+            sr.scanSeconds = None
+            return sr
+
+        if self.nextCache is None:
+            return None
+        sr = self.nextCache.lookup(filePath, st, pkgCfg)
+        if sr is not None:
+            self.remember(st, pkgCfg, sr)
+        return sr
+
+    def store(self, filePath, st, pkgCfg, sr):
+        """Record newly scanned results, and pass them on to the next cache, if any."""
+        self.remember(st, pkgCfg, sr)
+        if sr.contentReused:
+            self.contentFiles += 1
+            self.contentBytes += st.st_size
+        if self.nextCache is not None:
+            self.nextCache.store(filePath, st, pkgCfg, sr)
+
+    def remember(self, st, pkgCfg, sr):
+        """Index a file's scan results by its inode, if it has other links."""
+        if st.st_nlink < 2:
+            return
+        self.byInode[(st.st_dev, st.st_ino)] = (st.st_size, st.st_mtime_ns, getScanSettings(pkgCfg), sr)
+
+    def getStats(self):
+        """Return dict of counters for this run."""
+        return {
+            "inodeFiles": self.inodeFiles,
+            "inodeBytes": self.inodeBytes,
+            "contentFiles": self.contentFiles,
+            "contentBytes": self.contentBytes,
+        }
+
+    def __repr__(self):
+        return (f"ScanDedup: {self.inodeFiles} files ({formatBytes(self.inodeBytes)}) not read again, sharing an inode "
+                f"with one already scanned; {self.contentFiles} files ({formatBytes(self.contentBytes)}) only hashed, "
+                f"with the same content as one already scanned")
+
+    def hasSavings(self):
+        """Return True if any file's scan was saved, so there is something to report."""
+        return self.inodeFiles > 0 or self.contentFiles > 0
+
+# Scan results of recently read files, by the SHA1 of their contents. A
+# file is hashed first, and only searched for an SPDX-License-Identifier
+# if no file with the same contents and scan settings is in the index.
+# Only the CONTENT_INDEX_SIZE most recently used entries are kept, so
+# memory use is bounded however many files are scanned. It may be used
+# from several threads at once (see spdx.asyncscan); worker processes
+# each have their own.
+class ContentIndex:
+    def __init__(self, maxEntries=CONTENT_INDEX_SIZE):
+        super(ContentIndex, self).__init__()
+
+        # SHA1 => (scan settings, expression, file type sniffed from its
+        # contents or None), least recently used first
+        self.entries = collections.OrderedDict()
+
+        # maximum number of entries kept
+        self.maxEntries = maxEntries
+
+        # scan settings => the same tuple, so that entries share one copy
+        self.settings = {}
+
+        # guards entries
+        self.lock = threading.Lock()
+
+    def lookup(self, sha1, pkgCfg):
+        """
+        Find the scan results of a file with the same contents.
+
+        Arguments:
+            - sha1: SHA1 of the file's contents, as hex
+            - pkgCfg: BuilderPackageConfig for this scan.
+        Returns: (expression, sniffed file type or None) tuple, or None
+                 if no file with those contents was scanned the same way
+        """
+        with self.lock:
+            entry = self.entries.get(sha1)
+            if entry is None or entry[0] != getScanSettings(pkgCfg):
+                return None
+            self.entries.move_to_end(sha1)
+        return entry[1:]
+
+    def store(self, sha1, pkgCfg, expression, sniffedType):
+        """Record the scan results of a file, forgetting the least recently used if the index is full."""
+        settings = getScanSettings(pkgCfg)
+        with self.lock:
+            settings = self.settings.setdefault(settings, settings)
+            self.entries[sha1] = (settings, expression, sniffedType)
+            self.entries.move_to_end(sha1)
+            if len(self.entries) > self.maxEntries:
+                self.entries.popitem(last=False)
+
+def getScanSettings(pkgCfg):
+    """
+    Return the settings of a BuilderPackageConfig that affect a file's
+    scan results, so that results are only shared between packages
+    scanned the same way.
+    """
+    return (pkgCfg.doSHA256, pkgCfg.doMD5, pkgCfg.numLinesScanned, pkgCfg.numBytesScanned,
+            pkgCfg.maxScanSize, pkgCfg.skipLicenseScanTypes)
+
+def formatBytes(n):
+    """Format a number of bytes for a summary, e.g. "1.5 MiB"."""
+    if n < 1024:
+        return f"{n} bytes"
+    if n < 1024 * 1024:
+        return f"{n / 1024:.1f} KiB"
+    return f"{n / (1024 * 1024):.1f} MiB"
@@ -0,0 +1,146 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+# Classifies files into SPDX file types (the FileType field), first by
+# name and extension, and failing that by sniffing the first block of
+# their contents. The type decides how much work is done on a file when
+# it is scanned; see BuilderPackageConfig.skipLicenseScanTypes.
+
+# SPDX file types
+SOURCE = "SOURCE"
+BINARY = "BINARY"
+ARCHIVE = "ARCHIVE"
+APPLICATION = "APPLICATION"
+AUDIO = "AUDIO"
+IMAGE = "IMAGE"
+TEXT = "TEXT"
+VIDEO = "VIDEO"
+DOCUMENTATION = "DOCUMENTATION"
+SPDX = "SPDX"
+OTHER = "OTHER"
+
+# types whose contents aren't text, so aren't searched for
+# SPDX-License-Identifier tags by default
+BINARY_TYPES = frozenset([BINARY, ARCHIVE, APPLICATION, AUDIO, IMAGE, VIDEO])
+
+# lower-case extensions of files whose type is usually binary, but whose
+# contents are text all the same, so are still searched
+TEXT_EXTENSIONS = frozenset([".svg"])
+
+# file names with a type of their own, regardless of extension
+NAME_TYPES = {
+    "CMakeLists.txt": SOURCE,
+    "Makefile": SOURCE,
+    "Kconfig": SOURCE,
+    "CMakeCache.txt": TEXT,
+    "build.ninja": TEXT,
+    "rules.ninja": TEXT,
+    ".ninja_log": TEXT,
+    ".ninja_deps": BINARY,
+    "LICENSE": TEXT,
+    "COPYING": TEXT,
+    "README": DOCUMENTATION,
+}
+
+# types, each with its lower-case file extensions
+TYPE_EXTENSIONS = [
+    (SOURCE, [".c", ".h", ".cc", ".cpp", ".cxx", ".c++", ".hh", ".hpp", ".hxx", ".inc", ".s", ".asm",
+              ".ld", ".lds", ".cmake", ".py", ".sh", ".pl", ".rb", ".go", ".rs", ".java", ".js", ".ts",
+              ".dts", ".dtsi", ".overlay", ".mk", ".m", ".mm", ".swift", ".kt", ".cs", ".f", ".f90"]),
+    (BINARY, [".o", ".obj", ".so", ".dll", ".dylib", ".elf", ".exe", ".bin", ".hex", ".srec", ".axf",
+              ".pyc", ".class", ".gch", ".pch", ".ko", ".wasm"]),
+    (ARCHIVE, [".a", ".lib", ".zip", ".tar", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".jar", ".whl"]),
+    (APPLICATION, [".pdf"]),
+    (AUDIO, [".wav", ".mp3", ".ogg", ".flac"]),
+    (IMAGE, [".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".svg", ".webp"]),
+    (VIDEO, [".mp4", ".avi", ".mkv", ".webm", ".mov"]),
+    (DOCUMENTATION, [".md", ".rst", ".html", ".htm", ".adoc", ".texi"]),
+    (SPDX, [".spdx"]),
+    (TEXT, [".txt", ".json", ".yaml", ".yml", ".xml", ".ini", ".cfg", ".conf", ".log", ".csv", ".map",
+            ".ninja", ".d", ".lst", ".stat", ".tmp", ".in", ".depend"]),
+]
+
+# lower-case file extension => type
+EXTENSION_TYPES = {extension: fileType for (fileType, extensions) in TYPE_EXTENSIONS for extension in extensions}
+
+# prefixes of file contents that identify a type
+MAGIC_TYPES = [
+    (b"\x7fELF", BINARY),
+    (b"\xcf\xfa\xed\xfe", BINARY),
+    (b"\xce\xfa\xed\xfe", BINARY),
+    (b"\xfe\xed\xfa\xcf", BINARY),
+    (b"\xfe\xed\xfa\xce", BINARY),
+    (b"\xca\xfe\xba\xbe", BINARY),
+    (b"\0asm", BINARY),
+    (b"!<arch>\n", ARCHIVE),
+    (b"PK\x03\x04", ARCHIVE),
+    (b"\x1f\x8b", ARCHIVE),
+    (b"\xfd7zXZ\0", ARCHIVE),
+    (b"\x28\xb5\x2f\xfd", ARCHIVE),
+    (b"7z\xbc\xaf\x27\x1c", ARCHIVE),
+    (b"%PDF-", APPLICATION),
+    (b"\x89PNG", IMAGE),
+    (b"GIF8", IMAGE),
+    (b"\xff\xd8\xff", IMAGE),
+    (b"SPDXVersion:", SPDX),
+]
+
+# prefixes short enough to start a text file too, so only trusted if the
+# contents also have a NUL byte
+WEAK_MAGIC_TYPES = [
+    (b"MZ", BINARY),
+    (b"BZh", ARCHIVE),
+]
+
+def getFileTypeByName(filePath):
+    """
+    Classify a file by its name and extension.
+
+    Arguments:
+        - filePath: path to file
+    Returns: SPDX file type, or None if the name doesn't tell
+    """
+    filenameOnly = os.path.basename(filePath)
+    fileType = NAME_TYPES.get(filenameOnly)
+    if fileType is not None:
+        return fileType
+    lower = filenameOnly.lower()
+    if lower.endswith(".spdx.json"):
+        return SPDX
+    return EXTENSION_TYPES.get(os.path.splitext(lower)[1])
+
+def isTextByName(filePath):
+    """
+    Determine whether a file's extension says it is text, even if its
+    type is one that isn't usually searched for SPDX-License-Identifier
+    tags (e.g. an SVG image).
+
+    Arguments:
+        - filePath: path to file
+    Returns: True if its extension is in TEXT_EXTENSIONS
+    """
+    return os.path.splitext(os.path.basename(filePath).lower())[1] in TEXT_EXTENSIONS
+
+def sniffFileType(head):
+    """
+    Classify a file by the start of its contents.
+
+    Arguments:
+        - head: first bytes of the file (up to a few KiB)
+    Returns: SPDX file type: as given by MAGIC_TYPES if the file starts
+             with one of them; if it has a NUL byte, as given by
+             WEAK_MAGIC_TYPES if it starts with one of them, or else
+             BINARY; OTHER if it is empty; and TEXT otherwise
+    """
+    if head == b"":
+        return OTHER
+    for (magic, fileType) in MAGIC_TYPES:
+        if head.startswith(magic):
+            return fileType
+    if b"\0" in head:
+        for (magic, fileType) in WEAK_MAGIC_TYPES:
+            if head.startswith(magic):
+                return fileType
+        return BINARY
+    return TEXT
@@ -0,0 +1,157 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import calendar
+import logging
+import os
+
+from spdx.builder import FileScanResult, formatScanSettings, isHashOnly
+
+logger = logging.getLogger(__name__)
+
+# Scan results for one package, taken from the document written by an
+# earlier run. It has the same lookup / store interface as
+# spdx.cache.HashCache, so it can be used as a BuilderPackageConfig's
+# hashCache; anything it can't answer is passed on to the real hash cache,
+# if there is one.
+#
+# The earlier document doesn't record stat details for its files, so a
+# file is only treated as unchanged if both its modification and its
+# status change times are before the earlier document's Created time,
+# which is when that run started scanning. Its results are only reused if
+# it was scanned with the same settings, other than --max-scan-size; a
+# file is scanned again if that setting changes whether it is only
+# hashed.
+class PreviousScan:
+    def __init__(self, prevPkg, prevCreated, prevMaxScanSize, nextCache=None):
+        super(PreviousScan, self).__init__()
+
+        # file name as written in the earlier document ("./" + path
+        # relative to the package root dir) => BuilderFile
+        self.prevFiles = {}
+        for bf in prevPkg.files:
+            self.prevFiles[bf.name] = bf
+
+        # earlier document's Created time, in nanoseconds since the epoch
+        # (Created only has whole seconds, which errs on the side of
+        # rescanning files modified during the second it was taken)
+        self.prevCreatedNs = calendar.timegm(prevCreated.utctimetuple()) * 1000 * 1000 * 1000
+
+        # maxScanSize the earlier document was scanned with
+        self.prevMaxScanSize = prevMaxScanSize
+
+        # spdx.cache.HashCache to consult for other files, or None
+        self.nextCache = nextCache
+
+        # counters for this run
+        self.reused = 0
+        self.changed = 0
+
+    def lookup(self, filePath, st, pkgCfg):
+        """
+        Find scan results for a file from the earlier document, if it
+        hasn't changed since; otherwise, ask the next cache.
+
+        Arguments:
+            - filePath: path to file.
+            - st: os.stat_result for filePath.
+            - pkgCfg: BuilderPackageConfig for this scan.
+        Returns: FileScanResult, or None if the file needs to be scanned.
+        """
+        name = os.path.join(".", os.path.relpath(filePath, pkgCfg.scandir))
+        bf = self.prevFiles.get(name)
+        hashOnly = isHashOnly(st.st_size, pkgCfg)
+        wasHashOnly = self.prevMaxScanSize > 0 and st.st_size > self.prevMaxScanSize
+        # files without a FileType are from a version that didn't record
+        # one, so are scanned again to find it
+        if bf is None or st.st_mtime_ns >= self.prevCreatedNs or st.st_ctime_ns >= self.prevCreatedNs or \
+                bf.type == "" or hashOnly != wasHashOnly or (not hashOnly and
+                ((pkgCfg.doSHA256 and bf.sha256 == "") or (pkgCfg.doMD5 and bf.md5 == ""))):
+            self.changed += 1
+            if self.nextCache is None:
+                return None
+            return self.nextCache.lookup(filePath, st, pkgCfg)
+
+        self.reused += 1
+        sr = FileScanResult()
+        sr.sha1 = bf.sha1
+        if pkgCfg.doSHA256:
+            sr.sha256 = bf.sha256
+        if pkgCfg.doMD5:
+            sr.md5 = bf.md5
+        sr.expression = getPreviousExpression(bf)
+        sr.fileType = bf.type
+        return sr
+
+    def store(self, filePath, st, pkgCfg, sr):
+        """Pass newly scanned results on to the next cache, if any."""
+        if self.nextCache is not None:
+            self.nextCache.store(filePath, st, pkgCfg, sr)
+
+    def __repr__(self):
+        return f"PreviousScan: {self.reused} files reused, {self.changed} new or changed"
+
+def getPreviousExpression(bf):
+    """
+    Recover the SPDX-License-Identifier expression that was found in a
+    file, from its BuilderFile as read back from an earlier document.
+
+    Arguments:
+        - bf: BuilderFile read by spdx.reader.readSPDX
+    Returns: expression, or None if none was found
+    """
+    if bf.licenseConcluded == "NOASSERTION" and len(bf.licenseInfoInFile) == 0:
+        return None
+    return bf.licenseConcluded
+
+def parseScanSettings(scanSettings):
+    """
+    Parse scan settings recorded in a document.
+
+    Arguments:
+        - scanSettings: string from spdx.builder.formatScanSettings
+    Returns: dict of setting name => value string
+    """
+    settings = {}
+    for item in scanSettings.split():
+        (name, _, value) = item.partition("=")
+        settings[name] = value
+    return settings
+
+def makePreviousScans(prevDoc, pkgCfgs, nextCache=None):
+    """
+    Set up each package config to reuse scan results from the package
+    with the same SPDX ID in an earlier document, if it was scanned with
+    the same settings (other than maxScanSize, which is checked for each
+    file).
+
+    Arguments:
+        - prevDoc: BuilderDocument read by spdx.reader.readSPDX
+        - pkgCfgs: iterable of BuilderPackageConfigs
+        - nextCache: spdx.cache.HashCache to consult for files that
+                     changed, or None
+    Returns: list of the PreviousScans created; packages that aren't in
+             prevDoc, or were scanned with other settings, are left
+             unchanged
+    """
+    scans = []
+    if prevDoc.created is None:
+        return scans
+    prevSettings = parseScanSettings(prevDoc.config.scanSettings)
+    try:
+        prevMaxScanSize = int(prevSettings.pop("maxScanSize"))
+    except (KeyError, ValueError):
+        logger.info(f"Previous {prevDoc.config.documentName} document doesn't record its scan settings; scanning all of its files")
+        return scans
+    for pkgCfg in pkgCfgs:
+        prevPkg = prevDoc.packages.get(pkgCfg.spdxID)
+        if prevPkg is None:
+            continue
+        settings = parseScanSettings(formatScanSettings(pkgCfg))
+        del settings["maxScanSize"]
+        if settings != prevSettings:
+            logger.info(f"Scan settings for {pkgCfg.packageName} have changed since the previous document; scanning all of its files")
+            continue
+        scan = PreviousScan(prevPkg, prevDoc.created, prevMaxScanSize, nextCache)
+        pkgCfg.hashCache = scan
+        scans.append(scan)
+    return scans
@@ -0,0 +1,228 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+from json.encoder import encode_basestring
+import shutil
+import tempfile
+
+from spdx.tagvalue import SCAN_SETTINGS_PREFIX, WRITE_BUFFER_SIZE
+
+# compact encoder used for each object written; the document is laid out
+# with one file, package or relationship per line
+jsonEncoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+def formatChecksum(algorithm, value):
+    """Format a checksum object; the value is a hex digest, so needs no escaping."""
+    return f'{{"algorithm":"{algorithm}","checksumValue":"{value}"}}'
+
+def formatFile(bf):
+    """
+    Format the SPDX JSON object for a file. Since there is one per file,
+    it is built directly as a string rather than as a dict to go through
+    the generic encoder; the licenses found are listed as
+    licenseInfoInFiles, or "NONE" if there are none, and fileTypes is
+    left out if the file's type isn't known.
+
+    Arguments:
+        - bf: BuilderFile
+    Returns: string with the encoded object
+    """
+    checksums = formatChecksum("SHA1", bf.sha1)
+    if bf.sha256 != "":
+        checksums += "," + formatChecksum("SHA256", bf.sha256)
+    if bf.md5 != "":
+        checksums += "," + formatChecksum("MD5", bf.md5)
+    if len(bf.licenseInfoInFile) == 0:
+        licenseInfoInFiles = '"NONE"'
+    else:
+        licenseInfoInFiles = ",".join([encode_basestring(lic) for lic in bf.licenseInfoInFile])
+    # file types are fixed upper-case names, so need no escaping
+    fileTypes = f'"fileTypes":["{bf.type}"],' if bf.type != "" else ""
+    return (f'{{"SPDXID":{encode_basestring(bf.spdxID)},"fileName":{encode_basestring(bf.name)},{fileTypes}'
+            f'"checksums":[{checksums}],"licenseConcluded":{encode_basestring(bf.licenseConcluded)},'
+            f'"licenseInfoInFiles":[{licenseInfoInFiles}],"copyrightText":{encode_basestring(bf.copyrightText)}}}')
+
+def makePackageObject(pkg, fileIDs):
+    """
+    Make the SPDX JSON object for a package.
+
+    Arguments:
+        - pkg: BuilderPackage, with its package-level fields filled in
+        - fileIDs: list of SPDX IDs of the package's files
+    Returns: dict
+    """
+    return {
+        "SPDXID": pkg.spdxID,
+        "name": pkg.name,
+        "downloadLocation": pkg.downloadLocation,
+        "filesAnalyzed": True,
+        "packageVerificationCode": {"packageVerificationCodeValue": pkg.verificationCode},
+        "licenseConcluded": pkg.licenseConcluded,
+        "licenseInfoFromFiles": pkg.licenseInfoFromFiles,
+        "licenseDeclared": pkg.licenseDeclared,
+        "copyrightText": pkg.copyrightText,
+        "hasFiles": fileIDs,
+    }
+
+def formatDocumentStart(doc):
+    """
+    Format the start of the document object, with its creation info and
+    external document refs, up to where the arrays of files, packages and
+    relationships begin.
+
+    Arguments:
+        - doc: BuilderDocument
+    Returns: string
+    """
+    extRefs = []
+    for extRef in doc.config.extRefs:
+        extRefs.append({
+            "externalDocumentId": extRef[0],
+            "spdxDocument": extRef[1],
+            "checksum": {"algorithm": extRef[2], "checksumValue": extRef[3]},
+        })
+    creationInfo = {
+        "created": doc.created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "creators": ["Tool: cmake-spdx"],
+    }
+    if doc.config.scanSettings:
+        creationInfo["comment"] = SCAN_SETTINGS_PREFIX + doc.config.scanSettings
+    fields = [
+        ("SPDXID", "SPDXRef-DOCUMENT"),
+        ("spdxVersion", "SPDX-2.2"),
+        ("dataLicense", "CC0-1.0"),
+        ("name", doc.config.documentName),
+        ("documentNamespace", doc.config.documentNamespace),
+        ("creationInfo", creationInfo),
+        ("externalDocumentRefs", extRefs),
+        ("documentDescribes", [pkg.spdxID for pkg in doc.packages.values()]),
+    ]
+    lines = [f"{jsonEncoder.encode(key)}:{jsonEncoder.encode(value)}" for (key, value) in fields]
+    return "{\n" + ",\n".join(lines)
+
+# Writes an SPDX JSON document section by section, with the same
+# interface as spdx.tagvalue.TagValueWriter. JSON doesn't need packages
+# to come before their files, so files are written straight to the output
+# as they are produced, in a "files" array. Each package's object, which
+# lists its files' IDs, is spooled to a temporary file once the package is
+# finished and copied into a "packages" array after the last file; then
+# come the relationships.
+class JSONWriter:
+    def __init__(self, f, spool=False, spoolDir=None):
+        super(JSONWriter, self).__init__()
+
+        # file object (opened for writing text) for the SPDX document
+        self.f = f
+
+        # spool packages to a temporary file until all files are written?
+        # if False, they are kept in memory
+        self.spool = spool
+
+        # directory for temporary spool files, or None for the default
+        self.spoolDir = spoolDir
+
+        # finished package objects, encoded, if not spooling; or
+        # temporary file holding them, if spooling
+        self.packagesOut = []
+
+        # number of packages finished
+        self.numPackages = 0
+
+        # SPDX IDs of the current package's files
+        self.fileIDs = []
+
+        # top-level array currently open ("files" or "relationships"),
+        # or None; and number of items written to it
+        self.currentArray = None
+        self.numItems = 0
+
+    def openArray(self, name):
+        """Close the open top-level array, if any, and open another."""
+        self.closeArray()
+        self.f.write(f',\n"{name}":[')
+        self.currentArray = name
+        self.numItems = 0
+
+    def closeArray(self):
+        """Close the open top-level array, if any."""
+        if self.currentArray is not None:
+            self.f.write("\n]")
+            self.currentArray = None
+
+    def writeItem(self, s):
+        """Write an encoded item to the open top-level array."""
+        if self.numItems > 0:
+            self.f.write(",\n" + s)
+        else:
+            self.f.write("\n" + s)
+        self.numItems += 1
+
+    def startDocument(self, doc):
+        """Write document creation info and open the files array."""
+        self.f.write(formatDocumentStart(doc))
+        if self.spool:
+            self.packagesOut = tempfile.TemporaryFile(mode="w+", encoding="utf-8",
+                                                      buffering=WRITE_BUFFER_SIZE, dir=self.spoolDir)
+        self.openArray("files")
+
+    def startPackage(self, pkg):
+        """Begin a package."""
+        self.fileIDs = []
+
+    def addFile(self, bf):
+        """Write a file object for the current package."""
+        self.writeItem(formatFile(bf))
+        self.fileIDs.append(bf.spdxID)
+
+    def finishPackage(self, pkg):
+        """End a package, setting its object aside until the files are done."""
+        s = jsonEncoder.encode(makePackageObject(pkg, self.fileIDs))
+        if self.numPackages > 0:
+            s = ",\n" + s
+        else:
+            s = "\n" + s
+        if self.spool:
+            self.packagesOut.write(s)
+        else:
+            self.packagesOut.append(s)
+        self.numPackages += 1
+        self.fileIDs = []
+
+    def writePackages(self):
+        """Write the packages array, once all files have been written."""
+        if self.currentArray != "files":
+            return
+        self.closeArray()
+        self.f.write(',\n"packages":[')
+        if self.spool:
+            self.packagesOut.seek(0)
+            shutil.copyfileobj(self.packagesOut, self.f, WRITE_BUFFER_SIZE)
+            self.packagesOut.close()
+        else:
+            for s in self.packagesOut:
+                self.f.write(s)
+        self.packagesOut = []
+        self.f.write("\n]")
+
+    def writeRelationship(self, spdxIDA, rlnType, spdxIDB):
+        """Write a relationship object."""
+        if self.currentArray != "relationships":
+            self.writePackages()
+            self.openArray("relationships")
+        self.writeItem(jsonEncoder.encode({
+            "spdxElementId": spdxIDA,
+            "relationshipType": rlnType,
+            "relatedSpdxElement": spdxIDB,
+        }))
+
+    def finishDocument(self):
+        """Write anything not written yet and close the document object."""
+        self.writePackages()
+        self.closeArray()
+        self.f.write("\n}\n")
+
+    def close(self):
+        """Discard any spooled data left after an error."""
+        if self.spool and not isinstance(self.packagesOut, list):
+            self.packagesOut.close()
+        self.packagesOut = []
@@ -0,0 +1,94 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import os
+
+def splitPath(path):
+    """
+    Split a path into its normalized components.
+
+    Arguments:
+        - path: absolute or relative path
+    Returns: array of path components; absolute paths begin with ""
+    """
+    return os.path.normpath(path).split(os.sep)
+
+class PathTrie:
+    def __init__(self):
+        super(PathTrie, self).__init__()
+
+        # nested dicts of path component => child node; a node's value,
+        # if any, is stored under the key None
+        self.root = {}
+
+    def add(self, path, value):
+        """
+        Store value for path, replacing any previous value for it.
+
+        Arguments:
+            - path: directory path
+            - value: value to store
+        Returns: None
+        """
+        node = self.root
+        for comp in splitPath(path):
+            node = node.setdefault(comp, {})
+        node[None] = value
+
+    def get(self, path):
+        """Return value stored for exactly path, or None if there is none."""
+        node = self.root
+        for comp in splitPath(path):
+            node = node.get(comp)
+            if node is None:
+                return None
+        return node.get(None)
+
+    def getPrefixes(self, path):
+        """
+        Find values stored for path and each of its parent directories.
+
+        Arguments:
+            - path: path being looked up
+        Returns: array of values, for the longest matching prefix first
+        """
+        found = []
+        node = self.root
+        for comp in splitPath(path):
+            node = node.get(comp)
+            if node is None:
+                break
+            if None in node:
+                found.append(node[None])
+        found.reverse()
+        return found
+
+    def longestPrefix(self, path):
+        """Return value stored for the deepest directory containing path, or None."""
+        prefixes = self.getPrefixes(path)
+        if len(prefixes) == 0:
+            return None
+        return prefixes[0]
+
+    def getDescendants(self, path):
+        """
+        Find values stored for directories strictly below path.
+
+        Arguments:
+            - path: directory path
+        Returns: array of values, in no particular order
+        """
+        node = self.root
+        for comp in splitPath(path):
+            node = node.get(comp)
+            if node is None:
+                return []
+        found = []
+        stack = [child for key, child in node.items() if key is not None]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    found.append(child)
+                else:
+                    stack.append(child)
+        return found
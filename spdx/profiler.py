@@ -0,0 +1,225 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import contextlib
+import cProfile
+import heapq
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# number of functions or allocation sites listed for a detailed phase
+DETAIL_TOP_N = 30
+
+# Records where the time goes in a run. Phases are named sections of
+# work, timed with phase(); a phase entered while another is running is
+# recorded under both names joined with "/", e.g. "sources/scan". Files
+# that were actually read for hashing and license scanning (not found in
+# a cache) are recorded with recordFile().
+#
+# One phase can also be profiled in detail, with cProfile or tracemalloc.
+# Work done in worker processes (-j) is only counted in the phases' CPU
+# time, not in the detailed profile.
+class Profiler:
+    def __init__(self, topN=20, detailPhase=None, detailTool="cprofile", detailDir=None):
+        super(Profiler, self).__init__()
+
+        # number of slowest files to keep
+        self.topN = topN
+
+        # full name of the phase to profile in detail, or None
+        self.detailPhase = detailPhase
+
+        # "cprofile" or "tracemalloc"
+        self.detailTool = detailTool
+
+        # directory to write the detailed profile's raw data to, or None
+        self.detailDir = detailDir
+
+        # phase name => {"wallSeconds", "cpuSeconds", "calls"}, in the
+        # order the phases were first entered
+        self.phases = {}
+
+        # names of the phases currently running, outermost first
+        self.stack = []
+
+        # totals for files read for hashing and scanning
+        self.filesScanned = 0
+        self.bytesScanned = 0
+        self.scanSeconds = 0.0
+
+        # heap of (seconds, path, size) for the slowest files scanned
+        self.slowestFiles = []
+
+        # summary of the detailed profile, once taken
+        self.detail = None
+
+        # cProfile.Profile while the detailed phase is running
+        self.cprof = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Time a phase, as a context manager.
+
+        Arguments:
+            - name: name of the phase, within any phase already running
+        """
+        self.stack.append(name)
+        fullName = "/".join(self.stack)
+        detailed = fullName == self.detailPhase and self.detail is None
+        if detailed:
+            self.startDetail()
+        startWall = time.perf_counter()
+        startCPU = time.process_time()
+        startChildren = os.times()
+        try:
+            yield
+        finally:
+            cpu = time.process_time() - startCPU
+            endChildren = os.times()
+            wall = time.perf_counter() - startWall
+            if detailed:
+                self.finishDetail(fullName)
+            self.stack.pop()
+            # CPU time includes worker processes that have exited since
+            # the phase started, e.g. from a scanning pool
+            cpu += endChildren.children_user + endChildren.children_system - \
+                startChildren.children_user - startChildren.children_system
+            stats = self.phases.setdefault(fullName, {"wallSeconds": 0.0, "cpuSeconds": 0.0, "calls": 0})
+            stats["wallSeconds"] += wall
+            stats["cpuSeconds"] += cpu
+            stats["calls"] += 1
+
+    def recordFile(self, filePath, size, seconds):
+        """
+        Record the time taken to read, hash and scan a file.
+
+        Arguments:
+            - filePath: path to file
+            - size: size of file in bytes
+            - seconds: time taken to scan it
+        """
+        self.filesScanned += 1
+        self.bytesScanned += size
+        self.scanSeconds += seconds
+        item = (seconds, filePath, size)
+        if len(self.slowestFiles) < self.topN:
+            heapq.heappush(self.slowestFiles, item)
+        elif item > self.slowestFiles[0]:
+            heapq.heapreplace(self.slowestFiles, item)
+
+    def startDetail(self):
+        """Start the detailed profile."""
+        if self.detailTool == "tracemalloc":
+            tracemalloc.start()
+        else:
+            self.cprof = cProfile.Profile()
+            self.cprof.enable()
+
+    def finishDetail(self, fullName):
+        """Stop the detailed profile, and summarize and save it."""
+        rawName = "profile-" + fullName.replace("/", "-")
+        if self.detailTool == "tracemalloc":
+            snapshot = tracemalloc.take_snapshot()
+            (current, peak) = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.detail = {
+                "phase": fullName,
+                "tool": "tracemalloc",
+                "currentBytes": current,
+                "peakBytes": peak,
+                "top": [{"location": str(stat.traceback), "bytes": stat.size, "count": stat.count}
+                        for stat in snapshot.statistics("lineno")[:DETAIL_TOP_N]],
+            }
+            if self.detailDir is not None:
+                snapshot.dump(os.path.join(self.detailDir, rawName + ".tracemalloc"))
+        else:
+            self.cprof.disable()
+            st = pstats.Stats(self.cprof, stream=io.StringIO())
+            st.sort_stats("cumulative")
+            top = []
+            for func in st.fcn_list[:DETAIL_TOP_N]:
+                (primCalls, calls, totTime, cumTime, _) = st.stats[func]
+                top.append({"function": pstats.func_std_string(func), "calls": calls,
+                            "totalSeconds": round(totTime, 6), "cumulativeSeconds": round(cumTime, 6)})
+            self.detail = {"phase": fullName, "tool": "cprofile", "top": top}
+            if self.detailDir is not None:
+                st.dump_stats(os.path.join(self.detailDir, rawName + ".pstats"))
+            self.cprof = None
+
+    def checkDetail(self):
+        """
+        Warn if the phase to profile in detail never ran, e.g. because it
+        was misspelled or doesn't happen with this run's options, listing
+        the phases that did.
+
+        Returns: True if there was no phase to profile in detail, or it
+                 was profiled; False if not.
+        """
+        if self.detailPhase is None or self.detail is not None:
+            return True
+        logger.warning(f"Phase {self.detailPhase} to profile in detail never ran; "
+                       f"phases recorded: {', '.join(self.phases.keys())}")
+        return False
+
+    def toDict(self):
+        """Return the results as a dict, ready to be encoded as JSON."""
+        phases = []
+        for (name, stats) in self.phases.items():
+            phases.append({
+                "name": name,
+                "wallSeconds": round(stats["wallSeconds"], 6),
+                "cpuSeconds": round(stats["cpuSeconds"], 6),
+                "calls": stats["calls"],
+            })
+        scanning = {
+            "files": self.filesScanned,
+            "bytes": self.bytesScanned,
+            "seconds": round(self.scanSeconds, 6),
+            "filesPerSecond": 0.0,
+            "bytesPerSecond": 0.0,
+        }
+        # with several worker processes, seconds is summed over all of
+        # them, so these rates are per worker
+        if self.scanSeconds > 0:
+            scanning["filesPerSecond"] = round(self.filesScanned / self.scanSeconds, 1)
+            scanning["bytesPerSecond"] = round(self.bytesScanned / self.scanSeconds, 1)
+        slowest = [{"path": path, "bytes": size, "seconds": round(seconds, 6)}
+                   for (seconds, path, size) in sorted(self.slowestFiles, reverse=True)]
+        return {"phases": phases, "scanning": scanning, "slowestFiles": slowest, "detail": self.detail}
+
+    def writeJSON(self, path):
+        """
+        Write the results to a JSON file.
+
+        Arguments:
+            - path: path to write to
+        Returns: True on success, False on error.
+        """
+        try:
+            with open(path, "w") as f:
+                json.dump(self.toDict(), f, indent=2)
+                f.write("\n")
+            return True
+        except OSError as e:
+            logger.error(f"Unable to write profile to {path}: {str(e)}")
+            return False
+
+def profilePhase(profiler, name):
+    """
+    Time a phase with profiler, as a context manager; does nothing if
+    profiler is None.
+
+    Arguments:
+        - profiler: Profiler, or None
+        - name: name of the phase
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
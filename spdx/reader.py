@@ -0,0 +1,306 @@
+# SPDX-License-Identifier: Apache-2.0
+
+from datetime import datetime
+import logging
+import os
+
+from spdx.builder import BuilderDocument, BuilderDocumentConfig, BuilderFile, BuilderPackage, BuilderPackageConfig
+from spdx.tagvalue import SCAN_SETTINGS_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# size of the blocks in which SPDX documents are read
+READ_BUFFER_SIZE = 1024 * 1024
+
+class SPDXReadResult:
+    def __init__(self):
+        super(SPDXReadResult, self).__init__()
+
+        # BuilderDocument read from the file; its packages are keyed by
+        # SPDX ID, since their root dirs aren't recorded, and each has its
+        # fileIDs filled in. Its created is None if it has no valid
+        # Created time.
+        self.doc = None
+
+        # relationships other than the document's DESCRIBES ones:
+        # [(spdxIDA, rln, spdxIDB), ...]
+        self.relationships = []
+
+        # file SPDX ID => BuilderFile; only if files were kept
+        self.filesByID = {}
+
+        # file SPDX ID => SPDX ID of the package containing it
+        self.packageIDsByFileID = {}
+
+        # file SHA1 => file SPDX ID, or list of file SPDX IDs if several
+        # files have the same contents
+        self.fileIDsBySHA1 = {}
+
+    def getFile(self, spdxID):
+        """Return BuilderFile with the given SPDX ID, or None."""
+        return self.filesByID.get(spdxID)
+
+    def getFileID(self, pkgSpdxID, path):
+        """
+        Find the SPDX ID of a file by its path.
+
+        Arguments:
+            - pkgSpdxID: SPDX ID of the package containing the file
+            - path: path of the file relative to the package root dir
+        Returns: file SPDX ID, or None if not found
+        """
+        pkg = self.doc.packages.get(pkgSpdxID)
+        if pkg is None:
+            return None
+        return pkg.fileIDs.get(os.path.normpath(path))
+
+    def getFileIDsBySHA1(self, sha1):
+        """Return list of SPDX IDs of files with the given SHA1."""
+        ids = self.fileIDsBySHA1.get(sha1)
+        if ids is None:
+            return []
+        if isinstance(ids, str):
+            return [ids]
+        return list(ids)
+
+    def addFile(self, pkg, bf, keepFiles):
+        """Record a file that has been read in full in the indexes."""
+        pkg.fileIDs[os.path.normpath(bf.name)] = bf.spdxID
+        self.packageIDsByFileID[bf.spdxID] = pkg.spdxID
+        ids = self.fileIDsBySHA1.get(bf.sha1)
+        if ids is None:
+            self.fileIDsBySHA1[bf.sha1] = bf.spdxID
+        elif isinstance(ids, str):
+            self.fileIDsBySHA1[bf.sha1] = [ids, bf.spdxID]
+        else:
+            ids.append(bf.spdxID)
+        if keepFiles:
+            self.filesByID[bf.spdxID] = bf
+            pkg.files.append(bf)
+
+def parseCreated(value):
+    """
+    Parse a Created timestamp.
+
+    Arguments:
+        - value: timestamp in "YYYY-MM-DDThh:mm:ssZ" format
+    Returns: datetime (UTC, without tzinfo), or None if not valid
+    """
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+    except ValueError:
+        return None
+
+def parseExtRef(value):
+    """
+    Parse an ExternalDocumentRef value.
+
+    Arguments:
+        - value: "DocumentRef-<docID> <namespaceURI> <hashAlg>:<hashValue>"
+    Returns: tuple as used in BuilderDocumentConfig.extRefs, or None if
+             not valid
+    """
+    parts = value.split(" ", 2)
+    if len(parts) != 3 or ":" not in parts[2]:
+        return None
+    (hashAlg, hashValue) = parts[2].split(":", 1)
+    return (parts[0], parts[1], hashAlg.strip(), hashValue.strip())
+
+def normalizeFileLicenses(bf):
+    """
+    outputSPDX writes "LicenseInfoInFile: NONE" for files without any
+    licenses found; turn that back into an empty licenseInfoInFile, as
+    it was in the BuilderFile that was written.
+
+    Arguments:
+        - bf: BuilderFile as read
+    Returns: None; updates bf in-place
+    """
+    if bf.licenseInfoInFile == ["NONE"] and bf.licenseConcluded != "NONE":
+        bf.licenseInfoInFile = []
+
+def iterTagValue(f):
+    """
+    Split SPDX tag-value content into tags and values. Blank lines and
+    comments are skipped. Values in <text>...</text> may span several
+    lines; they are returned without the <text> markers.
+
+    Arguments:
+        - f: file object opened for reading text
+    Yields: (line number, tag, value) tuples; tag is None for a line
+            that isn't "tag: value", in which case value is the line
+    """
+    lineNum = 0
+    textTag = None
+    textStart = 0
+    textLines = []
+    for line in f:
+        lineNum += 1
+        line = line.rstrip("\r\n")
+
+        # continuing a multi-line <text> value
+        if textTag is not None:
+            end = line.find("</text>")
+            if end == -1:
+                textLines.append(line)
+                continue
+            textLines.append(line[:end])
+            yield (textStart, textTag, "\n".join(textLines))
+            textTag = None
+            textLines = []
+            continue
+
+        if line == "" or line.startswith("#"):
+            continue
+        (tag, sep, value) = line.partition(":")
+        if sep == "":
+            yield (lineNum, None, line)
+            continue
+        value = value.lstrip(" ")
+        if value.startswith("<text>"):
+            value = value[6:]
+            end = value.find("</text>")
+            if end != -1:
+                yield (lineNum, tag, value[:end])
+                continue
+            textTag = tag
+            textStart = lineNum
+            textLines = [value]
+            continue
+        yield (lineNum, tag, value)
+
+    # unterminated <text>; return what there is
+    if textTag is not None:
+        yield (textStart, textTag, "\n".join(textLines))
+
+def readSPDX(spdxPath, onFile=None):
+    """
+    Read an SPDX tag-value document, such as one written by outputSPDX,
+    back into Builder objects, indexing its files as it goes.
+
+    The document is read sequentially, a line at a time. By default all
+    BuilderFiles are kept, in their packages' files lists. If onFile is
+    given, each BuilderFile is passed to it once read and then dropped,
+    so that memory use only grows with the indexes.
+
+    Arguments:
+        - spdxPath: path to SPDX document
+        - onFile: function taking (BuilderPackage, BuilderFile), called
+                  for each file once it has been read; or None to keep
+                  all files
+    Returns: SPDXReadResult, or None on error.
+    """
+    keepFiles = onFile is None
+    res = SPDXReadResult()
+    docCfg = BuilderDocumentConfig()
+    doc = BuilderDocument(docCfg)
+    doc.created = None
+    res.doc = doc
+    pkg = None
+    bf = None
+
+    def finishFile(pkg, bf):
+        normalizeFileLicenses(bf)
+        res.addFile(pkg, bf, keepFiles)
+        if onFile is not None:
+            onFile(pkg, bf)
+
+    try:
+        with open(spdxPath, "r", encoding="utf-8", buffering=READ_BUFFER_SIZE) as f:
+            for (lineNum, tag, value) in iterTagValue(f):
+                if tag is None:
+                    logger.error(f"Unable to parse line {lineNum} in {spdxPath}: {value}")
+                    return None
+
+                # file info, checked first since files are the bulk of a
+                # document; any other tag ends the current file
+                if bf is not None:
+                    if tag == "SPDXID":
+                        bf.spdxID = value
+                        continue
+                    elif tag == "FileChecksum":
+                        (hashAlg, _, hashValue) = value.partition(":")
+                        hashValue = hashValue.strip()
+                        if hashAlg == "SHA1":
+                            bf.sha1 = hashValue
+                        elif hashAlg == "SHA256":
+                            bf.sha256 = hashValue
+                        elif hashAlg == "MD5":
+                            bf.md5 = hashValue
+                        continue
+                    elif tag == "LicenseConcluded":
+                        bf.licenseConcluded = value
+                        continue
+                    elif tag == "LicenseInfoInFile":
+                        bf.licenseInfoInFile.append(value)
+                        continue
+                    elif tag == "FileCopyrightText":
+                        bf.copyrightText = value
+                        continue
+                    elif tag == "FileType":
+                        bf.type = value
+                        continue
+                    finishFile(pkg, bf)
+                    bf = None
+
+                # FileName starts a new file
+                if tag == "FileName" and pkg is not None:
+                    bf = BuilderFile()
+                    bf.name = value
+
+                # document creation info
+                elif tag == "DocumentName":
+                    docCfg.documentName = value
+                elif tag == "DocumentNamespace":
+                    docCfg.documentNamespace = value
+                elif tag == "Created":
+                    doc.created = parseCreated(value)
+                elif tag == "CreatorComment":
+                    if value.startswith(SCAN_SETTINGS_PREFIX):
+                        docCfg.scanSettings = value[len(SCAN_SETTINGS_PREFIX):]
+                elif tag == "ExternalDocumentRef":
+                    extRef = parseExtRef(value)
+                    if extRef:
+                        docCfg.extRefs.append(extRef)
+
+                # package info; PackageName starts a new package
+                elif tag == "PackageName":
+                    pkgCfg = BuilderPackageConfig()
+                    pkgCfg.packageName = value
+                    pkg = BuilderPackage(pkgCfg)
+                    pkg.fileIDs = {}
+                elif tag == "SPDXID" and pkg is not None:
+                    pkg.spdxID = value
+                    pkg.config.spdxID = value
+                    docCfg.packageConfigs[value] = pkg.config
+                    doc.packages[value] = pkg
+                elif tag == "PackageDownloadLocation" and pkg is not None:
+                    pkg.downloadLocation = value
+                elif tag == "PackageVerificationCode" and pkg is not None:
+                    pkg.verificationCode = value
+                elif tag == "PackageLicenseConcluded" and pkg is not None:
+                    pkg.licenseConcluded = value
+                elif tag == "PackageLicenseInfoFromFiles" and pkg is not None:
+                    pkg.licenseInfoFromFiles.append(value)
+                elif tag == "PackageLicenseDeclared" and pkg is not None:
+                    pkg.licenseDeclared = value
+                elif tag == "PackageCopyrightText" and pkg is not None:
+                    pkg.copyrightText = value
+
+                elif tag == "Relationship":
+                    rln = tuple(value.split())
+                    if len(rln) != 3:
+                        logger.error(f"Unable to parse relationship on line {lineNum} in {spdxPath}: {value}")
+                        return None
+                    if rln[0] == "SPDXRef-DOCUMENT" and rln[1] == "DESCRIBES":
+                        continue
+                    res.relationships.append(rln)
+
+            if bf is not None:
+                finishFile(pkg, bf)
+
+    except (OSError, UnicodeDecodeError) as e:
+        logger.error(f"Unable to read {spdxPath}: {str(e)}")
+        return None
+
+    return res
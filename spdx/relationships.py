@@ -1,8 +1,87 @@
 # SPDX-License-Identifier: Apache-2.0
 
+import logging
 import os
 
-def resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, filepath, is_build):
+from spdx.pathtrie import PathTrie
+
+logger = logging.getLogger(__name__)
+
+class RelationshipIndex:
+    def __init__(self, relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, prevIndex=None):
+        super(RelationshipIndex, self).__init__()
+
+        # root directory of sources location for relative paths
+        self.relpathSrcDir = relpathSrcDir
+
+        # root directory of build location for relative paths
+        self.relpathBuildDir = relpathBuildDir
+
+        # build files: normalized relative path => SPDX ID
+        # only one package in the build doc; use the "first" one
+        self.buildFiles = {}
+        for pkg in buildDoc.packages.values():
+            self.buildFiles = makeFileIndex(pkg)
+            break
+
+        # sources document the sources files were indexed from
+        self.srcDoc = srcDoc
+
+        # an earlier index of the same sources document (such as one kept
+        # by the daemon between build-only changes) has its sources part
+        # reused, rather than indexing the sources files again
+        if prevIndex is not None and prevIndex.srcDoc is srcDoc:
+            self.srcFiles = prevIndex.srcFiles
+            self.srcRoots = prevIndex.srcRoots
+            return
+
+        # sources files: package root dir => (normalized relative path => SPDX ID)
+        self.srcFiles = {}
+
+        # trie of absolute sources package root dirs => (absolute root dir,
+        # file index), to find the package(s) containing a path without
+        # checking each one
+        self.srcRoots = PathTrie()
+
+        for srcRootDir, srcPkg in srcDoc.packages.items():
+            self.srcFiles[srcRootDir] = makeFileIndex(srcPkg)
+            absRootDir = os.path.abspath(srcRootDir)
+            self.srcRoots.add(absRootDir, (absRootDir, self.srcFiles[srcRootDir]))
+
+    def resolveBuild(self, searchPath):
+        """Return SPDX ID for path relative to the build dir, or None."""
+        return self.buildFiles.get(os.path.normpath(searchPath))
+
+    def resolveSources(self, absPath):
+        """
+        Return SPDX ID for absolute path to a sources file, or None.
+        Where package root dirs are nested, the deepest package containing
+        the file is used.
+        """
+        for (absRootDir, fileIndex) in self.srcRoots.getPrefixes(absPath):
+            searchPath = os.path.normpath(os.path.relpath(absPath, absRootDir))
+            spdxID = fileIndex.get(searchPath)
+            if spdxID:
+                return spdxID
+        return None
+
+def makeFileIndex(pkg):
+    """
+    Map each file in a package to its SPDX ID.
+
+    Arguments:
+        - pkg: BuilderPackage
+    Returns: dict of normalized relative path => SPDX ID
+    """
+    # streamed packages already have this, and no files list
+    if pkg.fileIDs is not None:
+        return pkg.fileIDs
+    index = {}
+    for f in pkg.files:
+        index[os.path.normpath(f.name)] = f.spdxID
+    return index
+
+def resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, filepath, is_build, index=None):
     """
     Determines the corresponding SPDX ID for filepath, depending on whether
     it is a source file or build file.
@@ -10,12 +89,17 @@ def resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, file
     Arguments:
         - relpathSrcDir: root directory of sources location for relative paths
         - relpathBuildDir: root directory of build location for relative paths
-        - srcPkg: source SPDX Package section data
-        - buildPkg: build SPDX Package section data
+        - srcDoc: source SPDX Document data
+        - buildDoc: build SPDX Document data
         - filepath: path to file being resolved; might be absolute or relative
         - is_build: should this file ID be in the build paths or the sources paths?
+        - index: RelationshipIndex for these documents; if None, one is
+                 built for this call only
     Returns: resolved ID or None if not resolvable
     """
+    if index is None:
+        index = RelationshipIndex(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc)
+
     # figure out relative path we're searching for
     # FIXME this is probably not the right way to do this
     is_relative = not(filepath.startswith("/") or filepath.startswith("\\"))
@@ -34,7 +118,8 @@ def resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, file
     if filepath.startswith("../") or filepath.startswith("..\\"):
         # points to somewhere outside our sources root dir;
         # we won't be able to create this relationship
-        print(f"{filepath} is not in sources root dir {srcRootDir}, can't create relationship")
+        logger.warning(f"{filepath} is not in sources root dir {relpathSrcDir}, can't create relationship",
+                       extra={"category": "outside-sources-root", "path": filepath})
         return None
 
     # is this a file from the build results?
@@ -42,46 +127,78 @@ def resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, file
         if is_relative:
             searchPath = filepath
         else:
-            searchPath = os.path.join(".", os.path.relpath(filepath, relpathBuildDir))
-        # only one package in the build doc; get the "first" one
-        for p in buildDoc.packages.values():
-            pkg = p
-            break
+            searchPath = os.path.relpath(filepath, relpathBuildDir)
 
-        # search through files for the one with this filename
-        for f in pkg.files:
-            if os.path.normpath(f.name) == os.path.normpath(searchPath):
-                return f.spdxID
+        spdxID = index.resolveBuild(searchPath)
+        if spdxID:
+            return spdxID
 
-        print(f"{filepath} not found in build document, can't create relationship")
+        logger.warning(f"{filepath} not found in build document, can't create relationship",
+                       extra={"category": "build-file-not-found", "path": filepath})
         return None
 
-    # if we get here, it's a sources file
-    # search the sources doc's packages for which one has this file
-    # FIXME note that this may pick the wrong sources package / file path
-    # FIXME   if two sources packages have the exact same file path
-    # FIXME currently it will just go through in order and pick the first one
-    # FIXME   that matches
-    found_match = False
-    for srcRootDir, srcPkg in srcDoc.packages.items():
-        if is_relative:
-            searchPath = filepath
-        else:
-            searchPath = os.path.join(".", os.path.relpath(filepath, srcRootDir))
+    # if we get here, it's a sources file; relative paths are relative
+    # to the top-level sources dir
+    if is_relative:
+        searchPath = os.path.abspath(os.path.join(relpathSrcDir, filepath))
+    else:
+        searchPath = filepath
 
-        # search through files for the one with this filename
-        for f in srcPkg.files:
-            if os.path.normpath(f.name) == os.path.normpath(searchPath):
-                return f.spdxID
+    spdxID = index.resolveSources(searchPath)
+    if spdxID:
+        return spdxID
 
     # if we get here, we checked all the source packages and couldn't find it
-    print(f"{filepath} (is_relative: {is_relative}, searchPath: {searchPath} not found in sources document, can't create relationship")
+    logger.warning(f"{filepath} (looked for {searchPath}) not found in sources document, can't create relationship",
+                   extra={"category": "source-file-not-found", "path": filepath})
     return None
 
+def getSPDXRelationships(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, rlns, index=None):
+    """
+    Resolve Cmake relationship data to SPDX IDs, skipping any that can't
+    be resolved.
+
+    Arguments:
+        - relpathSrcDir: root directory of sources location for relative paths
+        - relpathBuildDir: root directory of build location for relative paths
+        - srcDoc: source SPDX Document data
+        - buildDoc: build SPDX Document data
+        - rlns: Cmake relationship data from call to getCmakeRelationships()
+        - index: RelationshipIndex for these documents; if None, one is
+                 built here
+    Returns: list of tuples with relationships: [(spdxIDA, rln, spdxIDB), ...],
+             with IDs of sources files prefixed by "DocumentRef-sources:"
+    """
+    if index is None:
+        index = RelationshipIndex(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc)
+    spdxRlns = []
+    for rln in rlns:
+        pathA = rln[0]
+        is_buildA = rln[1]
+        rln_type = rln[2]
+        pathB = rln[3]
+        is_buildB = rln[4]
+
+        rlnIDA = resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, pathA, is_buildA, index)
+        rlnIDB = resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, pathB, is_buildB, index)
+        if not rlnIDA or not rlnIDB:
+            continue
+
+        # add DocumentRef- prefix for sources files
+        if not is_buildA:
+            rlnIDA = "DocumentRef-sources:" + rlnIDA
+        if not is_buildB:
+            rlnIDB = "DocumentRef-sources:" + rlnIDB
+
+        spdxRlns.append((rlnIDA, rln_type, rlnIDB))
+    return spdxRlns
+
 def outputSPDXRelationships(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, rlns, spdxPath):
     """
     Create and append SPDX relationships to the end of the previously-created
-    SPDX build document.
+    SPDX build document. Note that this changes the document's contents
+    after its SHA256 was calculated; to avoid that, pass the relationships
+    to makeSPDX instead.
 
     Arguments:
         - relpathSrcDir: root directory of sources location for relative paths
@@ -92,29 +209,13 @@ def outputSPDXRelationships(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, rl
         - spdxPath: path to previously-started SPDX build document
     Returns: True on success, False on error.
     """
+    spdxRlns = getSPDXRelationships(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, rlns)
     try:
         with open(spdxPath, "a") as f:
-            for rln in rlns:
-                pathA = rln[0]
-                is_buildA = rln[1]
-                rln_type = rln[2]
-                pathB = rln[3]
-                is_buildB = rln[4]
-
-                rlnIDA = resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, pathA, is_buildA)
-                rlnIDB = resolveRelationshipID(relpathSrcDir, relpathBuildDir, srcDoc, buildDoc, pathB, is_buildB)
-                if not rlnIDA or not rlnIDB:
-                    continue
-
-                # add DocumentRef- prefix for sources files
-                if not is_buildA:
-                    rlnIDA = "DocumentRef-sources:" + rlnIDA
-                if not is_buildB:
-                    rlnIDB = "DocumentRef-sources:" + rlnIDB
-
+            for (rlnIDA, rln_type, rlnIDB) in spdxRlns:
                 f.write(f"Relationship: {rlnIDA} {rln_type} {rlnIDB}\n")
             return True
 
     except OSError as e:
-        print(f"Error: Unable to append to {spdxPath}: {str(e)}")
+        logger.error(f"Unable to append to {spdxPath}: {str(e)}")
         return False
@@ -0,0 +1,329 @@
+# SPDX-License-Identifier: Apache-2.0
+
+# Binary snapshots of scanned BuilderDocuments, so that SPDX documents can
+# be written again (e.g. with another namespace or output format) without
+# rescanning the files.
+#
+# Layout, all integers little-endian; each section follows the previous
+# one directly, so its offset can be calculated from the header:
+#   - header (HEADER_FORMAT): magic, version, counts and document fields
+#   - external document refs: 4 string indexes each
+#   - packages (PACKAGE_FORMAT), in document order
+#   - files (FILE_FORMAT), each package's files together and in order
+#   - index lists: string indexes for files' and packages' license lists
+#   - string offsets: numStrings + 1 offsets into the string data
+#   - string data: UTF-8, not terminated
+# Digests are stored as raw bytes; a file's flags say which of its
+# optional digests are present.
+
+from datetime import datetime
+import logging
+import mmap
+import struct
+import sys
+
+from spdx.builder import BuilderDocument, BuilderDocumentConfig, BuilderFile, BuilderPackage, BuilderPackageConfig
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"CMSPDXSN"
+
+# bump whenever the layout or the meaning of stored values changes;
+# snapshots with any other version are rejected
+SNAPSHOT_VERSION = 2
+
+# magic, version, documentName, documentNamespace, created, scanSettings,
+# numExtRefs, numPackages, numFiles, numIndexes, numStrings
+HEADER_FORMAT = struct.Struct("<8sIIIIIIIIII")
+
+# root dir, name, SPDX ID, downloadLocation, licenseConcluded,
+# licenseDeclared, copyrightText, scandir, verification code, first file,
+# number of files, first licenseInfoFromFiles index, number of them
+PACKAGE_FORMAT = struct.Struct("<IIIIIIII20sIIII")
+
+# name, SPDX ID, licenseConcluded, copyrightText, type, first
+# licenseInfoInFile index, number of them, flags, SHA1, SHA256, MD5
+FILE_FORMAT = struct.Struct("<IIIIIIHH20s32s16s")
+
+EXTREF_FORMAT = struct.Struct("<IIII")
+
+# flags for FILE_FORMAT
+FILE_HAS_SHA256 = 1
+FILE_HAS_MD5 = 2
+
+CREATED_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+class SnapshotStrings:
+    def __init__(self):
+        super(SnapshotStrings, self).__init__()
+
+        # string => index in self.strings
+        self.indexes = {}
+
+        # strings in the table, each stored once
+        self.strings = []
+
+    def add(self, s):
+        """Return the index of s in the table, adding it if needed."""
+        i = self.indexes.get(s)
+        if i is None:
+            i = len(self.strings)
+            self.indexes[s] = i
+            self.strings.append(s)
+        return i
+
+    def encode(self):
+        """Return (bytes for the string offsets section, bytes for the string data)."""
+        encoded = [s.encode("utf-8") for s in self.strings]
+        offsets = [0]
+        for buf in encoded:
+            offsets.append(offsets[-1] + len(buf))
+        return (struct.pack(f"<{len(offsets)}Q", *offsets), b"".join(encoded))
+
+# A loaded snapshot: the file's contents, and where each section is.
+class Snapshot:
+    def __init__(self, buf):
+        super(Snapshot, self).__init__()
+
+        # memory-mapped (or other buffer-like) snapshot contents
+        self.buf = buf
+
+        # header fields
+        (_, self.version, self.documentName, self.documentNamespace, self.created, self.scanSettings,
+         self.numExtRefs, self.numPackages, self.numFiles, self.numIndexes, self.numStrings) = HEADER_FORMAT.unpack_from(buf, 0)
+
+        # section offsets
+        self.extRefsOffset = HEADER_FORMAT.size
+        self.packagesOffset = self.extRefsOffset + self.numExtRefs * EXTREF_FORMAT.size
+        self.filesOffset = self.packagesOffset + self.numPackages * PACKAGE_FORMAT.size
+        self.indexesOffset = self.filesOffset + self.numFiles * FILE_FORMAT.size
+        self.stringOffsetsOffset = self.indexesOffset + self.numIndexes * 4
+        self.stringDataOffset = self.stringOffsetsOffset + (self.numStrings + 1) * 8
+
+        # the index lists and string offsets, read in place where the
+        # byte order allows it
+        stringOffsetsEnd = self.stringDataOffset
+        if sys.byteorder == "little":
+            view = memoryview(buf)
+            self.indexes = view[self.indexesOffset:self.stringOffsetsOffset].cast("I")
+            self.stringOffsets = view[self.stringOffsetsOffset:stringOffsetsEnd].cast("Q")
+        else:
+            self.indexes = struct.unpack_from(f"<{self.numIndexes}I", buf, self.indexesOffset)
+            self.stringOffsets = struct.unpack_from(f"<{self.numStrings + 1}Q", buf, self.stringOffsetsOffset)
+
+        # the string data
+        self.stringData = memoryview(buf)[self.stringDataOffset:]
+
+        # string index => string, for the licenses, copyright texts and
+        # file types that many files share; names and IDs aren't cached
+        self.sharedStrings = {}
+
+    def getString(self, i):
+        """Return string with index i."""
+        return str(self.stringData[self.stringOffsets[i]:self.stringOffsets[i + 1]], "utf-8")
+
+    def getSharedString(self, i):
+        """Return string with index i, for a string likely to be used again."""
+        s = self.sharedStrings.get(i)
+        if s is None:
+            s = self.getString(i)
+            self.sharedStrings[i] = s
+        return s
+
+    def getStrings(self, first, count):
+        """Return list of strings for an index list."""
+        return [self.getSharedString(i) for i in self.indexes[first:first + count]]
+
+    def makeFile(self, record):
+        """Return BuilderFile for an unpacked FILE_FORMAT record."""
+        (name, spdxID, licenseConcluded, copyrightText, fileType, licStart, licCount, flags,
+         sha1, sha256, md5) = record
+        bf = BuilderFile()
+        bf.name = self.getString(name)
+        bf.spdxID = self.getString(spdxID)
+        bf.type = self.getSharedString(fileType)
+        bf.sha1 = sha1.hex()
+        if flags & FILE_HAS_SHA256:
+            bf.sha256 = sha256.hex()
+        if flags & FILE_HAS_MD5:
+            bf.md5 = md5.hex()
+        bf.licenseConcluded = self.getSharedString(licenseConcluded)
+        if licCount > 0:
+            bf.licenseInfoInFile = self.getStrings(licStart, licCount)
+        bf.copyrightText = self.getSharedString(copyrightText)
+        return bf
+
+    def getFile(self, i):
+        """Return BuilderFile for file record i."""
+        return self.makeFile(FILE_FORMAT.unpack_from(self.buf, self.filesOffset + i * FILE_FORMAT.size))
+
+    def iterFiles(self, first, count):
+        """Yield BuilderFiles for count file records starting at first."""
+        start = self.filesOffset + first * FILE_FORMAT.size
+        records = memoryview(self.buf)[start:start + count * FILE_FORMAT.size]
+        for record in FILE_FORMAT.iter_unpack(records):
+            yield self.makeFile(record)
+
+# The files of a package loaded from a snapshot. Creates BuilderFile
+# objects only when items are accessed; modifying those objects does not
+# change the snapshot.
+class SnapshotFiles:
+    def __init__(self, snapshot, first, count):
+        super(SnapshotFiles, self).__init__()
+
+        self.snapshot = snapshot
+        self.first = first
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if i < 0 or i >= self.count:
+            raise IndexError("snapshot file index out of range")
+        return self.snapshot.getFile(self.first + i)
+
+    def __iter__(self):
+        return self.snapshot.iterFiles(self.first, self.count)
+
+    def __repr__(self):
+        return f"SnapshotFiles: {self.count} files"
+
+def saveSnapshot(doc, snapshotPath):
+    """
+    Write a binary snapshot of a scanned document.
+
+    Arguments:
+        - doc: BuilderDocument, with its packages' files lists filled in
+               (i.e. not written with streamFiles)
+        - snapshotPath: path to write snapshot to
+    Returns: True on success, False on error.
+    """
+    strings = SnapshotStrings()
+    indexes = []
+
+    def addIndexList(values):
+        first = len(indexes)
+        for value in values:
+            indexes.append(strings.add(value))
+        return (first, len(values))
+
+    extRefs = []
+    for extRef in doc.config.extRefs:
+        extRefs.append(EXTREF_FORMAT.pack(*[strings.add(part) for part in extRef]))
+
+    packages = []
+    files = []
+    for rootDir, pkg in doc.packages.items():
+        if pkg.fileIDs is not None:
+            logger.error(f"Unable to save snapshot {snapshotPath}: package {pkg.name} was streamed")
+            return False
+        firstFile = len(files)
+        for bf in pkg.files:
+            flags = 0
+            sha256 = b""
+            md5 = b""
+            if bf.sha256 != "":
+                flags |= FILE_HAS_SHA256
+                sha256 = bytes.fromhex(bf.sha256)
+            if bf.md5 != "":
+                flags |= FILE_HAS_MD5
+                md5 = bytes.fromhex(bf.md5)
+            (licStart, licCount) = addIndexList(bf.licenseInfoInFile)
+            files.append(FILE_FORMAT.pack(strings.add(bf.name), strings.add(bf.spdxID),
+                                          strings.add(bf.licenseConcluded), strings.add(bf.copyrightText),
+                                          strings.add(bf.type), licStart, licCount, flags,
+                                          bytes.fromhex(bf.sha1), sha256, md5))
+        (licStart, licCount) = addIndexList(pkg.licenseInfoFromFiles)
+        packages.append(PACKAGE_FORMAT.pack(strings.add(rootDir), strings.add(pkg.name), strings.add(pkg.spdxID),
+                                            strings.add(pkg.downloadLocation), strings.add(pkg.licenseConcluded),
+                                            strings.add(pkg.licenseDeclared), strings.add(pkg.copyrightText),
+                                            strings.add(pkg.config.scandir), bytes.fromhex(pkg.verificationCode),
+                                            firstFile, len(files) - firstFile, licStart, licCount))
+
+    docName = strings.add(doc.config.documentName)
+    docNamespace = strings.add(doc.config.documentNamespace)
+    created = strings.add(doc.created.strftime(CREATED_FORMAT))
+    scanSettings = strings.add(doc.config.scanSettings)
+    (stringOffsets, stringData) = strings.encode()
+    header = HEADER_FORMAT.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, docName, docNamespace, created, scanSettings,
+                                len(extRefs), len(packages), len(files), len(indexes), len(strings.strings))
+
+    try:
+        with open(snapshotPath, "wb") as f:
+            f.write(header)
+            f.write(b"".join(extRefs))
+            f.write(b"".join(packages))
+            f.write(b"".join(files))
+            f.write(struct.pack(f"<{len(indexes)}I", *indexes))
+            f.write(stringOffsets)
+            f.write(stringData)
+        return True
+
+    except OSError as e:
+        logger.error(f"Unable to write snapshot {snapshotPath}: {str(e)}")
+        return False
+
+def loadSnapshot(snapshotPath):
+    """
+    Load a document from a binary snapshot. The file is memory-mapped,
+    and files' details are only read when they are accessed.
+
+    Arguments:
+        - snapshotPath: path to snapshot written by saveSnapshot
+    Returns: BuilderDocument, or None on error. Its packages are keyed by
+             root dir, as when scanned, and their files lists are
+             SnapshotFiles.
+    """
+    try:
+        with open(snapshotPath, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        logger.error(f"Unable to read snapshot {snapshotPath}: {str(e)}")
+        return None
+
+    if len(buf) < HEADER_FORMAT.size or buf[0:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        logger.error(f"{snapshotPath} is not a cmake-spdx snapshot")
+        return None
+    snapshot = Snapshot(buf)
+    if snapshot.version != SNAPSHOT_VERSION:
+        logger.error(f"Snapshot {snapshotPath} has version {snapshot.version}, expected {SNAPSHOT_VERSION}")
+        return None
+
+    docCfg = BuilderDocumentConfig()
+    docCfg.documentName = snapshot.getString(snapshot.documentName)
+    docCfg.documentNamespace = snapshot.getString(snapshot.documentNamespace)
+    docCfg.scanSettings = snapshot.getString(snapshot.scanSettings)
+    for i in range(snapshot.numExtRefs):
+        parts = EXTREF_FORMAT.unpack_from(buf, snapshot.extRefsOffset + i * EXTREF_FORMAT.size)
+        docCfg.extRefs.append(tuple([snapshot.getString(part) for part in parts]))
+
+    pkgs = []
+    for i in range(snapshot.numPackages):
+        (rootDir, name, spdxID, downloadLocation, licenseConcluded, licenseDeclared, copyrightText, scandir,
+         verificationCode, firstFile, numFiles, licStart, licCount) = \
+            PACKAGE_FORMAT.unpack_from(buf, snapshot.packagesOffset + i * PACKAGE_FORMAT.size)
+        pkgCfg = BuilderPackageConfig()
+        pkgCfg.packageName = snapshot.getString(name)
+        pkgCfg.spdxID = snapshot.getString(spdxID)
+        pkgCfg.packageDownloadLocation = snapshot.getString(downloadLocation)
+        pkgCfg.declaredLicense = snapshot.getString(licenseDeclared)
+        pkgCfg.copyrightText = snapshot.getString(copyrightText)
+        pkgCfg.scandir = snapshot.getString(scandir)
+        pkg = BuilderPackage(pkgCfg)
+        pkg.verificationCode = verificationCode.hex()
+        pkg.licenseConcluded = snapshot.getString(licenseConcluded)
+        pkg.licenseInfoFromFiles = snapshot.getStrings(licStart, licCount)
+        pkg.files = SnapshotFiles(snapshot, firstFile, numFiles)
+        rootDir = snapshot.getString(rootDir)
+        docCfg.packageConfigs[rootDir] = pkgCfg
+        pkgs.append((rootDir, pkg))
+
+    doc = BuilderDocument(docCfg)
+    doc.packages = dict(pkgs)
+    doc.created = datetime.strptime(snapshot.getString(snapshot.created), CREATED_FORMAT)
+    return doc
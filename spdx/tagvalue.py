@@ -0,0 +1,180 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import hashlib
+import shutil
+import tempfile
+
+# buffer size used for the SPDX output file, and for spooled file sections
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# start of the creator comment that records a document's scan settings;
+# see BuilderDocumentConfig.scanSettings
+SCAN_SETTINGS_PREFIX = "cmake-spdx scan settings: "
+
+# Text file-like object that encodes what is written to it as UTF-8,
+# passes it on to a binary file and keeps a running digest of it, so
+# that a document's checksum is known as soon as it has been written
+# without reading it back.
+class HashingFile:
+    def __init__(self, f, hashAlg="sha256"):
+        super(HashingFile, self).__init__()
+
+        # binary file object being written to
+        self.f = f
+
+        # hashlib object for everything written so far
+        self.hasher = hashlib.new(hashAlg)
+
+    def write(self, s):
+        buf = s.encode("utf-8")
+        self.hasher.update(buf)
+        return self.f.write(buf)
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+def formatDocumentStart(doc):
+    """
+    Format the document creation info section.
+
+    Arguments:
+        - doc: BuilderDocument
+    Returns: string with the section, including the trailing blank line
+    """
+    lines = [
+        "SPDXVersion: SPDX-2.2",
+        "DataLicense: CC0-1.0",
+        "SPDXID: SPDXRef-DOCUMENT",
+        f"DocumentName: {doc.config.documentName}",
+        f"DocumentNamespace: {doc.config.documentNamespace}",
+        "Creator: Tool: cmake-spdx",
+        f"Created: {doc.created.strftime('%Y-%m-%dT%H:%M:%SZ')}",
+    ]
+    if doc.config.scanSettings:
+        lines.append(f"CreatorComment: <text>{SCAN_SETTINGS_PREFIX}{doc.config.scanSettings}</text>")
+    # any external document references
+    for extRef in doc.config.extRefs:
+        lines.append(f"ExternalDocumentRef: {extRef[0]} {extRef[1]} {extRef[2]}:{extRef[3]}")
+    lines.append("\n")
+    return "\n".join(lines)
+
+def formatPackage(pkg):
+    """
+    Format a package section, not including its files.
+
+    Arguments:
+        - pkg: BuilderPackage, with its package-level fields filled in
+    Returns: string with the section, including the trailing blank line
+    """
+    lines = [
+        f"##### Package: {pkg.name}",
+        "",
+        f"PackageName: {pkg.name}",
+        f"SPDXID: {pkg.spdxID}",
+        f"PackageDownloadLocation: {pkg.downloadLocation}",
+        "FilesAnalyzed: true",
+        f"PackageVerificationCode: {pkg.verificationCode}",
+        f"PackageLicenseConcluded: {pkg.licenseConcluded}",
+    ]
+    for licFromFiles in pkg.licenseInfoFromFiles:
+        lines.append(f"PackageLicenseInfoFromFiles: {licFromFiles}")
+    lines.append(f"PackageLicenseDeclared: {pkg.licenseDeclared}")
+    lines.append("PackageCopyrightText: NOASSERTION")
+    lines.append("")
+    lines.append(f"Relationship: SPDXRef-DOCUMENT DESCRIBES {pkg.spdxID}")
+    lines.append("\n")
+    return "\n".join(lines)
+
+def formatFile(bf):
+    """
+    Format a file section.
+
+    Arguments:
+        - bf: BuilderFile
+    Returns: string with the section, including the trailing blank line
+    """
+    lines = [
+        f"FileName: {bf.name}",
+        f"SPDXID: {bf.spdxID}",
+    ]
+    if bf.type != "":
+        lines.append(f"FileType: {bf.type}")
+    lines.append(f"FileChecksum: SHA1: {bf.sha1}")
+    if bf.sha256 != "":
+        lines.append(f"FileChecksum: SHA256: {bf.sha256}")
+    if bf.md5 != "":
+        lines.append(f"FileChecksum: MD5: {bf.md5}")
+    lines.append(f"LicenseConcluded: {bf.licenseConcluded}")
+    if len(bf.licenseInfoInFile) == 0:
+        lines.append("LicenseInfoInFile: NONE")
+    else:
+        for licInfoInFile in bf.licenseInfoInFile:
+            lines.append(f"LicenseInfoInFile: {licInfoInFile}")
+    lines.append(f"FileCopyrightText: {bf.copyrightText}")
+    lines.append("\n")
+    return "\n".join(lines)
+
+# Writes an SPDX tag-value document section by section. A package's
+# verification code and license lists are only known once all of its
+# files have been scanned, but tag-value puts them before the files; so
+# when spooling, file sections are written to a temporary file as they
+# are produced, and copied in after the package section once the package
+# is finished.
+class TagValueWriter:
+    def __init__(self, f, spool=False, spoolDir=None):
+        super(TagValueWriter, self).__init__()
+
+        # file object (opened for writing text) for the SPDX document
+        self.f = f
+
+        # write file sections to a temporary file until the package is
+        # finished? if False, the package must already be complete when
+        # startPackage is called
+        self.spool = spool
+
+        # directory for temporary spool files, or None for the default
+        self.spoolDir = spoolDir
+
+        # temporary file for the current package's file sections, if
+        # spooling; otherwise the same as self.f
+        self.fileOut = None
+
+    def startDocument(self, doc):
+        """Write document creation info."""
+        self.f.write(formatDocumentStart(doc))
+
+    def startPackage(self, pkg):
+        """Begin a package; its section is written now unless spooling."""
+        if self.spool:
+            self.fileOut = tempfile.TemporaryFile(mode="w+", encoding="utf-8",
+                                                  buffering=WRITE_BUFFER_SIZE, dir=self.spoolDir)
+        else:
+            self.f.write(formatPackage(pkg))
+            self.fileOut = self.f
+
+    def addFile(self, bf):
+        """Write a file section for the current package."""
+        self.fileOut.write(formatFile(bf))
+
+    def finishPackage(self, pkg):
+        """End a package; if spooling, write its section and its files."""
+        if self.spool:
+            self.f.write(formatPackage(pkg))
+            self.fileOut.seek(0)
+            shutil.copyfileobj(self.fileOut, self.f, WRITE_BUFFER_SIZE)
+            self.fileOut.close()
+        self.fileOut = None
+
+    def writeRelationship(self, spdxIDA, rlnType, spdxIDB):
+        """Write a relationship line."""
+        self.f.write(f"Relationship: {spdxIDA} {rlnType} {spdxIDB}\n")
+
+    def finishDocument(self):
+        """End the document; nothing more is needed for tag-value."""
+        pass
+
+    def close(self):
+        """Discard any spooled data left after an error."""
+        if self.spool and self.fileOut is not None:
+            self.fileOut.close()
+        self.fileOut = None
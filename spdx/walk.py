@@ -0,0 +1,264 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import heapq
+import os
+import re
+import stat
+import tempfile
+
+# maximum number of paths iterSortedFiles sorts in memory; beyond this,
+# sorted runs are written to temporary files and merged
+SORT_RUN_SIZE = 256 * 1024
+
+# size of the blocks in which sorted runs are read back
+SORT_READ_SIZE = 64 * 1024
+
+def translateGlob(pattern):
+    """
+    Convert a glob pattern for part of a path into a regular expression.
+    "*" and "?" do not match across "/"; "**" does.
+
+    Arguments:
+        - pattern: glob pattern, using "/" as separator
+    Returns: regular expression string (not anchored)
+    """
+    res = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i+2] == "**":
+                res.append(".*")
+                i += 2
+                continue
+            res.append("[^/]*")
+        elif c == "?":
+            res.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 2 if pattern[i+1:i+2] in ("!", "]") else i + 1)
+            if end == -1:
+                res.append(re.escape(c))
+            else:
+                body = pattern[i+1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                res.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end
+        else:
+            res.append(re.escape(c))
+        i += 1
+    return "".join(res)
+
+class ExcludeMatcher:
+    def __init__(self, excludes):
+        super(ExcludeMatcher, self).__init__()
+
+        # Each exclude is one of:
+        #  - an absolute path: excludes that file or directory and
+        #    everything below it
+        #  - a relative path or glob pattern, such as ".git/", "*.o" or
+        #    "CMakeFiles/*.dir": excludes files and directories whose
+        #    trailing path components match it, at any depth; "*" and "?"
+        #    stay within one component and "**" matches across them.
+        #    With a trailing "/", it only matches directories.
+
+        # normalized absolute paths excluded
+        self.absPaths = set()
+
+        # compiled patterns matched against the end of a path relative to
+        # the scanned directory, using "/" as separator; None if no
+        # relative excludes apply
+        self.dirPattern = None
+        self.filePattern = None
+
+        dirAlternatives = []
+        fileAlternatives = []
+        for exc in excludes:
+            if os.path.isabs(exc):
+                self.absPaths.add(os.path.normpath(exc))
+                continue
+            posixExc = exc.replace(os.sep, "/")
+            dirOnly = posixExc.endswith("/")
+            posixExc = posixExc.strip("/")
+            if posixExc == "":
+                continue
+            alternative = translateGlob(posixExc)
+            dirAlternatives.append(alternative)
+            if not dirOnly:
+                fileAlternatives.append(alternative)
+
+        if dirAlternatives:
+            self.dirPattern = re.compile("(?:^|/)(?:" + "|".join(dirAlternatives) + ")$")
+        if fileAlternatives:
+            self.filePattern = re.compile("(?:^|/)(?:" + "|".join(fileAlternatives) + ")$")
+
+    def isAbsPathExcluded(self, absPath):
+        """Return True if absPath (normalized) or a parent of it is an absolute exclude."""
+        if absPath in self.absPaths:
+            return True
+        for excPath in self.absPaths:
+            if absPath.startswith(excPath.rstrip(os.sep) + os.sep):
+                return True
+        return False
+
+    def shouldPruneDir(self, absPath, relPath):
+        """
+        Should a directory be skipped, along with everything below it? Its
+        parent directories are assumed to have been checked already.
+
+        Arguments:
+            - absPath: normalized absolute path of directory
+            - relPath: path of directory relative to the scanned directory,
+                       using "/" as separator
+        Returns: True if excluded, False if not.
+        """
+        if absPath in self.absPaths:
+            return True
+        return self.dirPattern is not None and self.dirPattern.search(relPath) is not None
+
+    def shouldExcludeFile(self, absPath, relPath):
+        """
+        Should a file be skipped? Its parent directories are assumed to have
+        been checked already.
+
+        Arguments:
+            - absPath: normalized absolute path of file
+            - relPath: path of file relative to the scanned directory,
+                       using "/" as separator
+        Returns: True if excluded, False if not.
+        """
+        if absPath in self.absPaths:
+            return True
+        return self.filePattern is not None and self.filePattern.search(relPath) is not None
+
+def iterWalkFiles(topDir, excludes):
+    """
+    Find all files within topDir or its children, skipping excluded
+    directories without looking inside them. Like os.walk, symbolic links
+    to directories are not followed. Sockets, pipes and devices are
+    skipped.
+
+    Arguments:
+        - topDir: root directory of files being collected
+        - excludes: array of excludes; see ExcludeMatcher
+    Yields: (path, os.stat_result or None if it can't be determined)
+            tuples, in no particular order
+    """
+    matcher = excludes if isinstance(excludes, ExcludeMatcher) else ExcludeMatcher(excludes)
+    absTopDir = os.path.abspath(topDir)
+    if matcher.isAbsPathExcluded(absTopDir):
+        return
+
+    # directories still to be listed: (path, absolute path, relative path)
+    stack = [(topDir, absTopDir, "")]
+    while stack:
+        (currentDir, absCurrentDir, relCurrentDir) = stack.pop()
+        try:
+            entries = list(os.scandir(currentDir))
+        except OSError:
+            continue
+        for entry in entries:
+            relPath = entry.name if relCurrentDir == "" else relCurrentDir + "/" + entry.name
+            absPath = os.path.join(absCurrentDir, entry.name)
+            try:
+                isDir = entry.is_dir()
+            except OSError:
+                isDir = False
+            if isDir:
+                if entry.is_symlink() or matcher.shouldPruneDir(absPath, relPath):
+                    continue
+                stack.append((entry.path, absPath, relPath))
+                continue
+            if matcher.shouldExcludeFile(absPath, relPath):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                st = None
+            # sockets, pipes and devices can't be hashed (and reading a
+            # pipe would wait forever), so only regular files are kept
+            if st is not None and not stat.S_ISREG(st.st_mode):
+                continue
+            yield (entry.path, st)
+
+def walkFiles(topDir, excludes):
+    """
+    Find all files within topDir or its children; see iterWalkFiles.
+
+    Arguments:
+        - topDir: root directory of files being collected
+        - excludes: array of excludes; see ExcludeMatcher
+    Returns: array of (path, os.stat_result or None if it can't be
+             determined) tuples, in no particular order
+    """
+    return list(iterWalkFiles(topDir, excludes))
+
+def writeSortRun(paths, tmpDir):
+    """
+    Sort paths and write them to a temporary file, NUL-separated.
+
+    Arguments:
+        - paths: array of paths
+        - tmpDir: directory for the temporary file, or None for the default
+    Returns: temporary file object, positioned at the start
+    """
+    paths.sort()
+    run = tempfile.TemporaryFile(mode="w+b", dir=tmpDir)
+    for path in paths:
+        run.write(os.fsencode(path))
+        run.write(b"\0")
+    run.seek(0)
+    return run
+
+def iterSortRun(run):
+    """Yield the paths from a file written by writeSortRun, in order."""
+    pending = b""
+    while True:
+        buf = run.read(SORT_READ_SIZE)
+        if not buf:
+            break
+        parts = (pending + buf).split(b"\0")
+        pending = parts.pop()
+        for part in parts:
+            yield os.fsdecode(part)
+    if pending:
+        yield os.fsdecode(pending)
+
+def iterSortedFiles(topDir, excludes, maxInMemory=SORT_RUN_SIZE, tmpDir=None):
+    """
+    Find all files within topDir or its children, in sorted path order,
+    without holding more than maxInMemory paths at once. Smaller trees are
+    sorted in memory; larger ones are sorted in runs written to temporary
+    files, which are then merged.
+
+    Arguments:
+        - topDir: root directory of files being collected
+        - excludes: array of excludes; see ExcludeMatcher
+        - maxInMemory: maximum number of paths to sort in memory
+        - tmpDir: directory for temporary files, or None for the default
+    Yields: (path, os.stat_result or None) tuples, sorted by path; the
+            stat result is None for all paths if temporary files were used
+    """
+    found = []
+    runs = []
+    try:
+        for item in iterWalkFiles(topDir, excludes):
+            found.append(item)
+            if len(found) >= maxInMemory:
+                runs.append(writeSortRun([path for (path, _) in found], tmpDir))
+                found = []
+
+        if not runs:
+            found.sort(key=lambda item: item[0])
+            yield from found
+            return
+
+        if found:
+            runs.append(writeSortRun([path for (path, _) in found], tmpDir))
+            found = []
+        for path in heapq.merge(*[iterSortRun(run) for run in runs]):
+            yield (path, None)
+    finally:
+        for run in runs:
+            run.close()
@@ -0,0 +1,270 @@
+# SPDX-License-Identifier: Apache-2.0
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+import sys
+
+from spdx.walk import ExcludeMatcher, iterWalkFiles
+
+logger = logging.getLogger(__name__)
+
+# Watches directory trees for changes, for the daemon. Each tree is added
+# under a name (such as "sources" or "build"), and readChanges() returns
+# the names of the trees that have changed since it was last called.
+# Files and directories excluded from a tree are ignored, the same as
+# when it is scanned.
+#
+# On Linux, InotifyWatcher has the kernel report changes through inotify
+# (called through ctypes, so no extra package is needed), with a watch on
+# each directory. Where inotify isn't available, or the limit on watches
+# per user is reached, PollingWatcher walks the trees every few seconds
+# instead, and compares the sizes and modification times of their files.
+
+# inotify flags, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# events watched for on each directory
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# struct inotify_event, not counting the name that follows it:
+# watch descriptor, mask, cookie, length of name
+EVENT_HEADER = struct.Struct("iIII")
+
+# number of bytes of events to read at once
+EVENT_READ_SIZE = 64 * 1024
+
+def loadInotify():
+    """
+    Load the C library's inotify functions.
+
+    Returns: ctypes.CDLL for the C library, or None if inotify isn't
+             available on this system
+    """
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+class InotifyWatcher:
+    def __init__(self, libc):
+        super(InotifyWatcher, self).__init__()
+
+        # C library loaded by loadInotify()
+        self.libc = libc
+
+        # inotify file descriptor, or -1 if closed
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+
+        # watch descriptor => (tree name, absolute directory path, path
+        # relative to the tree's top directory, ExcludeMatcher)
+        self.watches = {}
+
+        # names of the trees added
+        self.names = set()
+
+    def addTree(self, name, topDir, excludes):
+        """
+        Watch a directory and the directories below it that aren't
+        excluded.
+
+        Arguments:
+            - name: name to report changes to this tree under
+            - topDir: top directory of the tree
+            - excludes: array of excludes; see spdx.walk.ExcludeMatcher
+        Returns: True on success, False if a directory couldn't be watched,
+                 for instance because the limit on watches was reached
+        """
+        self.names.add(name)
+        matcher = ExcludeMatcher(excludes)
+        absTopDir = os.path.abspath(topDir)
+        if matcher.isAbsPathExcluded(absTopDir):
+            return True
+        return self.addDirs(name, absTopDir, "", matcher)
+
+    def addDirs(self, name, absTopDir, relTopDir, matcher):
+        """Add watches for a directory and the directories below it; see addTree."""
+        # directories still to be watched: (absolute path, relative path)
+        stack = [(absTopDir, relTopDir)]
+        while stack:
+            (absDir, relDir) = stack.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(absDir), WATCH_MASK)
+            if wd < 0:
+                e = ctypes.get_errno()
+                # it was removed or replaced before it could be watched
+                if e in (errno.ENOENT, errno.ENOTDIR):
+                    continue
+                logger.warning(f"Unable to watch {absDir}: {os.strerror(e)}")
+                return False
+            self.watches[wd] = (name, absDir, relDir, matcher)
+            try:
+                entries = list(os.scandir(absDir))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                except OSError:
+                    continue
+                relPath = entry.name if relDir == "" else relDir + "/" + entry.name
+                absPath = os.path.join(absDir, entry.name)
+                if matcher.shouldPruneDir(absPath, relPath):
+                    continue
+                stack.append((absPath, relPath))
+        return True
+
+    def fileno(self):
+        """Return the file descriptor to wait on for changes."""
+        return self.fd
+
+    def readChanges(self):
+        """
+        Read the events waiting, without blocking, and watch any new
+        directories they report.
+
+        Returns: set of names of the trees that have changed
+        """
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, EVENT_READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            pos = 0
+            while pos < len(data):
+                (wd, mask, _, nameLen) = EVENT_HEADER.unpack_from(data, pos)
+                rawName = data[pos + EVENT_HEADER.size:pos + EVENT_HEADER.size + nameLen].rstrip(b"\0")
+                pos += EVENT_HEADER.size + nameLen
+
+                if mask & IN_Q_OVERFLOW:
+                    # events were dropped, so anything may have changed
+                    changed |= self.names
+                    continue
+                watch = self.watches.get(wd)
+                if watch is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # the directory is gone; its parent reports that too
+                    del self.watches[wd]
+                    continue
+
+                (name, absDir, relDir, matcher) = watch
+                if rawName:
+                    entryName = os.fsdecode(rawName)
+                    relPath = entryName if relDir == "" else relDir + "/" + entryName
+                    absPath = os.path.join(absDir, entryName)
+                    if mask & IN_ISDIR:
+                        if matcher.shouldPruneDir(absPath, relPath):
+                            continue
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            self.addDirs(name, absPath, relPath, matcher)
+                    elif matcher.shouldExcludeFile(absPath, relPath):
+                        continue
+                changed.add(name)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+class PollingWatcher:
+    def __init__(self):
+        super(PollingWatcher, self).__init__()
+
+        # tree name => list of (top directory, ExcludeMatcher)
+        self.trees = {}
+
+        # tree name => signature of its files when last polled
+        self.signatures = {}
+
+    def addTree(self, name, topDir, excludes):
+        """Start polling a directory tree; see InotifyWatcher.addTree."""
+        self.trees.setdefault(name, []).append((topDir, ExcludeMatcher(excludes)))
+        self.signatures[name] = self.getSignature(name)
+        return True
+
+    def getSignature(self, name):
+        """Return a value that changes when any file in the named trees is added, removed or modified."""
+        found = []
+        for (topDir, matcher) in self.trees[name]:
+            found.extend(iterWalkFiles(topDir, matcher))
+        return hash(frozenset((path, st.st_size, st.st_mtime_ns, st.st_ino) if st is not None else (path,)
+                              for (path, st) in found))
+
+    def fileno(self):
+        """Return None; there is nothing to wait on, so the caller calls readChanges() every so often."""
+        return None
+
+    def readChanges(self):
+        """
+        Walk the trees and compare them with when they were last polled.
+
+        Returns: set of names of the trees that have changed
+        """
+        changed = set()
+        for name in self.trees:
+            signature = self.getSignature(name)
+            if signature != self.signatures[name]:
+                self.signatures[name] = signature
+                changed.add(name)
+        return changed
+
+    def close(self):
+        pass
+
+def watchTrees(trees, usePolling=False):
+    """
+    Start watching directory trees for changes, with inotify if it is
+    available, or else by polling.
+
+    Arguments:
+        - trees: list of (name, top directory, excludes) tuples; several
+                 trees may share a name
+        - usePolling: poll, even if inotify is available?
+    Returns: InotifyWatcher or PollingWatcher
+    """
+    libc = None if usePolling else loadInotify()
+    if libc is not None:
+        try:
+            watcher = InotifyWatcher(libc)
+        except OSError as e:
+            logger.warning(f"Unable to start inotify: {str(e)}; polling for changes instead")
+            watcher = None
+        if watcher is not None:
+            if all(watcher.addTree(name, topDir, excludes) for (name, topDir, excludes) in trees):
+                return watcher
+            watcher.close()
+            logger.warning(f"Unable to watch every directory with inotify; polling for changes instead")
+
+    watcher = PollingWatcher()
+    for (name, topDir, excludes) in trees:
+        watcher.addTree(name, topDir, excludes)
+    return watcher